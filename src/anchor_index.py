@@ -0,0 +1,121 @@
+import re
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# ==================================================
+# DATE ANCHOR INDEX
+# ==================================================
+# The date extractors look for a date near an anchor: a keyword such as
+# "filed" or "patented", matched fuzzily because OCR garbles it, or an INID
+# code such as [22] (filed) or (45) (patented). AnchorIndex finds every
+# anchor of a page in one pass over its lines. The extractors then ask
+# "is there a 'filed' on lines i..j?" with a binary search, instead of
+# re-tokenizing each line and running SequenceMatcher per word and keyword.
+#
+# A word matches a keyword when SequenceMatcher's ratio reaches the
+# threshold, exactly as before. Words that cannot reach it by their length
+# or letter counts are rejected first. Each distinct word is compared once
+# per process (LRU memo): most pages share the same vocabulary.
+ANCHOR_KEYWORDS = ("filed", "application", "patent", "patented", "issued")
+FUZZY_THRESHOLD = 0.72
+INID_CODES = ("22", "45")
+
+WORD_PATTERN = re.compile(r"[A-Za-z]{3,}")
+MARKER_PATTERN = re.compile(r"[\[(](\d\d)")
+CLOSING = {"[": "]", "(": ")"}
+
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def keyword_hits(word, keywords=ANCHOR_KEYWORDS, threshold=FUZZY_THRESHOLD):
+    """Return the keywords a lowercase word fuzzily matches."""
+    hits = []
+    matcher = SequenceMatcher(b=word)  # b is cached across keywords
+    for keyword in keywords:
+        # 2 * matches / total length can reach threshold only if the
+        # shorter word is long enough
+        if 2 * min(len(word), len(keyword)) < threshold * (len(word) + len(keyword)):
+            continue
+        matcher.set_seq1(keyword)
+        if (
+            matcher.real_quick_ratio() >= threshold
+            and matcher.quick_ratio() >= threshold
+            and SequenceMatcher(None, word, keyword).ratio() >= threshold
+        ):
+            hits.append(keyword)
+    return tuple(hits)
+
+
+class AnchorIndex:
+    """Positions of the date anchors of one page, by line number.
+
+    lines is the page split into lines (line numbers index this list).
+    keyword positions are (line, column) of each word matching a keyword;
+    marker positions are (line, column) of each "[22" / "(45"-style code,
+    with whether its closing bracket follows.
+    """
+
+    def __init__(self, lines, keywords=ANCHOR_KEYWORDS, threshold=FUZZY_THRESHOLD):
+        self.keywords = tuple(keywords)
+        self.threshold = threshold
+        self.positions = {keyword: [] for keyword in self.keywords}
+        self.markers = []  # (line, column, code, bracket, closed)
+
+        for line_no, line in enumerate(lines):
+            for m in WORD_PATTERN.finditer(line):
+                for keyword in keyword_hits(
+                    m.group().lower(), self.keywords, self.threshold
+                ):
+                    self.positions[keyword].append((line_no, m.start()))
+            if "[" in line or "(" in line:
+                for m in MARKER_PATTERN.finditer(line):
+                    if m.group(1) not in INID_CODES:
+                        continue
+                    bracket = m.group()[0]
+                    closed = line[m.end() : m.end() + 1] == CLOSING[bracket]
+                    self.markers.append(
+                        (line_no, m.start(), m.group(1), bracket, closed)
+                    )
+
+        # Sorted, de-duplicated line numbers for range queries
+        self._keyword_lines = {
+            keyword: sorted({line_no for line_no, _ in positions})
+            for keyword, positions in self.positions.items()
+        }
+        self._marker_lines = {}
+        for line_no, _, code, bracket, closed in self.markers:
+            for key in ((code, bracket, False), (code, bracket, closed)):
+                lines_for = self._marker_lines.setdefault(key, [])
+                if not lines_for or lines_for[-1] != line_no:
+                    lines_for.append(line_no)
+
+    @staticmethod
+    def _any_in(line_numbers, first, last):
+        i = bisect_left(line_numbers, first)
+        return i < len(line_numbers) and line_numbers[i] <= last
+
+    def has_keyword(self, keyword, first, last=None):
+        """True if a word on lines first..last (inclusive) matches keyword."""
+        last = first if last is None else last
+        return self._any_in(self._keyword_lines[keyword], first, last)
+
+    def has_any_keyword(self, keywords, first, last=None):
+        return any(self.has_keyword(keyword, first, last) for keyword in keywords)
+
+    def has_marker(self, code, first, last=None, *, brackets="[(", closed=True):
+        """True if an INID code ("[22]", "(45)", ...) is on lines first..last.
+
+        brackets selects the opening brackets accepted; with closed=False
+        the closing bracket is not required ("(22" also matches "(22)").
+        """
+        last = first if last is None else last
+        return any(
+            self._any_in(self._marker_lines.get((code, b, closed), ()), first, last)
+            for b in brackets
+        )
+
+    def keyword_lines(self, keyword):
+        """Sorted numbers of the lines holding a word matching keyword."""
+        return self._keyword_lines[keyword]
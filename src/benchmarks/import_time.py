@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# ==================================================
+# COLD-START IMPORT BENCHMARK
+# ==================================================
+# Imports each helper module in a fresh interpreter and times the import
+# alone. Models and clients (spaCy, Nominatim, dateparser) are loaded
+# lazily through src.model_registry, so importing a helper only to call
+# e.g. normalize_date must stay under IMPORT_BUDGET_SEC and must not pull
+# in any of HEAVY_MODULES. Exits with status 1 if any module fails.
+#
+#     python -m src.benchmarks.import_time
+HELPER_MODULES = [
+    "src.anchor_index",
+    "src.model_registry",
+    "src.month_typos",
+    "src.page_lines",
+    "src.services.ocr_extraction",
+    "src.services.spacy_extractor",
+    "src.services.metadata_extractor",
+    "src.services.extract_date",
+    "src.services.geolocator",
+    "src.services.test",
+    "src.services.test_svc",
+    "src.services.metadata_stream",
+    "src.services.corpus_runner",
+    "src.modeling.extract_patent_entities",
+]
+HEAVY_MODULES = ["spacy", "geopy", "dateparser", "thinc", "torch"]
+
+IMPORT_BUDGET_SEC = 0.25  # per module, median of RUNS cold imports
+RUNS = 3
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# Run in the child interpreter: time one import, report heavy modules loaded
+CHILD_CODE = """
+import sys, json, time, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+heavy = [m for m in sys.argv[2].split(",") if m in sys.modules]
+print(json.dumps({"seconds": seconds, "heavy": heavy}))
+"""
+
+
+def time_import(module):
+    """Import module in a fresh interpreter; returns (seconds, heavy modules)."""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, module, ",".join(HEAVY_MODULES)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["seconds"], report["heavy"]
+
+
+def run_benchmark(modules, runs):
+    """Return [(module, median seconds, heavy modules, error)]."""
+    results = []
+    for module in modules:
+        try:
+            samples = [time_import(module) for _ in range(runs)]
+        except RuntimeError as e:
+            results.append((module, None, [], str(e)))
+            continue
+        seconds = statistics.median(s for s, _ in samples)
+        results.append((module, seconds, samples[-1][1], None))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time cold imports of helpers")
+    parser.add_argument("modules", nargs="*", default=HELPER_MODULES)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SEC)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args(argv)
+
+    failed = 0
+    print(f"{'Module':45} {'Import (ms)':>12}  Status")
+    for module, seconds, heavy, error in run_benchmark(args.modules, args.runs):
+        if error:
+            status, shown = f"FAILED: {error}", "-"
+        elif heavy:
+            status, shown = f"LOADS {', '.join(heavy)}", f"{seconds * 1000:.1f}"
+        elif seconds > args.budget:
+            status, shown = "OVER BUDGET", f"{seconds * 1000:.1f}"
+        else:
+            status, shown = "OK", f"{seconds * 1000:.1f}"
+        failed += status != "OK"
+        print(f"{module:45} {shown:>12}  {status}")
+
+    print(f"\nBudget: {args.budget * 1000:.0f} ms per module, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import re
+import sys
+import glob
+import time
+import argparse
+from difflib import get_close_matches
+
+from src import month_typos
+from src.month_typos import MONTHS, fix_month_typo
+
+# ==================================================
+# MONTH-TYPO CORRECTOR MICRO-BENCHMARK
+# ==================================================
+# Times the shared fix_month_typo (confusion table + LRU memo) against the
+# per-word difflib version the extraction scripts used to carry, on the
+# OCR'd sample pages in data/interim. Two inputs: the date-like phrases of
+# the pages (what normalize_date sees) and every line (many more words).
+#
+#     python -m src.benchmarks.month_typos
+SAMPLE_GLOB = "data/interim/*_text.txt"
+ROUNDS = 20
+
+DATE_PHRASE = re.compile(r"\b[A-Za-z0-9]{3,9}\.?,?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}")
+
+
+def difflib_fix_month_typo(raw_date):
+    """The corrector as previously copied into each extraction script."""
+    for word in raw_date.split():
+        matches = get_close_matches(word, MONTHS, n=1, cutoff=0.7)
+        if matches:
+            raw_date = raw_date.replace(word, matches[0])
+    return raw_date
+
+
+def load_inputs(pattern):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            texts.append(f.read())
+    phrases = [m.group(0) for text in texts for m in DATE_PHRASE.finditer(text)]
+    lines = [line for text in texts for line in text.split("\n") if line.strip()]
+    return {"date phrases": phrases, "lines": lines}
+
+
+def time_rounds(fn, inputs, rounds):
+    """Return seconds per call for the first round and the later rounds."""
+    start = time.perf_counter()
+    for raw in inputs:
+        fn(raw)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds - 1):
+        for raw in inputs:
+            fn(raw)
+    rest = time.perf_counter() - start
+    return first / len(inputs), rest / max(1, (rounds - 1) * len(inputs))
+
+
+def build_table():
+    """Rebuild the confusion table; returns the seconds it took."""
+    month_typos.confusion_table.cache_clear()
+    month_typos._closest_month.cache_clear()
+    start = time.perf_counter()
+    month_typos.confusion_table()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fix_month_typo")
+    parser.add_argument("--samples", default=SAMPLE_GLOB)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args(argv)
+
+    inputs = load_inputs(args.samples)
+    if not inputs["lines"]:
+        sys.exit(f"no sample pages match {args.samples}")
+
+    print(f"Confusion table: {len(month_typos.confusion_table())} words, ", end="")
+    print(f"built in {build_table() * 1000:.1f} ms (once per process)")
+
+    for name, items in inputs.items():
+        build_table()  # first round starts with an empty LRU memo
+        old_first, old_rest = time_rounds(difflib_fix_month_typo, items, args.rounds)
+        new_first, new_rest = time_rounds(fix_month_typo, items, args.rounds)
+        changed = [
+            (raw, difflib_fix_month_typo(raw), fix_month_typo(raw))
+            for raw in items
+            if difflib_fix_month_typo(raw) != fix_month_typo(raw)
+        ]
+
+        print(f"\n{name}: {len(items)} strings, {args.rounds} rounds")
+        print(f"{'':12} {'first (us)':>12} {'repeat (us)':>12}")
+        print(f"{'difflib':12} {old_first * 1e6:>12.1f} {old_rest * 1e6:>12.1f}")
+        print(f"{'shared':12} {new_first * 1e6:>12.1f} {new_rest * 1e6:>12.1f}")
+        print(
+            f"Speedup: {old_first / new_first:.1f}x first, "
+            f"{old_rest / new_rest:.1f}x repeat"
+        )
+        print(f"Corrected differently: {len(changed)}")
+        for raw, old, new in changed[:10]:
+            print(f"  {raw!r}: {old!r} -> {new!r}")
+
+
+if __name__ == "__main__":
+    main()
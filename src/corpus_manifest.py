@@ -0,0 +1,135 @@
+import os
+import gzip
+import json
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+# ==================================================
+# MANIFEST FORMAT
+# ==================================================
+# A gzip-compressed JSON-lines file with one record per source folder:
+#
+#   {"folder": "...", "mtime_ns": ..., "status": "planned",
+#    "pages": [[page, size, mtime_ns], ...]}
+#
+# status is planned | no_xml | no_ranges. size and mtime_ns are null for a
+# page listed in the XML whose .tif is not on disk. A folder is re-scanned
+# only when its directory mtime changes (files added, removed or renamed).
+PAGE_RANGE_TAGS = ["abstract-pages", "description-pages", "claims-pages"]
+MANIFEST_WORKERS = 32
+
+
+def stream_page_ranges(xml_path):
+    """Read page ranges (abstract, description, claims) with a streaming parser.
+
+    Same result as get_page_ranges(), but parsing stops as soon as all three
+    range elements have been seen instead of building the whole tree.
+    """
+    found = {}
+    for _, elem in ET.iterparse(xml_path, events=("end",)):
+        if elem.tag in PAGE_RANGE_TAGS and elem.tag not in found:
+            begin = elem.find("begin")
+            end = elem.find("end")
+            if begin is not None and end is not None:
+                found[elem.tag] = (int(begin.text), int(end.text))
+            else:
+                found[elem.tag] = None
+            if len(found) == len(PAGE_RANGE_TAGS):
+                break
+
+    return [found[tag] for tag in PAGE_RANGE_TAGS if found.get(tag)]
+
+
+def scan_folder(source_root, folder, mtime_ns):
+    """Build the manifest record for one folder from a single directory listing."""
+    folder_path = os.path.join(source_root, folder)
+    xml_name = None
+    images = {}
+
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            name = entry.name.lower()
+            if name.endswith(".xml"):
+                if xml_name is None or entry.name < xml_name:
+                    xml_name = entry.name
+            elif name.endswith(".tif"):
+                # DirEntry.stat() comes from the listing itself on Windows
+                stat = entry.stat()
+                images[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+    record = {"folder": folder, "mtime_ns": mtime_ns, "status": "planned", "pages": []}
+    if xml_name is None:
+        record["status"] = "no_xml"
+        return record
+
+    page_ranges = stream_page_ranges(os.path.join(folder_path, xml_name))
+    if not page_ranges:
+        record["status"] = "no_ranges"
+        return record
+
+    for start, end in page_ranges:
+        for page in range(start, end + 1):
+            size, page_mtime = images.get(f"{page:08d}.tif", (None, None))
+            record["pages"].append([page, size, page_mtime])
+    return record
+
+
+def load_manifest(path):
+    """Return {folder: record} from a manifest file (empty if it does not exist)."""
+    if not os.path.exists(path):
+        return {}
+    manifest = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            manifest[record["folder"]] = record
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically so a crash never leaves it half-written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for folder in sorted(manifest):
+            f.write(json.dumps(manifest[folder], separators=(",", ":")) + "\n")
+    os.replace(tmp_path, path)
+
+
+def build_manifest(source_root, path, workers=MANIFEST_WORKERS, include=None):
+    """Bring the manifest at path up to date with source_root.
+
+    Only new folders and folders whose directory mtime changed are scanned,
+    in parallel threads since the work is dominated by filesystem latency.
+    include(folder_name), when given, selects the folders to track (e.g. one
+    node's shard); the others are skipped by name before being touched.
+    Returns (manifest, changed_folders).
+    """
+    previous = load_manifest(path)
+
+    current = {}
+    with os.scandir(source_root) as entries:
+        for entry in entries:
+            if include is not None and not include(entry.name):
+                continue
+            if entry.is_dir():
+                current[entry.name] = entry.stat().st_mtime_ns
+
+    changed = {
+        folder
+        for folder, mtime_ns in current.items()
+        if folder not in previous or previous[folder]["mtime_ns"] != mtime_ns
+    }
+
+    manifest = {folder: previous[folder] for folder in current if folder not in changed}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = executor.map(
+            lambda folder: scan_folder(source_root, folder, current[folder]),
+            sorted(changed),
+        )
+        for record in records:
+            manifest[record["folder"]] = record
+
+    if changed or len(manifest) != len(previous):
+        save_manifest(path, manifest)
+    return manifest, changed
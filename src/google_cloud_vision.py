@@ -1,13 +1,64 @@
 import os
 import time
 import csv
+import json
+import argparse
+import queue
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
 from datetime import datetime
+import grpc
 from google.cloud import vision
+from google.cloud.vision_v1.services.image_annotator.transports import (
+    ImageAnnotatorGrpcAsyncIOTransport,
+    ImageAnnotatorGrpcTransport,
+)
 import xml.etree.ElementTree as ET
 from tqdm import tqdm
 from contextlib import redirect_stderr
 from io import StringIO
 
+from src.corpus_manifest import build_manifest
+from src.image_optimizer import optimize_image
+from src.page_classifier import classify_page
+from src.page_layout import encode_layout, layout_from_response, layout_path
+from src.page_prep import prepare_page
+from src.ocr_archive import ResponseArchive, content_key
+from src.ocr_metrics import (
+    PERCENTILES,
+    STAGE_LABELS,
+    STAGES,
+    RunMetrics,
+    write_metrics,
+)
+from src.ocr_shards import ShardStore
+from src.run_ledger import RunLedger
+from src.sharding import (
+    ShardLease,
+    add_shard_argument,
+    in_shard,
+    orphaned_shards,
+    output_shards,
+    shard_output_path,
+    shard_tag,
+)
+from src.vision_retry import (
+    AsyncRetryController,
+    RetriesExhausted,
+    RetryController,
+    VisionPageError,
+    is_retryable,
+)
+
 # ==================================================
 # PATH & ENVIRONMENT CONFIGURATION
 # ==================================================
@@ -25,28 +76,685 @@ os.makedirs(LOG_DIR, exist_ok=True)
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 DETAILED_LOG = os.path.join(LOG_DIR, f"detailed_log_{timestamp}.txt")
 SUMMARY_LOG = os.path.join(LOG_DIR, f"summary_report_{timestamp}.txt")
+METRICS_LOG = os.path.join(LOG_DIR, f"metrics_{timestamp}.json")
 RUN_HISTORY = os.path.join(LOG_DIR, "run_summary_history.csv")
 
+# The optional features below are off by default, so with the defaults a run
+# OCRs one page at a time into one text file per page, as it always has.
+
+# OCR text output:
+# "text"   -> one {page:08d}_text.txt per page under OUTPUT_ROOT/<folder>
+# "shards" -> compressed JSON-lines shards with an offset index in SHARD_DIR;
+#             `python -m src.ocr_shards SHARD_DIR OUTPUT_ROOT` exports them
+#             to the text-file layout
+OUTPUT_MODE = "text"
+SHARD_DIR = OUTPUT_ROOT + "_shards"
+
+# Keep line/block geometry from full_text_annotation next to the text
+# ({page:08d}_layout.bin, or inside the shard record) for header location
+LAYOUT_ENABLED = False
+
+# Extract metadata from each folder's first page as soon as it is written,
+# through a bounded in-memory queue, into STREAM_OUTPUT (see
+# src/services/metadata_stream.py) instead of re-reading the text later
+STREAM_EXTRACTION = False
+STREAM_QUEUE_SIZE = 64  # first pages waiting for extraction before OCR waits
+STREAM_OUTPUT = os.path.join(LOG_DIR, f"metadata_stream_{timestamp}.csv")
+
+# Raw AnnotateImageResponse archive keyed by image hash (never pay twice)
+ARCHIVE_ENABLED = False
+ARCHIVE_DIR = r"C:\Users\shiri\Dropbox\ocr_patents\vision_archive"
+
+# Recompress page images before upload (grayscale/bilevel, capped DPI)
+OPTIMIZE_ENABLED = False
+OPTIMIZE_MODE = "bilevel"  # "bilevel" (G4 TIFF / PNG) or "gray" (PNG)
+OPTIMIZE_MAX_DPI = 300
+
+# Blank / drawing page screening before OCR
+CLASSIFY_ENABLED = False
+# What to do with low-priority (mostly line-art) pages:
+# "ocr"   -> OCR them now, tagged as drawings in the detailed log
+# "defer" -> leave them pending; a later run with "ocr" picks them up
+LOW_PRIORITY_POLICY = "ocr"
+
+# Local run state, kept outside Dropbox: an open SQLite database must not
+# be synced, and the manifest is rewritten as a whole.
+STATE_DIR = os.path.join(os.path.expanduser("~"), "ocr_patents_state")
+
+# SQLite run ledger (page status, attempts, latency, bytes, running totals)
+LEDGER_ENABLED = False
+LEDGER_PATH = os.path.join(STATE_DIR, "ledger.db")
+
+# Corpus manifest: planned pages with sizes/mtimes, updated incrementally
+MANIFEST_ENABLED = False
+MANIFEST_PATH = os.path.join(STATE_DIR, "manifest.jsonl.gz")
+
+# ==================================================
+# OCR CONCURRENCY CONFIGURATION
+# ==================================================
+# "sequential" -> one page at a time (original behaviour)
+# "concurrent" -> up to MAX_IN_FLIGHT requests in flight over pooled clients
+# "batch"      -> several pages per batch_annotate_images request
+# "async"      -> asyncio workers pulling pages of every folder from one queue
+# "pipeline"   -> image work in a process pool, uploads in MAX_IN_FLIGHT threads
+OCR_MODE = "sequential"
+CLIENT_POOL_SIZE = 4  # long-lived gRPC channels shared by all requests
+MAX_IN_FLIGHT = 32  # OCR requests waiting on the network at any one time
+
+BATCH_MAX_IMAGES = 16  # Vision API limit on images per batch request
+BATCH_MAX_BYTES = 7 * 1024 * 1024  # raw bytes; stays under the 10 MB request cap
+BATCH_IN_FLIGHT = 4  # batch requests outstanding at once in batch mode
+
+ASYNC_WORKERS = 32  # asyncio workers (= requests in flight) in async mode
+ASYNC_QUEUE_SIZE = 256  # planned pages buffered ahead of the workers
+
+PREP_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # pipeline mode image workers
+PREP_QUEUE_SIZE = 64  # prepared pages buffered ahead of the upload threads
+
+# Page scheduling:
+# "folder"       -> each folder's pages together, folder after folder
+# "header_first" -> the lowest-numbered page of every folder first (the page
+#                   all metadata extractors read), then the remaining pages
+SCHEDULE = "folder"
+
+# ==================================================
+# RETRY & ADAPTIVE CONCURRENCY
+# ==================================================
+# Quota and availability errors (RESOURCE_EXHAUSTED, UNAVAILABLE, deadlines)
+# are retried with jittered exponential backoff. The in-flight limit adapts
+# (AIMD): it starts at the mode's maximum (MAX_IN_FLIGHT, BATCH_IN_FLIGHT,
+# ASYNC_WORKERS, or 1 when sequential), halves when the API throttles and
+# creeps back up as requests succeed.
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 1.0  # seconds; the backoff cap doubles on every attempt
+RETRY_MAX_DELAY = 60.0
+MIN_IN_FLIGHT = 1  # the adaptive limit never drops below this
+
+# Pages still failing after RETRY_MAX_ATTEMPTS are dead-lettered: appended to
+# DEAD_LETTER_LOG and marked "dead" in the ledger so routine runs skip them.
+DEAD_LETTER_LOG = os.path.join(LOG_DIR, "dead_letter.jsonl")
+REDRIVE_DEAD_LETTERS = False  # True -> queue dead-lettered pages again this run
+
+# Send OCR requests to a local stand-in (python -m src.vision_stub_server)
+# instead of the real API, e.g. "localhost:50051"; None -> the real API
+VISION_ENDPOINT = None
+ENDPOINT_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+# ==================================================
+# MULTI-NODE SHARDING
+# ==================================================
+# `--shard i/N` runs node i of N over its own slice of the folders (see
+# src/sharding.py). Each node writes its own logs, run history, dead letters
+# and archive directory, and holds a lease under LEASE_DIR on the shared
+# output directory, renewed every LEASE_TTL/3 seconds. A node that finishes
+# its shard takes over any shard whose lease has gone LEASE_TTL seconds
+# without renewal (its node crashed). Leases on a synced folder are
+# best-effort (see src/sharding.py): set LEASE_TAKEOVER = False when every
+# shard has its own machine. Merge the per-node CSVs afterwards with
+# python -m src.sharding MERGED.csv run_summary_history_shard*.csv
+LEASE_DIR = OUTPUT_ROOT + "_leases"
+LEASE_TTL = 300
+LEASE_TAKEOVER = True
+
+TEXT_DETECTION = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+
+_client_pool = []
+_client_cycle = None
+_client_lock = threading.Lock()
+
+_archive = None
+_archive_lock = threading.Lock()
+
+_ledger = None
+
+_shards = None
+_shards_lock = threading.Lock()
+
+_retry = None
+_retry_lock = threading.Lock()
+
+_metrics = None  # RunMetrics for the current run, set by main()
+
+_shard = None  # (index, count) of this node when sharded, set by main()
+
+_stream = None  # MetadataStream when STREAM_EXTRACTION is on, set by main()
+
+_manifest = None  # {folder: record} when MANIFEST_ENABLED
+_manifest_changed = set()  # folders (re)scanned by this run's manifest update
+
+
+# ==================================================
+# VISION CLIENT POOL
+# ==================================================
+def make_vision_client():
+    """Create an ImageAnnotatorClient for the real API or VISION_ENDPOINT."""
+    if VISION_ENDPOINT is None:
+        return vision.ImageAnnotatorClient()
+    channel = grpc.insecure_channel(VISION_ENDPOINT, options=ENDPOINT_CHANNEL_OPTIONS)
+    return vision.ImageAnnotatorClient(
+        transport=ImageAnnotatorGrpcTransport(channel=channel)
+    )
+
+
+def make_async_vision_client():
+    """Create an ImageAnnotatorAsyncClient (call from inside the event loop)."""
+    if VISION_ENDPOINT is None:
+        return vision.ImageAnnotatorAsyncClient()
+    channel = grpc.aio.insecure_channel(
+        VISION_ENDPOINT, options=ENDPOINT_CHANNEL_OPTIONS
+    )
+    return vision.ImageAnnotatorAsyncClient(
+        transport=ImageAnnotatorGrpcAsyncIOTransport(channel=channel)
+    )
+
+
+def get_vision_client():
+    """Return a long-lived ImageAnnotatorClient from a small round-robin pool."""
+    global _client_cycle
+    with _client_lock:
+        if not _client_pool:
+            _client_pool.extend(make_vision_client() for _ in range(CLIENT_POOL_SIZE))
+            _client_cycle = itertools.cycle(_client_pool)
+        return next(_client_cycle)
+
+
+# ==================================================
+# RETRY CONTROLLER
+# ==================================================
+def get_retry_controller():
+    """Return the shared RetryController for threaded and sequential modes."""
+    global _retry
+    with _retry_lock:
+        if _retry is None:
+            ceiling = {"sequential": 1, "batch": BATCH_IN_FLIGHT}.get(
+                OCR_MODE, MAX_IN_FLIGHT
+            )
+            _retry = RetryController(
+                ceiling,
+                RETRY_MAX_ATTEMPTS,
+                RETRY_BASE_DELAY,
+                RETRY_MAX_DELAY,
+                MIN_IN_FLIGHT,
+            )
+        return _retry
+
+
+# ==================================================
+# RESPONSE ARCHIVE
+# ==================================================
+def get_archive():
+    """Return the shared ResponseArchive, or None when archiving is disabled."""
+    global _archive
+    if not ARCHIVE_ENABLED:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            if _shard is None:
+                _archive = ResponseArchive(ARCHIVE_DIR)
+            else:
+                # Append only to this node's directory; read everyone's
+                node_dir = os.path.join(ARCHIVE_DIR, shard_tag(_shard))
+                _archive = ResponseArchive(node_dir, read_roots=archive_roots())
+        return _archive
+
+
+def archive_roots():
+    """Return ARCHIVE_DIR and every node directory inside it."""
+    roots = [ARCHIVE_DIR]
+    if os.path.isdir(ARCHIVE_DIR):
+        for name in sorted(os.listdir(ARCHIVE_DIR)):
+            path = os.path.join(ARCHIVE_DIR, name)
+            if name.startswith("shard") and os.path.isdir(path):
+                roots.append(path)
+    return roots
+
+
+def archived_response(content):
+    """Look up image bytes in the archive.
+
+    Returns (key, response); response is None on a miss, and key is None
+    when archiving is disabled.
+    """
+    if get_archive() is None:
+        return None, None
+
+    key = content_key(content)
+    return key, lookup_archive(key)
+
+
+def lookup_archive(key):
+    """Return the archived AnnotateImageResponse for a key, or None."""
+    archive = get_archive()
+    payload = archive.get(key) if archive is not None else None
+    if payload is None:
+        return None
+    return vision.AnnotateImageResponse.deserialize(payload)
+
+
+def archive_response(key, response):
+    """Store a successful AnnotateImageResponse under its image key."""
+    archive = get_archive()
+    if archive is None or key is None or response.error.message:
+        return
+    archive.put(key, vision.AnnotateImageResponse.serialize(response))
+
+
+# ==================================================
+# PAGE OUTPUT
+# ==================================================
+def get_shard_store():
+    """Return the shared ShardStore (only used when OUTPUT_MODE is "shards")."""
+    global _shards
+    with _shards_lock:
+        if _shards is None:
+            owned = output_shards(*_shard) if _shard is not None else None
+            _shards = ShardStore(SHARD_DIR, owned)
+        return _shards
+
+
+def output_exists(job):
+    """True if OCR text for this page has already been written."""
+    if OUTPUT_MODE == "shards":
+        return (job["folder"], job["page"]) in get_shard_store()
+    return os.path.exists(job["out_file"])
+
+
+def make_output_dir(folder):
+    if OUTPUT_MODE != "shards":
+        os.makedirs(os.path.join(OUTPUT_ROOT, folder), exist_ok=True)
+
+
+def write_output(job, text):
+    """Store one page's OCR text; returns where it went, for the detailed log."""
+    layout = job.get("layout")
+    if OUTPUT_MODE == "shards":
+        path, offset, _ = get_shard_store().put(
+            job["folder"], job["page"], text, layout
+        )
+        return f"{path}@{offset}"
+
+    with open(job["out_file"], "w", encoding="utf-8") as f:
+        f.write(text)
+    if layout is not None:
+        with open(layout_path(job["out_file"]), "wb") as f:
+            f.write(layout)
+    return job["out_file"]
+
+
+# ==================================================
+# RUN LEDGER
+# ==================================================
+def get_ledger():
+    """Return the shared RunLedger, or None when the ledger is disabled."""
+    global _ledger
+    if not LEDGER_ENABLED:
+        return None
+    if _ledger is None:
+        _ledger = RunLedger(LEDGER_PATH)
+        if not _ledger.has_total("pages_billed"):
+            # First run with a ledger: carry over the CSV history once
+            _ledger.seed_total("pages_billed", history_billed_pages())
+    return _ledger
+
+
+def history_billed_pages():
+    """Sum billed pages over RUN_HISTORY (used when no ledger total exists)."""
+    if not os.path.exists(RUN_HISTORY):
+        return 0
+    with open(RUN_HISTORY, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return sum(
+            int(row["pages_extracted"]) - int(row.get("pages_from_archive") or 0)
+            for row in reader
+        )
+
+
+# ==================================================
+# PAGE SCREENING
+# ==================================================
+class PageScreened(Exception):
+    """Raised when the page classifier keeps a page from being sent for OCR."""
+
+    def __init__(self, status, density, text_lines):
+        super().__init__(f"{status} (ink {density:.2%}, {text_lines} text lines)")
+        self.status = status  # "blank" or "deferred"
+
+
+def screen_page(content, job=None):
+    """Classify a page before upload, raising PageScreened to hold it back.
+
+    Pages the classifier cannot decode are sent to OCR unchanged.
+    """
+    if not CLASSIFY_ENABLED:
+        return
+
+    try:
+        label, density, text_lines = classify_page(content)
+    except Exception:
+        return
+
+    apply_page_class(job, label, density, text_lines)
+
+
+def apply_page_class(job, label, density, text_lines):
+    """Act on a classifier label, raising PageScreened for pages held back."""
+    if job is not None:
+        job["page_class"] = label
+    if label == "skip":
+        raise PageScreened("blank", density, text_lines)
+    if label == "low_priority" and LOW_PRIORITY_POLICY == "defer":
+        raise PageScreened("deferred", density, text_lines)
+
+
+# ==================================================
+# UPLOAD PAYLOAD OPTIMIZATION
+# ==================================================
+def prepare_upload(content, job=None):
+    """Return the bytes to upload for a page, recompressed when enabled.
+
+    The archive is always keyed on the original bytes, so this runs only
+    after an archive miss. Pages Pillow cannot decode are sent unchanged.
+    """
+    if not OPTIMIZE_ENABLED:
+        return content
+
+    try:
+        payload = optimize_image(content, OPTIMIZE_MODE, OPTIMIZE_MAX_DPI)
+    except Exception:
+        payload = content
+
+    if job is not None:
+        job["bytes_saved"] = len(content) - len(payload)
+    return payload
+
 
 # ==================================================
 # TEXT DETECTION FUNCTION
 # ==================================================
-def detect_text(image_path):
-    """Extract text from an image using Google Cloud Vision OCR."""
-    client = vision.ImageAnnotatorClient()
+def annotate_image(content, client=None, job=None):
+    """Return (AnnotateImageResponse, from_archive) for raw image bytes.
+
+    The archive is checked first; the API is only called on a miss.
+    """
+    key, response = archived_response(content)
+    if response is not None:
+        return response, True
+
+    screen_page(content, job)
+    payload = prepare_upload(content, job)
+    response = request_text_detection(payload, client)
+    note_transfer(job, payload, response)
+    archive_response(key, response)
+    return response, False
+
+
+def request_text_detection(payload, client=None):
+    """Send one TEXT_DETECTION request through the retry controller.
+
+    Unless a client is given, every attempt takes the next pooled client.
+    """
+
+    def attempt():
+        response = (client or get_vision_client()).text_detection(
+            image=vision.Image(content=payload)
+        )
+        check_response(response)
+        return response
+
+    return get_retry_controller().call(attempt)
+
+
+def annotate_text(content, client=None, job=None):
+    """Return (page text, from_archive) for raw image bytes."""
+    response, from_archive = annotate_image(content, client, job)
+    return page_text(response, job), from_archive
+
+
+def response_text(response):
+    """Return the full page text of an AnnotateImageResponse, raising on errors."""
+    check_response(response)
+
+    texts = response.text_annotations
+    return texts[0].description if texts else ""
+
+
+def page_text(response, job=None):
+    """Return a page's text, keeping its encoded layout on the job if enabled."""
+    text = response_text(response)
+    if LAYOUT_ENABLED and job is not None:
+        layout = layout_from_response(response)
+        if layout is not None:
+            job["layout"] = encode_layout(layout)
+    return text
+
+
+def check_response(response):
+    """Raise VisionPageError if the API reported an error for this image."""
+    if response.error.message:
+        raise VisionPageError(response.error.code, response.error.message)
+
+
+def read_image(image_path):
+    """Read the raw bytes of one page image."""
     with open(image_path, "rb") as image_file:
-        content = image_file.read()
+        return image_file.read()
+
+
+def note_transfer(job, payload, response):
+    """Record the bytes uploaded and received for one page's API call."""
+    if job is not None:
+        job["bytes_sent"] = len(payload)
+        job["bytes_received"] = vision.AnnotateImageResponse.pb(response).ByteSize()
+
+
+def finish_timing(job, start, read_done):
+    """Set read, OCR and overall latency (ms) on a job from perf_counter marks."""
+    end = time.perf_counter()
+    job["read_ms"] = (read_done - start) * 1000
+    job["ocr_ms"] = (end - read_done) * 1000
+    job["latency_ms"] = (end - start) * 1000
+
+
+def detect_text(image_path, client=None):
+    """Extract text from an image using Google Cloud Vision OCR."""
+    content = read_image(image_path)
 
-    image = vision.Image(content=content)
     f = StringIO()
     with redirect_stderr(f):
-        response = client.text_detection(image=image)
+        text, _ = annotate_text(content, client)
+    return text
 
-    if response.error.message:
-        raise Exception(response.error.message)
 
-    texts = response.text_annotations
-    return texts[0].description if texts else ""
+def ocr_job(job):
+    """OCR one planned page, noting bytes, latency and archive hits on the job."""
+    # redirect_stderr swaps the process-wide sys.stderr, which is not safe
+    # from several worker threads at once, so workers call the API directly.
+    start = time.perf_counter()
+    content = read_image(job["image_path"])
+    read_done = time.perf_counter()
+    job["bytes"] = len(content)
+    text, job["from_archive"] = annotate_text(content, job=job)
+    finish_timing(job, start, read_done)
+    return text
+
+
+async def ocr_job_async(job, client, retry):
+    """OCR one planned page through an ImageAnnotatorAsyncClient."""
+    start = time.perf_counter()
+    content = await asyncio.to_thread(read_image, job["image_path"])
+    read_done = time.perf_counter()
+    job["bytes"] = len(content)
+    key, response = await asyncio.to_thread(archived_response, content)
+    job["from_archive"] = response is not None
+
+    if response is None:
+        await asyncio.to_thread(screen_page, content, job)
+        payload = await asyncio.to_thread(prepare_upload, content, job)
+        request = vision.AnnotateImageRequest(
+            image=vision.Image(content=payload), features=[TEXT_DETECTION]
+        )
+
+        async def attempt():
+            batch_response = await client.batch_annotate_images(requests=[request])
+            page_response = batch_response.responses[0]
+            check_response(page_response)
+            return page_response
+
+        response = await retry.call(attempt)
+        note_transfer(job, payload, response)
+        await asyncio.to_thread(archive_response, key, response)
+
+    finish_timing(job, start, read_done)
+    return page_text(response, job)
+
+
+def upload_prepared(job, prep):
+    """Upload stage of pipeline mode: OCR a page prepared in the process pool."""
+    start = time.perf_counter()
+    job["bytes"] = prep["bytes"]
+
+    response = lookup_archive(prep["key"])
+    job["from_archive"] = response is not None
+    if response is None:
+        if "page_class" in prep:
+            apply_page_class(
+                job, prep["page_class"], prep["density"], prep["text_lines"]
+            )
+        if "bytes_saved" in prep:
+            job["bytes_saved"] = prep["bytes_saved"]
+
+        response = request_text_detection(prep["payload"])
+        note_transfer(job, prep["payload"], response)
+        archive_response(prep["key"], response)
+
+    # The file was read in the prep process; this stage is the upload
+    job["read_ms"] = prep["read_ms"]
+    job["ocr_ms"] = (time.perf_counter() - start) * 1000
+    job["latency_ms"] = job["read_ms"] + job["ocr_ms"]
+    return page_text(response, job)
+
+
+# ==================================================
+# BATCHED TEXT DETECTION
+# ==================================================
+def make_batches(jobs):
+    """Group page jobs into batches bounded by image count and total bytes."""
+    batch = []
+    batch_bytes = 0
+    for job in jobs:
+        size = job.get("size")
+        if size is None:
+            try:
+                size = os.path.getsize(job["image_path"])
+            except OSError:
+                size = 0  # the read in ocr_batch reports the real error
+
+        if batch and (
+            len(batch) >= BATCH_MAX_IMAGES or batch_bytes + size > BATCH_MAX_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        batch.append(job)
+        batch_bytes += size
+
+    if batch:
+        yield batch
+
+
+def ocr_batch(batch):
+    """Worker entry point for batch mode: OCR several pages in one request.
+
+    Returns one (text, error) pair per job, in the same order as the batch,
+    so a single unreadable or rejected page does not fail its neighbours.
+    """
+    start = time.perf_counter()
+    results = [None] * len(batch)
+    requests = []
+    slots = []
+
+    for i, job in enumerate(batch):
+        read_start = time.perf_counter()
+        try:
+            content = read_image(job["image_path"])
+        except OSError as e:
+            results[i] = (None, e)
+            continue
+        job["read_ms"] = (time.perf_counter() - read_start) * 1000
+        job["bytes"] = len(content)
+
+        key, archived = archived_response(content)
+        if archived is not None:
+            job["from_archive"] = True
+            try:
+                results[i] = (page_text(archived, job), None)
+            except Exception as e:
+                results[i] = (None, e)
+            continue
+
+        try:
+            screen_page(content, job)
+        except PageScreened as e:
+            results[i] = (None, e)
+            continue
+
+        payload = prepare_upload(content, job)
+        requests.append(
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=payload), features=[TEXT_DETECTION]
+            )
+        )
+        slots.append((i, key, payload))
+
+    call_ms = 0.0
+    if requests:
+        call_start = time.perf_counter()
+        try:
+            response = get_retry_controller().call(
+                lambda: get_vision_client().batch_annotate_images(requests=requests)
+            )
+        except Exception as e:
+            # Only the pages that were sent share the request's failure
+            for i, _, _ in slots:
+                results[i] = (None, e)
+        else:
+            for (i, key, payload), page_response in zip(slots, response.responses):
+                try:
+                    text = batch_page_text(batch[i], key, payload, page_response)
+                    results[i] = (text, None)
+                except Exception as e:
+                    results[i] = (None, e)
+        call_ms = (time.perf_counter() - call_start) * 1000
+
+    # Pages in one request share its round trip
+    latency_ms = (time.perf_counter() - start) * 1000
+    sent = {i for i, _, _ in slots}
+    for i, job in enumerate(batch):
+        job["latency_ms"] = latency_ms
+        job["ocr_ms"] = call_ms if i in sent else 0.0
+    return results
+
+
+def batch_page_text(job, key, payload, page_response):
+    """Return the text of one page of a batch response.
+
+    A page throttled inside an otherwise successful batch is re-sent on its
+    own through the retry controller instead of re-sending the whole batch.
+    """
+    try:
+        check_response(page_response)
+    except VisionPageError as e:
+        if not is_retryable(e):
+            raise
+        page_response = request_text_detection(payload)
+
+    note_transfer(job, payload, page_response)
+    archive_response(key, page_response)
+    return page_text(page_response, job)
 
 
 # ==================================================
@@ -77,115 +785,912 @@ def get_page_ranges(xml_path):
 # ==================================================
 # COST CALCULATION
 # ==================================================
-def calculate_cost(total_pages_processed):
+def calculate_cost(total_pages_processed, archive_hits=0):
     """
     Calculate OCR cost for all processed pages.
     Every page is billed at $1.50 per 1000 units.
     No free-tier deduction.
+    Pages served from the response archive are not billed, so they are
+    passed separately and their would-be cost is reported as savings.
+    Returns (billed_cost, archive_savings).
     """
     COST_PER_1000 = 1.50
-    return (total_pages_processed / 1000) * COST_PER_1000
+    return (
+        (total_pages_processed / 1000) * COST_PER_1000,
+        (archive_hits / 1000) * COST_PER_1000,
+    )
 
 
 # ==================================================
-# MAIN EXECUTION
+# PAGE PLANNING & RESULT HANDLING
 # ==================================================
-def main():
-    start_time = time.time()
+def make_job(folder, page_num, size=None):
+    """Build the job dict describing one page to OCR."""
+    filename = f"{page_num:08d}.tif"
+    return {
+        "folder": folder,
+        "page": page_num,
+        "filename": filename,
+        "image_path": os.path.join(SOURCE_ROOT, folder, filename),
+        "out_file": os.path.join(OUTPUT_ROOT, folder, f"{page_num:08d}_text.txt"),
+        "size": size,
+    }
 
-    total_folders = 0
-    total_pages_processed = 0
-    total_skipped = 0
-    total_failed = 0
-    total_already_done = 0
 
-    with open(DETAILED_LOG, "w", encoding="utf-8") as log_file:
-        folders = [
-            f
-            for f in os.listdir(SOURCE_ROOT)
-            if os.path.isdir(os.path.join(SOURCE_ROOT, f))
-        ]
-
-        for folder in tqdm(folders, desc="Processing Folders", unit="folder"):
-            folder_path = os.path.join(SOURCE_ROOT, folder)
-            xml_files = [
-                f for f in os.listdir(folder_path) if f.lower().endswith(".xml")
-            ]
-
-            if not xml_files:
-                total_skipped += 1
-                log_file.write(f"[SKIPPED] Folder '{folder}' - no XML found\n")
-                continue
-
-            xml_path = os.path.join(folder_path, xml_files[0])
-            page_ranges = get_page_ranges(xml_path)
-
-            if not page_ranges:
-                total_skipped += 1
-                log_file.write(f"[SKIPPED] Folder '{folder}' - no page ranges found\n")
-                continue
-
-            out_folder = os.path.join(OUTPUT_ROOT, folder)
-            os.makedirs(out_folder, exist_ok=True)
-
-            all_pages = [
-                page for start, end in page_ranges for page in range(start, end + 1)
-            ]
-
-            for page_num in tqdm(all_pages, desc=f"{folder}", leave=False, unit="page"):
-                filename = f"{page_num:08d}.tif"
-                image_path = os.path.join(folder_path, filename)
-                out_file = os.path.join(out_folder, f"{page_num:08d}_text.txt")
-
-                if os.path.exists(out_file):
-                    total_already_done += 1
-                    log_file.write(f"[SKIPPED] Already processed {folder}/{filename}\n")
-                    continue
-
-                if not os.path.exists(image_path):
-                    total_skipped += 1
-                    log_file.write(f"[MISSING] {folder}/{filename}\n")
-                    continue
+def manifest_page_sizes(folder):
+    """Return {page: image size or None} from the manifest, or None without one."""
+    if _manifest is None or folder not in _manifest:
+        return None
+    return {page: size for page, size, _ in _manifest[folder]["pages"]}
+
 
+def read_folder_plan(folder):
+    """Return (status, pages) for a folder from the manifest or its XML.
+
+    Folders outside the manifest (another node's shard taken over after a
+    crash) are read from their XML.
+    """
+    if _manifest is not None and folder in _manifest:
+        record = _manifest[folder]
+        return record["status"], [page for page, _, _ in record["pages"]]
+
+    folder_path = os.path.join(SOURCE_ROOT, folder)
+    xml_files = [f for f in os.listdir(folder_path) if f.lower().endswith(".xml")]
+    if not xml_files:
+        return "no_xml", []
+
+    page_ranges = get_page_ranges(os.path.join(folder_path, xml_files[0]))
+    if not page_ranges:
+        return "no_ranges", []
+
+    return "planned", [
+        page for start, end in page_ranges for page in range(start, end + 1)
+    ]
+
+
+def log_skipped_folder(folder, status, log_file, counts):
+    counts["skipped"] += 1
+    reason = "no XML found" if status == "no_xml" else "no page ranges found"
+    log_file.write(f"[SKIPPED] Folder '{folder}' - {reason}\n")
+
+
+def plan_folder(folder, log_file, counts):
+    """Return the page jobs still to OCR for one folder, or None if skipped."""
+    status, all_pages = read_folder_plan(folder)
+    if status != "planned":
+        log_skipped_folder(folder, status, log_file, counts)
+        return None
+
+    make_output_dir(folder)
+    sizes = manifest_page_sizes(folder)
+
+    jobs = []
+    written = []
+    for page_num in all_pages:
+        job = make_job(folder, page_num, sizes and sizes.get(page_num))
+
+        if output_exists(job):
+            written.append(page_num)
+            counts["already_done"] += 1
+            log_file.write(f"[SKIPPED] Already processed {folder}/{job['filename']}\n")
+            continue
+
+        if sizes is not None:
+            missing = sizes.get(page_num) is None
+        else:
+            missing = not os.path.exists(job["image_path"])
+        if missing:
+            counts["skipped"] += 1
+            log_file.write(f"[MISSING] {folder}/{job['filename']}\n")
+            continue
+
+        jobs.append(job)
+    flag_header_job(jobs, min(written, default=None))
+    return jobs
+
+
+def flag_header_job(jobs, first_written):
+    """Mark the job of a folder's first text page for metadata streaming.
+
+    That is the lowest pending page, unless a lower page was already
+    written (first_written; its row came from the run that wrote it).
+    """
+    if jobs:
+        first = min(jobs, key=lambda job: job["page"])
+        if first_written is None or first_written > first["page"]:
+            first["header"] = True
+
+
+def plan_run(folders, log_file, counts):
+    """Yield (folder, jobs) for every folder; jobs is None for skipped folders.
+
+    Without the ledger each folder is planned from its XML and the output
+    and image files are checked page by page. With the ledger only folders
+    it has never planned are read from disk (so a folder skipped for a
+    missing XML or page ranges is looked at again every run); everything
+    else comes from a single indexed query for pending pages.
+    """
+    ledger = get_ledger()
+    if ledger is None:
+        for folder in folders:
+            yield folder, plan_folder(folder, log_file, counts)
+        return
+
+    statuses = ledger.folder_statuses()
+    for folder in folders:
+        if statuses.get(folder) == "planned" and folder not in _manifest_changed:
+            continue
+        status, pages = read_folder_plan(folder)
+        # Pages OCR'd before the ledger existed are adopted as done, once
+        done_pages = [page for page in pages if output_exists(make_job(folder, page))]
+        ledger.register_folder(folder, status, pages, done_pages)
+        statuses[folder] = status
+
+    pending = ledger.pending_pages(
+        include=("deferred",) if LOW_PRIORITY_POLICY == "ocr" else ()
+    )
+    first_done = ledger.first_done_pages()
+    # Only this call's folders: a shard taken over later in the same run
+    # plans again, and must not count this node's own done pages twice
+    done = ledger.done_counts()
+    counts["already_done"] += sum(done.get(folder, 0) for folder in folders)
+
+    for folder in folders:
+        if statuses[folder] != "planned":
+            log_skipped_folder(folder, statuses[folder], log_file, counts)
+            yield folder, None
+            continue
+
+        pages = pending.get(folder, [])
+        if pages:
+            make_output_dir(folder)
+        sizes = manifest_page_sizes(folder) or {}
+        jobs = [make_job(folder, page, sizes.get(page)) for page in pages]
+        flag_header_job(jobs, first_done.get(folder))
+        yield folder, jobs
+
+
+def record_page(job, text, error, log_file, counts):
+    """Write one OCR result to the configured output and update the counters."""
+    ledger = get_ledger()
+
+    if isinstance(error, FileNotFoundError):
+        counts["skipped"] += 1
+        log_file.write(f"[MISSING] {job['folder']}/{job['filename']}\n")
+        if ledger is not None:
+            ledger.mark_missing(job["folder"], job["page"])
+        return
+
+    if isinstance(error, PageScreened):
+        counts["blank_skipped" if error.status == "blank" else "deferred"] += 1
+        log_file.write(
+            f"[{error.status.upper()}] {job['folder']}/{job['filename']} - {error}\n"
+        )
+        if ledger is not None:
+            ledger.mark_screened(
+                job["folder"], job["page"], error.status, job.get("bytes")
+            )
+        return
+
+    if isinstance(error, RetriesExhausted):
+        counts["dead_lettered"] += 1
+        log_file.write(f"[DEAD] {job['folder']}/{job['filename']} - {error}\n")
+        append_dead_letter(job, error)
+        if ledger is not None:
+            ledger.mark_dead(
+                job["folder"],
+                job["page"],
+                str(error),
+                job.get("latency_ms"),
+                job.get("bytes"),
+            )
+        return
+
+    if error is not None:
+        counts["failed"] += 1
+        log_file.write(f"[FAILED] {job['folder']}/{job['filename']} - {str(error)}\n")
+        if ledger is not None:
+            ledger.mark_failed(
+                job["folder"],
+                job["page"],
+                str(error),
+                job.get("latency_ms"),
+                job.get("bytes"),
+            )
+        return
+
+    counts["processed"] += 1
+    source = ""
+    if job.get("from_archive"):
+        counts["archive_hits"] += 1
+        source = " (archive)"
+    elif "bytes_saved" in job:
+        counts["bytes_saved"] += job["bytes_saved"]
+        source = f" (saved {job['bytes_saved']} bytes)"
+    if job.get("page_class") == "low_priority":
+        source += " (drawing)"
+
+    write_start = time.perf_counter()
+    destination = write_output(job, text)
+    job["write_ms"] = (time.perf_counter() - write_start) * 1000
+    if job.get("latency_ms") is not None:
+        job["total_ms"] = job["latency_ms"] + job["write_ms"]
+    if _metrics is not None:
+        _metrics.add(job)
+
+    if ledger is not None:
+        ledger.mark_done(
+            job["folder"],
+            job["page"],
+            job.get("latency_ms"),
+            job.get("bytes"),
+            billed=not job.get("from_archive"),
+        )
+
+    log_file.write(
+        f"[SUCCESS] {job['folder']}/{job['filename']} -> {destination}{source}\n"
+    )
+
+    if _stream is not None and job.get("header"):
+        _stream.submit(
+            job["folder"], os.path.basename(job["out_file"]), text, job.get("layout")
+        )
+
+
+# ==================================================
+# DEAD LETTERS
+# ==================================================
+def append_dead_letter(job, error):
+    """Append a page whose retries ran out to DEAD_LETTER_LOG."""
+    record = {
+        "folder": job["folder"],
+        "page": job["page"],
+        "image_path": job["image_path"],
+        "error": str(error.error),
+        "attempts": error.attempts,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(DEAD_LETTER_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def redrive_dead_letters(log_file):
+    """Queue every dead-lettered page for OCR again in this run.
+
+    With the ledger, dead pages go back to pending. Without it they have no
+    output file and are planned anyway. DEAD_LETTER_LOG is moved aside, so
+    afterwards it lists only pages that fail again.
+    """
+    requeued = 0
+    if os.path.exists(DEAD_LETTER_LOG):
+        with open(DEAD_LETTER_LOG, encoding="utf-8") as f:
+            requeued = sum(1 for _ in f)
+        os.replace(
+            DEAD_LETTER_LOG,
+            DEAD_LETTER_LOG.replace(".jsonl", f"_redriven_{timestamp}.jsonl"),
+        )
+
+    ledger = get_ledger()
+    if ledger is not None:
+        requeued = ledger.requeue("dead")
+    log_file.write(f"[REDRIVE] {requeued} dead-lettered pages queued again\n")
+
+
+# ==================================================
+# SCHEDULING
+# ==================================================
+class FolderProgress:
+    """Counts a folder as processed once the last of its pages is recorded."""
+
+    def __init__(self, total_folders, counts):
+        self.counts = counts
+        self.remaining = {}
+        self.bar = tqdm(total=total_folders, desc="Processing Folders", unit="folder")
+
+    def add(self, folder, jobs):
+        """Register a planned folder; jobs is None for skipped folders."""
+        if jobs is None:
+            self.bar.update(1)
+        elif not jobs:
+            self._finish()
+        else:
+            self.remaining[folder] = len(jobs)
+
+    def page_done(self, job):
+        self.remaining[job["folder"]] -= 1
+        if self.remaining[job["folder"]] == 0:
+            self._finish()
+
+    def _finish(self):
+        self.counts["folders"] += 1
+        self.bar.update(1)
+
+    def close(self):
+        self.bar.close()
+
+
+def schedule_units(folders, log_file, counts, progress):
+    """Yield (label, jobs) work units in the order given by SCHEDULE.
+
+    With "folder" each unit is one folder, planned lazily. With
+    "header_first" the whole run is planned up front; the first unit holds
+    the lowest-numbered pending page of every folder, followed by one unit
+    per folder with its remaining pages.
+    """
+    planned = plan_run(folders, log_file, counts)
+
+    if SCHEDULE != "header_first":
+        for folder, jobs in planned:
+            progress.add(folder, jobs)
+            if jobs:
+                yield folder, jobs
+        return
+
+    planned = list(planned)
+    for folder, jobs in planned:
+        progress.add(folder, jobs)
+        if jobs:
+            jobs.sort(key=lambda job: job["page"])
+
+    header_jobs = [jobs[0] for _, jobs in planned if jobs]
+    if header_jobs:
+        yield "Header pages", header_jobs
+
+    for folder, jobs in planned:
+        if jobs and len(jobs) > 1:
+            yield folder, jobs[1:]
+
+
+# ==================================================
+# OCR EXECUTION MODES
+# ==================================================
+def run_sequential(folder, jobs, log_file, counts):
+    """OCR one folder's pages one after another."""
+    for job in tqdm(jobs, desc=f"{folder}", leave=False, unit="page"):
+        try:
+            f = StringIO()
+            with redirect_stderr(f):
+                text = ocr_job(job)
+        except Exception as e:
+            record_page(job, None, e, log_file, counts)
+            continue
+        record_page(job, text, None, log_file, counts)
+
+
+def stream_jobs(units, page_bar):
+    """Yield the pages of every work unit in turn, planning units lazily."""
+    for _, jobs in units:
+        page_bar.total += len(jobs)
+        page_bar.refresh()
+        yield from jobs
+
+
+def run_concurrent(units, log_file, counts, executor, progress):
+    """OCR every unit's pages with up to MAX_IN_FLIGHT requests outstanding.
+
+    Pages are drawn from the units in order whenever a request finishes, so
+    the next folder starts while the last pages of the one before are still
+    in flight. Results are handled on the calling thread as they complete,
+    so file writes, log lines and counters stay single-threaded.
+    """
+    in_flight = {}
+
+    with tqdm(total=0, desc="Pages", unit="page") as bar:
+        pending = stream_jobs(units, bar)
+        while True:
+            while len(in_flight) < MAX_IN_FLIGHT:
+                job = next(pending, None)
+                if job is None:
+                    break
+                in_flight[executor.submit(ocr_job, job)] = job
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
                 try:
-                    text = detect_text(image_path)
-                    total_pages_processed += 1
+                    text = future.result()
                 except Exception as e:
-                    total_failed += 1
-                    log_file.write(f"[FAILED] {folder}/{filename} - {str(e)}\n")
-                    continue
+                    record_page(job, None, e, log_file, counts)
+                else:
+                    record_page(job, text, None, log_file, counts)
+                bar.update(1)
+                progress.page_done(job)
 
-                with open(out_file, "w", encoding="utf-8") as f:
-                    f.write(text)
 
-                log_file.write(f"[SUCCESS] {folder}/{filename} -> {out_file}\n")
+def run_batched(units, log_file, counts, executor, progress):
+    """OCR every unit's pages in size- and byte-limited batch requests.
 
-            total_folders += 1
+    Batches are cut from the pages of all units in order, so one may span
+    the end of a folder and the start of the next, and BATCH_IN_FLIGHT
+    requests stay outstanding across folders. Each batch response is split
+    back into per-page results, so every page still gets its own [SUCCESS]
+    or [FAILED] line in the detailed log.
+    """
+    in_flight = {}
+
+    with tqdm(total=0, desc="Pages", unit="page") as bar:
+        pending = make_batches(stream_jobs(units, bar))
+        while True:
+            while len(in_flight) < BATCH_IN_FLIGHT:
+                batch = next(pending, None)
+                if batch is None:
+                    break
+                in_flight[executor.submit(ocr_batch, batch)] = batch
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(None, e)] * len(batch)
+
+                for job, (text, error) in zip(batch, results):
+                    record_page(job, text, error, log_file, counts)
+                    progress.page_done(job)
+                bar.update(len(batch))
+
+
+def make_prep_pool():
+    """Create the spawn-based process pool used for image work in pipeline mode.
+
+    spawn (never fork) keeps the children free of the parent's gRPC state;
+    they only read, hash, classify and recompress images.
+    """
+    return ProcessPoolExecutor(
+        max_workers=PREP_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+    )
 
-    elapsed = time.time() - start_time
 
-    # Historical tracking (for cumulative analysis)
-    prev_total = 0
+def run_pipelined(units, log_file, counts, prep_pool, progress):
+    """OCR every unit's pages through a three-stage pipeline.
+
+    prep processes -> bounded queue -> upload threads -> result queue -> here
+
+    Units are planned and results recorded on this thread, which hands new
+    pages to the feeder as results come back, so the stages stay full across
+    folder boundaries. The feeder keeps at most PREP_QUEUE_SIZE pages in the
+    process pool and blocks on the bounded queue when uploads fall behind,
+    so neither stage can run ahead of the other.
+    """
+    events = queue.Queue()  # ("job", job), ("prep", future) or ("end", None)
+    prepared = queue.Queue(maxsize=PREP_QUEUE_SIZE)
+    results = queue.Queue()
+
+    def feed():
+        in_flight = {}
+        waiting = deque()  # handed over while the pool is full
+        ended = False
+
+        def submit(job):
+            try:
+                future = prep_pool.submit(
+                    prepare_page,
+                    job["image_path"],
+                    CLASSIFY_ENABLED,
+                    OPTIMIZE_ENABLED,
+                    OPTIMIZE_MODE,
+                    OPTIMIZE_MAX_DPI,
+                )
+            except Exception as e:
+                # e.g. BrokenProcessPool: fail the page, so this thread's
+                # caller still gets one result per page
+                results.put((job, None, e))
+                return
+            in_flight[future] = job
+            future.add_done_callback(lambda future: events.put(("prep", future)))
+
+        try:
+            while not ended or in_flight:
+                kind, item = events.get()
+                if kind == "job":
+                    waiting.append(item)
+                elif kind == "prep":
+                    job = in_flight.pop(item)
+                    try:
+                        prep = item.result()
+                    except Exception as e:
+                        results.put((job, None, e))
+                    else:
+                        prepared.put((job, prep))
+                else:
+                    ended = True
+
+                while waiting and len(in_flight) < PREP_QUEUE_SIZE:
+                    submit(waiting.popleft())
+        finally:
+            for _ in range(MAX_IN_FLIGHT):
+                prepared.put(None)
+
+    def upload():
+        while True:
+            item = prepared.get()
+            if item is None:
+                return
+            job, prep = item
+            try:
+                text = upload_prepared(job, prep)
+            except Exception as e:
+                results.put((job, None, e))
+            else:
+                results.put((job, text, None))
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads += [
+        threading.Thread(target=upload, daemon=True) for _ in range(MAX_IN_FLIGHT)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Pages the stages can hold at once: the pool, the queue and the uploads
+    ahead = 2 * PREP_QUEUE_SIZE + MAX_IN_FLIGHT
+    outstanding = 0
+    planning = True
+    try:
+        with tqdm(total=0, desc="Pages", unit="page") as bar:
+            pending = stream_jobs(units, bar)
+            while True:
+                while planning and outstanding < ahead:
+                    job = next(pending, None)
+                    if job is None:
+                        planning = False
+                        events.put(("end", None))
+                    else:
+                        events.put(("job", job))
+                        outstanding += 1
+
+                if not outstanding:
+                    break
+
+                job, text, error = results.get()
+                outstanding -= 1
+                record_page(job, text, error, log_file, counts)
+                bar.update(1)
+                progress.page_done(job)
+    finally:
+        if planning:
+            events.put(("end", None))
+
+    for thread in threads:
+        thread.join()
+
+
+# ==================================================
+# ASYNC ENGINE (GLOBAL WORK QUEUE)
+# ==================================================
+async def run_async_engine(folders, log_file, counts):
+    """OCR every planned page of every folder from one bounded global queue.
+
+    A producer plans folders and feeds their pages into the queue (in
+    SCHEDULE order) while ASYNC_WORKERS workers take whichever page is next,
+    so a 40-page folder never holds up the 2-page folders behind it. A
+    folder is counted as processed when its last page finishes.
+    """
+    page_queue = asyncio.Queue(maxsize=ASYNC_QUEUE_SIZE)
+    retry = AsyncRetryController(
+        ASYNC_WORKERS,
+        RETRY_MAX_ATTEMPTS,
+        RETRY_BASE_DELAY,
+        RETRY_MAX_DELAY,
+        MIN_IN_FLIGHT,
+    )
+    clients = [make_async_vision_client() for _ in range(CLIENT_POOL_SIZE)]
+
+    progress = FolderProgress(len(folders), counts)
+    page_bar = tqdm(total=0, desc="Pages", unit="page")
+
+    async def producer():
+        for _, jobs in schedule_units(folders, log_file, counts, progress):
+            page_bar.total += len(jobs)
+            page_bar.refresh()
+            for job in jobs:
+                await page_queue.put(job)
+
+        for _ in range(ASYNC_WORKERS):
+            await page_queue.put(None)
+
+    async def worker(client):
+        while True:
+            job = await page_queue.get()
+            if job is None:
+                return
+            try:
+                text = await ocr_job_async(job, client, retry)
+            except Exception as e:
+                record_page(job, None, e, log_file, counts)
+            else:
+                record_page(job, text, None, log_file, counts)
+            page_bar.update(1)
+            progress.page_done(job)
+
+    try:
+        await asyncio.gather(
+            producer(),
+            *(worker(clients[i % len(clients)]) for i in range(ASYNC_WORKERS)),
+        )
+    finally:
+        counts["retries"] += retry.retries
+        page_bar.close()
+        progress.close()
+        for client in clients:
+            await client.transport.close()
+
+
+# ==================================================
+# RUN HISTORY
+# ==================================================
+RUN_HISTORY_FIELDS = [
+    "timestamp",
+    "folders_processed",
+    "pages_extracted",
+    "pages_failed",
+    "pages_skipped",
+    "total_time_sec",
+    "total_cost_usd",
+    "pages_from_archive",
+    "pages_per_sec",
+    "bytes_sent",
+    "bytes_received",
+] + [f"{stage}_ms_p{pct}" for stage in STAGES for pct in PERCENTILES]
+
+
+def append_run_history(row):
+    """Append one run to RUN_HISTORY, upgrading an older header in place."""
+    rows = None
     if os.path.exists(RUN_HISTORY):
         with open(RUN_HISTORY, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
-            prev_total = sum(int(row["pages_extracted"]) for row in reader)
+            if reader.fieldnames != RUN_HISTORY_FIELDS:
+                rows = list(reader)
+
+    if rows is not None:
+        # Older history files lack the newer columns; rewrite them once
+        with open(RUN_HISTORY, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=RUN_HISTORY_FIELDS, restval="0", extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
+    file_exists = os.path.exists(RUN_HISTORY)
+    with open(RUN_HISTORY, "a", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=RUN_HISTORY_FIELDS, restval="0")
+        if not file_exists:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+# ==================================================
+# MAIN EXECUTION
+# ==================================================
+def run_folders(folders, log_file, counts):
+    """Plan and OCR work units using the configured OCR_MODE.
+
+    Except in sequential mode, the pages of all units go through one
+    executor, so the next folder starts before the last one finishes.
+    """
+    executor = None
+    if OCR_MODE == "concurrent":
+        executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT)
+    elif OCR_MODE == "batch":
+        executor = ThreadPoolExecutor(max_workers=BATCH_IN_FLIGHT)
+    elif OCR_MODE == "pipeline":
+        executor = make_prep_pool()
+
+    retry = get_retry_controller()
+    retries_before = retry.retries
+    progress = FolderProgress(len(folders), counts)
+    units = schedule_units(folders, log_file, counts, progress)
+    try:
+        if OCR_MODE == "pipeline":
+            run_pipelined(units, log_file, counts, executor, progress)
+        elif OCR_MODE == "batch":
+            run_batched(units, log_file, counts, executor, progress)
+        elif OCR_MODE == "concurrent":
+            run_concurrent(units, log_file, counts, executor, progress)
+        else:
+            for label, jobs in units:
+                run_sequential(label, jobs, log_file, counts)
+                for job in jobs:
+                    progress.page_done(job)
+    finally:
+        counts["retries"] += retry.retries - retries_before
+        progress.close()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
 
-    grand_total = prev_total + total_pages_processed
-    total_cost = calculate_cost(grand_total)
+def run_ocr(folders, log_file, counts):
+    """OCR the given folders with the configured OCR_MODE."""
+    if OCR_MODE == "async":
+        asyncio.run(run_async_engine(folders, log_file, counts))
+    else:
+        run_folders(folders, log_file, counts)
+
+
+def run_sharded(folders, log_file, counts):
+    """OCR this node's shard under its lease, then shards orphaned by crashes.
+
+    folders are this node's own (load_folders filters them); the folders of
+    a shard taken over are listed only when it is taken over.
+    """
+    index, count = _shard
+
+    lease = ShardLease(LEASE_DIR, index, count, LEASE_TTL)
+    if lease.acquire():
+        with lease.held():
+            run_ocr(folders, log_file, counts)
+    else:
+        log_file.write(
+            f"[LEASE] Shard {index}/{count} is held by {lease.holder()}, skipped\n"
+        )
+
+    if not LEASE_TAKEOVER:
+        return
+
+    for other in orphaned_shards(LEASE_DIR, count, LEASE_TTL, exclude={index}):
+        lease = ShardLease(LEASE_DIR, other, count, LEASE_TTL)
+        previous = lease.holder()
+        if not lease.acquire(takeover=True):
+            continue
+
+        log_file.write(f"[TAKEOVER] Shard {other}/{count} from {previous}\n")
+        if OUTPUT_MODE == "shards":
+            get_shard_store().claim(output_shards(other, count))
+        with lease.held():
+            run_ocr(list_source_folders((other, count)), log_file, counts)
+
+
+def use_shard(shard):
+    """Point this node's logs and local state at shard-specific files."""
+    global _shard, DETAILED_LOG, SUMMARY_LOG, METRICS_LOG, RUN_HISTORY
+    global DEAD_LETTER_LOG, LEDGER_PATH, MANIFEST_PATH, STREAM_OUTPUT
+    _shard = shard
+    DETAILED_LOG = shard_output_path(DETAILED_LOG, shard)
+    SUMMARY_LOG = shard_output_path(SUMMARY_LOG, shard)
+    METRICS_LOG = shard_output_path(METRICS_LOG, shard)
+    RUN_HISTORY = shard_output_path(RUN_HISTORY, shard)
+    DEAD_LETTER_LOG = shard_output_path(DEAD_LETTER_LOG, shard)
+    LEDGER_PATH = shard_output_path(LEDGER_PATH, shard)
+    MANIFEST_PATH = shard_output_path(MANIFEST_PATH, shard)
+    STREAM_OUTPUT = shard_output_path(STREAM_OUTPUT, shard)
+
+
+def start_metadata_stream():
+    """Start the extraction thread fed by record_page with first pages."""
+    # Imported here: loading spaCy and dateparser only pays off when streaming
+    from src.services.metadata_stream import MetadataStream
+
+    return MetadataStream(STREAM_OUTPUT, STREAM_QUEUE_SIZE)
+
+
+def list_source_folders(shard=None):
+    """Return the source folders of shard (i, N), or all of them for None.
+
+    Folders are filtered by name first, so other shards' folders are never
+    stat'ed.
+    """
+    return [
+        f
+        for f in os.listdir(SOURCE_ROOT)
+        if in_shard(f, shard) and os.path.isdir(os.path.join(SOURCE_ROOT, f))
+    ]
+
+
+def load_folders():
+    """Return this node's folders, refreshing the manifest when enabled.
+
+    With --shard the manifest holds (and scans) only this node's shard.
+    """
+    global _manifest, _manifest_changed
+    if MANIFEST_ENABLED:
+        _manifest, _manifest_changed = build_manifest(
+            SOURCE_ROOT, MANIFEST_PATH, include=lambda f: in_shard(f, _shard)
+        )
+        return sorted(_manifest)
+
+    return list_source_folders(_shard)
+
+
+def main(shard=None):
+    global _metrics, _stream
+    start_time = time.time()
+    _metrics = RunMetrics()
+    if shard is not None:
+        use_shard(shard)
+
+    counts = {
+        "folders": 0,
+        "processed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "already_done": 0,
+        "archive_hits": 0,
+        "bytes_saved": 0,
+        "blank_skipped": 0,
+        "deferred": 0,
+        "dead_lettered": 0,
+        "retries": 0,
+        "metadata_rows": 0,
+    }
+
+    with open(DETAILED_LOG, "w", encoding="utf-8") as log_file:
+        folders = load_folders()
+        if REDRIVE_DEAD_LETTERS:
+            redrive_dead_letters(log_file)
+
+        if STREAM_EXTRACTION:
+            _stream = start_metadata_stream()
+        try:
+            if shard is None:
+                run_ocr(folders, log_file, counts)
+            else:
+                run_sharded(folders, log_file, counts)
+        finally:
+            if _stream is not None:
+                counts["metadata_rows"] = _stream.close()
+                for folder, message in _stream.errors:
+                    log_file.write(f"[EXTRACT FAILED] {folder} - {message}\n")
+                _stream = None
+
+    total_folders = counts["folders"]
+    total_pages_processed = counts["processed"]
+    total_skipped = counts["skipped"]
+    total_failed = counts["failed"]
+    total_already_done = counts["already_done"]
+    total_archive_hits = counts["archive_hits"]
+
+    elapsed = time.time() - start_time
+
+    # Historical tracking (for cumulative analysis of billed pages)
+    ledger = get_ledger()
+    if ledger is not None:
+        # Kept current page by page, no history rescan needed
+        grand_total = int(ledger.total("pages_billed"))
+    else:
+        prev_total = history_billed_pages()
+        grand_total = prev_total + total_pages_processed - total_archive_hits
+    total_cost, archive_savings = calculate_cost(grand_total, total_archive_hits)
+
+    metrics = _metrics.summary(elapsed)
+    stages = metrics["stages_ms"]
 
     summary_lines = [
         "\nSUMMARY REPORT",
         "=" * 50,
         f"{'Folders Processed:':25} {total_folders:>10}",
         f"{'Pages Extracted:':25} {total_pages_processed:>10}",
+        f"{'Pages From Archive:':25} {total_archive_hits:>10}",
         f"{'Pages Skipped:':25} {total_skipped:>10}",
+        f"{'Pages Skipped (Blank):':25} {counts['blank_skipped']:>10}",
+        f"{'Pages Deferred (Drawing):':25} {counts['deferred']:>10}",
         f"{'Pages Already Done:':25} {total_already_done:>10}",
         f"{'Pages Failed OCR:':25} {total_failed:>10}",
+        f"{'Pages Dead-Lettered:':25} {counts['dead_lettered']:>10}",
+        f"{'Requests Retried:':25} {counts['retries']:>10}",
+        f"{'Upload Bytes Saved:':25} {counts['bytes_saved']:>10}",
+        f"{'Metadata Rows Streamed:':25} {counts['metadata_rows']:>10}",
         "-" * 50,
         f"{'Total Time (sec):':25} {elapsed:.2f}",
+        f"{'Pages / Second:':25} {metrics['pages_per_sec']:>10.2f}",
+        f"{'MB Sent:':25} {metrics['bytes_sent'] / 1e6:>10.2f}",
+        f"{'MB Received:':25} {metrics['bytes_received'] / 1e6:>10.2f}",
+        f"{'Latency (ms)':25} {'p50':>8} {'p95':>8} {'p99':>8}",
+        *(
+            f"{'  ' + STAGE_LABELS[stage] + ':':25} "
+            + " ".join(f"{stages[stage][f'p{pct}']:>8.0f}" for pct in PERCENTILES)
+            for stage in STAGES
+        ),
+        "-" * 50,
         f"{'Cumulative Pages:':25} {grand_total:>10}",
         f"{'Estimated OCR Cost (USD):':25} {total_cost:>10.4f}",
+        f"{'Archive Savings (USD):':25} {archive_savings:>10.4f}",
         "=" * 50,
         "\nExtraction Completed Successfully!\n",
     ]
@@ -196,33 +1701,48 @@ def main():
         f.write("\n".join(summary_lines))
 
     # Append run summary to CSV history
-    file_exists = os.path.exists(RUN_HISTORY)
-    with open(RUN_HISTORY, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(
-                [
-                    "timestamp",
-                    "folders_processed",
-                    "pages_extracted",
-                    "pages_failed",
-                    "pages_skipped",
-                    "total_time_sec",
-                    "total_cost_usd",
-                ]
-            )
-        writer.writerow(
-            [
-                timestamp,
-                total_folders,
-                total_pages_processed,
-                total_failed,
-                total_skipped,
-                round(elapsed, 2),
-                round(total_cost, 4),
-            ]
-        )
+    append_run_history(
+        {
+            "timestamp": timestamp,
+            "folders_processed": total_folders,
+            "pages_extracted": total_pages_processed,
+            "pages_failed": total_failed,
+            "pages_skipped": total_skipped,
+            "total_time_sec": round(elapsed, 2),
+            "total_cost_usd": round(total_cost, 4),
+            "pages_from_archive": total_archive_hits,
+            "pages_per_sec": round(metrics["pages_per_sec"], 3),
+            "bytes_sent": metrics["bytes_sent"],
+            "bytes_received": metrics["bytes_received"],
+            **{
+                f"{stage}_ms_p{pct}": round(stages[stage][f"p{pct}"], 1)
+                for stage in STAGES
+                for pct in PERCENTILES
+            },
+        }
+    )
+
+    # Machine-readable copy of this run's figures
+    write_metrics(
+        METRICS_LOG,
+        {
+            "timestamp": timestamp,
+            "ocr_mode": OCR_MODE,
+            "shard": shard_tag(shard) if shard is not None else None,
+            "counts": counts,
+            **metrics,
+        },
+    )
+
+    if ledger is not None:
+        ledger.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCR patent page images")
+    add_shard_argument(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    main(parse_args().shard)
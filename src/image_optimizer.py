@@ -0,0 +1,56 @@
+from io import BytesIO
+
+from PIL import Image
+
+# ==================================================
+# OPTIMIZER SETTINGS
+# ==================================================
+# "bilevel" -> 1-bit black/white, tried as CCITT G4 TIFF and PNG
+# "gray"    -> 8-bit grayscale, tried as PNG
+DEFAULT_MODE = "bilevel"
+DEFAULT_MAX_DPI = 300  # plenty for OCR of printed patent text
+ASSUMED_DPI = 300  # used when the TIFF does not record its resolution
+# Bilevel pages are thresholded, not dithered: dithering turns a grey paper
+# background into speckle that hurts OCR and compresses badly
+BILEVEL_THRESHOLD = 128  # gray levels above this become white
+
+
+def optimize_image(content, mode=DEFAULT_MODE, max_dpi=DEFAULT_MAX_DPI):
+    """Re-encode a scanned page into the smallest upload Vision accepts.
+
+    The image is converted to grayscale or bilevel, downscaled so its
+    resolution is at most max_dpi, and encoded in each candidate format.
+    Returns the smallest encoding, or the original bytes if nothing beats
+    them. Raises on images Pillow cannot decode.
+    """
+    with Image.open(BytesIO(content)) as img:
+        dpi = img.info.get("dpi") or (ASSUMED_DPI, ASSUMED_DPI)
+        source_dpi = max(float(dpi[0]), float(dpi[1])) or ASSUMED_DPI
+
+        page = img.convert("L")
+        out_dpi = source_dpi
+        if source_dpi > max_dpi:
+            scale = max_dpi / source_dpi
+            size = (
+                max(1, round(page.width * scale)),
+                max(1, round(page.height * scale)),
+            )
+            page = page.resize(size, Image.LANCZOS)
+            out_dpi = max_dpi
+
+    candidates = []
+    if mode == "bilevel":
+        page = page.point(lambda p: 255 if p > BILEVEL_THRESHOLD else 0, "1")
+        candidates.append(
+            _encode(page, "TIFF", compression="group4", dpi=(out_dpi, out_dpi))
+        )
+    candidates.append(_encode(page, "PNG", optimize=True, dpi=(out_dpi, out_dpi)))
+
+    smallest = min(candidates, key=len)
+    return smallest if len(smallest) < len(content) else content
+
+
+def _encode(image, fmt, **params):
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
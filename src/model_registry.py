@@ -0,0 +1,80 @@
+import threading
+from pathlib import Path
+
+# ==================================================
+# SHARED MODELS AND CLIENTS
+# ==================================================
+# spaCy pipelines, the Nominatim client and dateparser each take from half
+# a second to several seconds to import or build. Modules ask for them here
+# by name instead of loading them at import time, so importing a helper
+# such as normalize_date stays cheap. Each is built on first use, once per
+# process, and shared by every module that asks for it.
+PATENT_NER_PATH = Path(__file__).parent / "modeling" / "patent_ner"
+NOMINATIM_USER_AGENT = "patent_location_checker"
+
+# name -> function() building the object
+LOADERS = {}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def loader(name):
+    """Register the function that builds the shared object called name."""
+
+    def register(fn):
+        LOADERS[name] = fn
+        return fn
+
+    return register
+
+
+def get(name):
+    """Return the shared object called name, building it on first use."""
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    if name not in LOADERS:
+        raise KeyError(f"no loader registered for {name!r}")
+    with _lock:
+        if name not in _instances:
+            _instances[name] = LOADERS[name]()
+    return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+@loader("en_core_web_sm")
+def load_en_core_web_sm():
+    from src.services.spacy_pipeline import load_entity_pipeline
+
+    return load_entity_pipeline("en_core_web_sm")
+
+
+@loader("patent_ner")
+def load_patent_ner():
+    import spacy
+
+    return spacy.load(PATENT_NER_PATH)
+
+
+@loader("nominatim")
+def load_nominatim():
+    from geopy.geocoders import Nominatim
+
+    return Nominatim(user_agent=NOMINATIM_USER_AGENT)
+
+
+@loader("dateparser")
+def load_dateparser():
+    import dateparser
+
+    return dateparser
+
+
+def parse_date(date_string):
+    """dateparser.parse, with dateparser imported on first use."""
+    return get("dateparser").parse(date_string)
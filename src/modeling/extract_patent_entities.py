@@ -1,87 +1,184 @@
 import os
-import spacy
+import re
 import csv
 from pathlib import Path
 
+from src import model_registry
+
 # -----------------------------
 # Paths
 # -----------------------------
 OCR_ROOT = r"C:\Users\shiri\Dropbox\ocr_patents\ocr_patents\random_sample"
-MODEL_PATH = Path(__file__).parent / "patent_ner"
 OUTPUT_FILE = Path(__file__).parent.parent / "output" / "final_patent_metadata.csv"
 
 # -----------------------------
-# Load trained SpaCy model
+# Chunking
 # -----------------------------
-nlp = spacy.load(MODEL_PATH)
+# Pages are fed to the model in order as overlapping chunks of about
+# CHUNK_CHARS, never as one string of the whole patent (which can exceed
+# spaCy's max_length). With EARLY_EXIT the remaining pages are not read once
+# every single-valued field is filled; those sit on the first page.
+CHUNK_CHARS = 5000
+CHUNK_OVERLAP = 300  # over twice any entity's length, so none is lost at a cut
+EARLY_EXIT = True
+
+WHITESPACE = re.compile(r"\s")
+
+# NER label -> output field
+SINGLE_FIELDS = {
+    "PATENT_NUMBER": "patent_number",
+    "SERIAL_NUMBER": "serial_number",
+    "APPLICATION_DATE": "application_date",
+    "PATENT_DATE": "patent_date",
+    "PATENT_TITLE": "title",
+}
+MULTI_FIELDS = {"INVENTOR": "inventors", "ASSIGNEE": "assignees"}
 
 
 # -----------------------------
-# Helper: extract text from all pages in a folder
+# Helper: read the pages of a folder in order
 # -----------------------------
-def get_folder_text(folder_path):
-    txt_files = [f for f in os.listdir(folder_path) if f.endswith("_text.txt")]
-    if not txt_files:
-        return "", ""
-    txt_files.sort()
-    all_text = ""
+def get_text_files(folder_path):
+    return sorted(f for f in os.listdir(folder_path) if f.endswith("_text.txt"))
+
+
+def iter_folder_pages(folder_path, txt_files):
     for f in txt_files:
         with open(
             os.path.join(folder_path, f), "r", encoding="utf-8", errors="ignore"
         ) as file:
-            all_text += file.read() + "\n"
-    return txt_files[0], all_text  # return first page name + full text
+            yield file.read()
+
+
+def iter_chunks(pages, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Yield (start, owned_end, text) chunks of the pages joined by newlines.
+
+    start is the chunk's offset in the joined text. Chunks begin and end at
+    whitespace, and consecutive chunks overlap by up to `overlap` characters.
+    A chunk owns the entities that start before owned_end, the middle of its
+    overlap with the next chunk (None for the last chunk), so an entity near
+    the boundary is read with context on both sides.
+    """
+    buffer, start = "", 0
+    for page in pages:
+        buffer += page + "\n"
+        while len(buffer) >= size + overlap:
+            # End at whitespace so the chunk's last token is whole
+            cut = max(
+                buffer.rfind("\n", size // 2, size), buffer.rfind(" ", size // 2, size)
+            )
+            if cut <= 0:
+                cut = size
+            # Start the next chunk after whitespace inside the overlap, so its
+            # first token is whole too
+            next_start = _token_start(buffer, cut - overlap, cut)
+            owned_end = start + (next_start + cut) // 2
+            yield start, owned_end, buffer[:cut]
+            buffer = buffer[next_start:]
+            start += next_start
+    if buffer.strip():
+        yield start, None, buffer
+
+
+def _token_start(text, lo, hi):
+    """Return the first offset in text[lo:hi] that follows whitespace, else lo."""
+    m = WHITESPACE.search(text, max(lo - 1, 0), hi)
+    return m.end() if m else lo
 
 
 # -----------------------------
-# Extraction loop
+# Entity extraction
 # -----------------------------
-rows = []
-for folder in sorted(os.listdir(OCR_ROOT)):
-    folder_path = os.path.join(OCR_ROOT, folder)
-    if not os.path.isdir(folder_path):
-        continue
-
-    first_page, text = get_folder_text(folder_path)
-    if not text.strip():
-        continue
-
-    doc = nlp(text)
-
-    # Initialize row with empty values
-    data = {
-        "folder": folder,
-        "first_page": first_page,
-        "patent_number": "",
-        "serial_number": "",
-        "application_date": "",
-        "patent_date": "",
-        "inventors": "",
-        "assignees": "",
-        "title": "",
-    }
-
-    # Fill in extracted entities
-    for ent in doc.ents:
-        if ent.label_ in data:
-            if ent.label_ in ["INVENTOR", "ASSIGNEE"]:
-                # Concatenate multiple values
-                if data[ent.label_]:
-                    data[ent.label_] += ", " + ent.text
-                else:
-                    data[ent.label_] = ent.text
-            else:
-                data[ent.label_] = ent.text
-
-    rows.append(data)
+def extract_entities(
+    nlp, pages, early_exit=EARLY_EXIT, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP
+):
+    """Run the model over the pages chunk by chunk; returns {field: value}.
+
+    Returns None if the pages hold no text.
+
+    A single-valued field keeps its first entity. INVENTOR / ASSIGNEE spans
+    are collected from every chunk read: an entity seen by two overlapping
+    chunks is taken only from the chunk that owns its start, and repeated
+    names are kept once.
+    """
+    data = {field: "" for field in SINGLE_FIELDS.values()}
+    multi = {field: [] for field in MULTI_FIELDS.values()}
+    accepted_end = 0  # end of the last entity taken, in joined-text offsets
+    owned_from = 0  # where the previous chunk's ownership ended
+    chunks = 0
+
+    for start, owned_end, text in iter_chunks(pages, size, overlap):
+        chunks += 1
+        for ent in nlp(text).ents:
+            ent_start = start + ent.start_char
+            if ent_start < max(accepted_end, owned_from):
+                continue  # owned by, or overlaps an entity of, the previous chunk
+            if owned_end is not None and ent_start >= owned_end:
+                break  # read again, whole, by the next chunk
+            accepted_end = start + ent.end_char
+
+            if ent.label_ in SINGLE_FIELDS:
+                field = SINGLE_FIELDS[ent.label_]
+                if not data[field]:
+                    data[field] = ent.text
+            elif ent.label_ in MULTI_FIELDS:
+                multi[MULTI_FIELDS[ent.label_]].append(ent.text)
+
+        owned_from = owned_end
+        if early_exit and all(data.values()):
+            break
+
+    if not chunks:
+        return None
+    for field, values in multi.items():
+        data[field] = ", ".join(dict.fromkeys(values))
+    return data
+
 
 # -----------------------------
-# Save CSV
+# Extraction loop
 # -----------------------------
-OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-    writer.writeheader()
-    writer.writerows(rows)
+def run_extraction():
+    # Trained model (src/modeling/patent_ner), loaded through the registry
+    nlp = model_registry.get("patent_ner")
+
+    rows = []
+    for folder in sorted(os.listdir(OCR_ROOT)):
+        folder_path = os.path.join(OCR_ROOT, folder)
+        if not os.path.isdir(folder_path):
+            continue
+
+        txt_files = get_text_files(folder_path)
+        if not txt_files:
+            continue
+
+        entities = extract_entities(nlp, iter_folder_pages(folder_path, txt_files))
+        if entities is None:
+            continue
+
+        rows.append(
+            {
+                "folder": folder,
+                "first_page": txt_files[0],
+                "patent_number": entities["patent_number"],
+                "serial_number": entities["serial_number"],
+                "application_date": entities["application_date"],
+                "patent_date": entities["patent_date"],
+                "inventors": entities["inventors"],
+                "assignees": entities["assignees"],
+                "title": entities["title"],
+            }
+        )
+
+    # Save CSV
+    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Extraction complete. CSV saved at {OUTPUT_FILE}")
+
 
-print(f"Extraction complete. CSV saved at {OUTPUT_FILE}")
+if __name__ == "__main__":
+    run_extraction()
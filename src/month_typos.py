@@ -0,0 +1,129 @@
+from difflib import get_close_matches
+from functools import cache, lru_cache
+
+# ==================================================
+# OCR MONTH-TYPO CORRECTION
+# ==================================================
+# Shared by the date normalizers of the extraction scripts. Each word of a
+# date string is looked up in a table of OCR misreadings of the month names
+# ("Augnst", "Jnne", "0ct."), built once on first use. Words not in the
+# table fall back to difflib's closest month (cutoff 0.7), memoized in an
+# LRU cache, so a word is only ever compared against the months once.
+MONTHS = [
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+]
+MATCH_CUTOFF = 0.7
+
+# (printed, read by OCR as): character confusions common in the scans
+OCR_CONFUSIONS = [
+    ("u", "n"),
+    ("n", "u"),
+    ("m", "rn"),
+    ("m", "in"),
+    ("o", "0"),
+    ("O", "0"),
+    ("O", "Q"),
+    ("l", "1"),
+    ("l", "I"),
+    ("I", "l"),
+    ("i", "l"),
+    ("e", "c"),
+    ("c", "e"),
+    ("a", "o"),
+    ("r", "n"),
+    ("b", "h"),
+    ("S", "5"),
+    ("D", "O"),
+    ("J", "T"),
+    ("y", "v"),
+]
+MAX_CONFUSIONS = 2  # misread characters per word in the table
+TABLE_SUFFIXES = ["", ".", ","]  # punctuation OCR leaves on the word
+
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _closest_month(word):
+    matches = get_close_matches(word, MONTHS, n=1, cutoff=MATCH_CUTOFF)
+    return matches[0] if matches else None
+
+
+def _misreadings(word, depth, pos=0):
+    """Yield every word reachable by up to depth OCR confusions after pos."""
+    if depth == 0:
+        return
+    for printed, misread in OCR_CONFUSIONS:
+        start = word.find(printed, pos)
+        while start != -1:
+            variant = word[:start] + misread + word[start + len(printed) :]
+            yield variant
+            # Later confusions only after this one: a misread is not misread
+            yield from _misreadings(variant, depth - 1, start + len(misread))
+            start = word.find(printed, start + 1)
+
+
+@cache
+def confusion_table():
+    """Return {word: month} for the month names and their OCR misreadings.
+
+    A misreading is corrected the way its clean word is ("Aug." -> "Aug",
+    as difflib does). A misreading reachable from two different months is
+    left out and falls back to difflib.
+    """
+    table, ambiguous = {}, set()
+    clean = {month + suffix for month in MONTHS for suffix in TABLE_SUFFIXES}
+    for word in clean:
+        table[word] = _closest_month(word)
+
+    for word in clean:
+        correction = table[word]
+        for variant in _misreadings(word, MAX_CONFUSIONS):
+            if variant in clean or variant in ambiguous:
+                continue
+            if table.setdefault(variant, correction) != correction:
+                ambiguous.add(variant)
+                del table[variant]
+    return table
+
+
+def correct_month(word):
+    """Return the month word is a misreading of, or None."""
+    month = confusion_table().get(word)
+    if month is not None:
+        return month
+    if not any(ch.isalpha() for ch in word):
+        return None  # numbers and punctuation never match a month
+    return _closest_month(word)
+
+
+def fix_month_typo(raw_date):
+    """Automatically correct OCR month typos."""
+    for word in raw_date.split():
+        month = correct_month(word)
+        if month is not None and month != word:
+            raw_date = raw_date.replace(word, month)
+    return raw_date
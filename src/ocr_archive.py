@@ -0,0 +1,102 @@
+import os
+import zlib
+import struct
+import hashlib
+import threading
+
+# ==================================================
+# ARCHIVE LAYOUT
+# ==================================================
+# Records are appended to one of SHARD_COUNT files chosen by the first byte
+# of the key. Each record is a fixed header followed by the zlib-compressed
+# payload:
+#
+#   [32-byte SHA-256 of the image bytes][uint32 payload length][payload]
+#
+# Files are only ever appended to, so a crash can at worst leave a torn
+# record at the end of a shard, which is truncated the next time it loads.
+SHARD_COUNT = 16
+RECORD_HEADER = struct.Struct("<32sI")
+
+
+def content_key(content):
+    """Return the archive key (SHA-256 digest) for raw image bytes."""
+    return hashlib.sha256(content).digest()
+
+
+class ResponseArchive:
+    """Append-only, content-addressed store of serialized OCR responses."""
+
+    def __init__(self, root, read_roots=()):
+        """Open the archive at root.
+
+        read_roots are other archives (e.g. other nodes') searched by get()
+        but never written or truncated; entries in root take precedence.
+        """
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self._index = {}  # key -> (shard path, payload offset, payload length)
+        self._locks = [threading.Lock() for _ in range(SHARD_COUNT)]
+        for read_root in read_roots:
+            for shard in range(SHARD_COUNT):
+                self._load_shard(self._shard_path(shard, read_root), truncate=False)
+        for shard in range(SHARD_COUNT):
+            self._load_shard(self._shard_path(shard), truncate=True)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def _shard_path(self, shard, root=None):
+        return os.path.join(root or self.root, f"responses_{shard:02x}.bin")
+
+    def _load_shard(self, path, truncate):
+        """Index the record headers of one shard file, dropping a torn tail."""
+        if not os.path.exists(path):
+            return
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + RECORD_HEADER.size <= size:
+                f.seek(offset)
+                key, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                end = offset + RECORD_HEADER.size + length
+                if end > size:
+                    break
+                self._index[key] = (path, offset + RECORD_HEADER.size, length)
+                offset = end
+
+        if truncate and offset < size:
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def get(self, key):
+        """Return the stored payload for key, or None if it is not archived."""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+
+        path, offset, length = entry
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length))
+
+    def put(self, key, payload):
+        """Append a payload under key unless it is already archived."""
+        if key in self._index:
+            return
+
+        shard = key[0] % SHARD_COUNT
+        data = zlib.compress(payload)
+        with self._locks[shard]:
+            if key in self._index:
+                return
+            path = self._shard_path(shard)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(key, len(data)))
+                f.write(data)
+            self._index[key] = (path, offset + RECORD_HEADER.size, len(data))
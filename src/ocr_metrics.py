@@ -0,0 +1,76 @@
+import json
+import math
+from array import array
+
+# ==================================================
+# PER-PAGE TELEMETRY
+# ==================================================
+# Stage timings kept for every page written, in milliseconds:
+#   read  -> reading the image file
+#   ocr   -> archive lookup, screening, recompression and the API round trip
+#            including retries (in batch mode the batch's round trip)
+#   write -> storing the text and layout
+#   total -> read start to write end
+STAGES = ("read", "ocr", "write", "total")
+STAGE_LABELS = {"read": "Read", "ocr": "OCR", "write": "Write", "total": "Total"}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted sequence (0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RunMetrics:
+    """Collects stage timings and byte counts of the pages written in a run."""
+
+    def __init__(self):
+        self.timings = {stage: array("d") for stage in STAGES}
+        self.pages = 0
+        self.bytes_read = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def add(self, job):
+        """Record one written page from the timings and sizes on its job."""
+        self.pages += 1
+        for stage in STAGES:
+            value = job.get(f"{stage}_ms")
+            if value is not None:
+                self.timings[stage].append(value)
+        self.bytes_read += job.get("bytes") or 0
+        self.bytes_sent += job.get("bytes_sent") or 0
+        self.bytes_received += job.get("bytes_received") or 0
+
+    def stage_summary(self, stage):
+        """Return count, mean, max and PERCENTILES for one stage, in ms."""
+        values = sorted(self.timings[stage])
+        summary = {
+            "count": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "max": values[-1] if values else 0.0,
+        }
+        for pct in PERCENTILES:
+            summary[f"p{pct}"] = percentile(values, pct)
+        return summary
+
+    def summary(self, elapsed):
+        """Return every figure for the run as a JSON-serializable dict."""
+        return {
+            "pages": self.pages,
+            "elapsed_sec": elapsed,
+            "pages_per_sec": self.pages / elapsed if elapsed > 0 else 0.0,
+            "bytes_read": self.bytes_read,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "stages_ms": {stage: self.stage_summary(stage) for stage in STAGES},
+        }
+
+
+def write_metrics(path, metrics):
+    """Write a run's metrics dict as indented JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
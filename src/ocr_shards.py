@@ -0,0 +1,190 @@
+import os
+import sys
+import gzip
+import json
+import zlib
+import base64
+import threading
+
+# ==================================================
+# SHARD LAYOUT
+# ==================================================
+# OCR text is appended to one of SHARD_COUNT shards chosen by a stable hash
+# of the folder name, so all pages of one patent land in the same shard:
+#
+#   text_XX.jsonl.gz -> one gzip member per page holding one JSON line,
+#                       {"folder": ..., "page": ..., "text": ...}, plus
+#                       "layout" (base64 page_layout record) when kept
+#   text_XX.idx      -> one line per page: folder, page, offset, length
+#                       (tab-separated byte range of the page's gzip member)
+#
+# Concatenated gzip members are a valid gzip file, so a shard can be read
+# start to finish with gzip.open() or zcat; the index gives random access to
+# a single page. A page written twice resolves to its latest record. Data is
+# written before its index line, so a crash leaves at worst an unindexed
+# tail, which is truncated the next time the shard loads.
+SHARD_COUNT = 64
+
+
+def shard_for(folder):
+    """Return the shard number for a folder (stable across runs and machines)."""
+    return zlib.crc32(folder.encode("utf-8")) % SHARD_COUNT
+
+
+class ShardStore:
+    """Append-only store of per-page OCR text packed into compressed shards."""
+
+    def __init__(self, root, owned=None):
+        """Open the store at root.
+
+        owned is the set of shards this process writes (None = all of them).
+        Only owned shards have a torn tail truncated on load, since another
+        node may be appending to the rest of a shared directory.
+        """
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.owned = set(range(SHARD_COUNT)) if owned is None else set(owned)
+        self._pages = {}  # folder -> {page: (shard, offset, length)}
+        self._locks = [threading.Lock() for _ in range(SHARD_COUNT)]
+        for shard in range(SHARD_COUNT):
+            self._load_shard(shard)
+
+    def claim(self, shards):
+        """Take over writing shards from a stopped node, re-reading their index."""
+        self.owned.update(shards)
+        for shard in shards:
+            self._load_shard(shard)
+
+    def __len__(self):
+        return sum(len(pages) for pages in self._pages.values())
+
+    def __contains__(self, folder_page):
+        folder, page = folder_page
+        return page in self._pages.get(folder, ())
+
+    def shard_path(self, shard):
+        return os.path.join(self.root, f"text_{shard:02x}.jsonl.gz")
+
+    def _index_path(self, shard):
+        return os.path.join(self.root, f"text_{shard:02x}.idx")
+
+    def _load_shard(self, shard):
+        """Read one shard's index, dropping a torn index line or data tail."""
+        index_path = self._index_path(shard)
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path, "rb") as f:
+            raw = f.read()
+        complete = raw[: raw.rfind(b"\n") + 1]
+
+        data_end = 0
+        for line in complete.decode("utf-8").splitlines():
+            folder, page, offset, length = line.split("\t")
+            offset, length = int(offset), int(length)
+            self._pages.setdefault(folder, {})[int(page)] = (shard, offset, length)
+            data_end = max(data_end, offset + length)
+
+        if shard not in self.owned:
+            return
+
+        if len(complete) < len(raw):
+            with open(index_path, "r+b") as f:
+                f.truncate(len(complete))
+
+        shard_path = self.shard_path(shard)
+        if os.path.exists(shard_path) and os.path.getsize(shard_path) > data_end:
+            with open(shard_path, "r+b") as f:
+                f.truncate(data_end)
+
+    # ----------------------------------------------
+    # Reading
+    # ----------------------------------------------
+    def folders(self):
+        return sorted(self._pages)
+
+    def pages(self, folder):
+        """Return the stored page numbers of a folder, in order."""
+        return sorted(self._pages.get(folder, ()))
+
+    def location(self, folder, page):
+        """Return (shard, offset, length) of a page's latest record, or None."""
+        return self._pages.get(folder, {}).get(page)
+
+    def get_record(self, folder, page):
+        """Return the stored record of one page, or None if it is not stored."""
+        entry = self.location(folder, page)
+        if entry is None:
+            return None
+
+        shard, offset, length = entry
+        with open(self.shard_path(shard), "rb") as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def get(self, folder, page):
+        """Return the stored text of one page, or None if it is not stored."""
+        record = self.get_record(folder, page)
+        return record["text"] if record is not None else None
+
+    def get_layout(self, folder, page):
+        """Return the stored layout bytes of one page, or None."""
+        record = self.get_record(folder, page)
+        if record is None or "layout" not in record:
+            return None
+        return base64.b64decode(record["layout"])
+
+    # ----------------------------------------------
+    # Writing
+    # ----------------------------------------------
+    def put(self, folder, page, text, layout=None):
+        """Append one page's text; returns (shard path, offset, length)."""
+        record = {"folder": folder, "page": page, "text": text}
+        if layout is not None:
+            record["layout"] = base64.b64encode(layout).decode("ascii")
+        line = json.dumps(record)
+        data = gzip.compress((line + "\n").encode("utf-8"), mtime=0)
+
+        shard = shard_for(folder)
+        with self._locks[shard]:
+            with open(self.shard_path(shard), "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            with open(self._index_path(shard), "a", encoding="utf-8") as f:
+                f.write(f"{folder}\t{page}\t{offset}\t{len(data)}\n")
+            self._pages.setdefault(folder, {})[page] = (shard, offset, len(data))
+
+        return self.shard_path(shard), offset, len(data)
+
+
+# ==================================================
+# TEXT-FILE EXPORT
+# ==================================================
+def export_text_files(shard_dir, output_root):
+    """Write every stored page as <output_root>/<folder>/<page>_text.txt.
+
+    This recreates the one-file-per-page layout the extractors read, with
+    a _layout.bin next to each page that has one. Existing files are
+    overwritten. Returns the number of pages written.
+    """
+    store = ShardStore(shard_dir)
+    written = 0
+    for folder in store.folders():
+        os.makedirs(os.path.join(output_root, folder), exist_ok=True)
+        for page in store.pages(folder):
+            record = store.get_record(folder, page)
+            out_base = os.path.join(output_root, folder, f"{page:08d}")
+            with open(out_base + "_text.txt", "w", encoding="utf-8") as f:
+                f.write(record["text"])
+            if "layout" in record:
+                with open(out_base + "_layout.bin", "wb") as f:
+                    f.write(base64.b64decode(record["layout"]))
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m src.ocr_shards SHARD_DIR OUTPUT_ROOT")
+    count = export_text_files(sys.argv[1], sys.argv[2])
+    print(f"Exported {count} pages to {sys.argv[2]}")
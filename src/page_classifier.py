@@ -0,0 +1,71 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# ==================================================
+# CLASSIFIER SETTINGS
+# ==================================================
+# Pages are judged on a small grayscale thumbnail:
+#   skip         -> almost no ink (blank separators, empty backs)
+#   ocr          -> enough separate line-height ink bands to be text
+#   low_priority -> inked but few text lines (drawing sheets, line art)
+THUMBNAIL_SIZE = 512  # longest side of the analysed thumbnail, in pixels
+MARGIN_FRACTION = 0.05  # border trimmed away to ignore scanner edges
+INK_LEVEL = 160  # gray value below which a pixel counts as ink
+BLANK_MAX_INK = 0.002  # ink fraction at or below which a page is blank
+ROW_MIN_INK = 0.01  # ink fraction that makes a thumbnail row part of a band
+LINE_MIN_HEIGHT = 0.003  # text band height limits, as fractions of page height
+LINE_MAX_HEIGHT = 0.03
+MIN_TEXT_LINES = 8  # text bands needed to call a page text
+
+
+def load_thumbnail(content, size=THUMBNAIL_SIZE):
+    """Decode image bytes into a small boolean ink mask with margins trimmed."""
+    with Image.open(BytesIO(content)) as img:
+        img.draft("L", (size, size))  # lets JPEG decode at reduced scale
+        page = img.convert("L")
+    page.thumbnail((size, size), reducing_gap=2.0)
+
+    pixels = np.asarray(page)
+    h, w = pixels.shape
+    dy = int(h * MARGIN_FRACTION)
+    dx = int(w * MARGIN_FRACTION)
+    return pixels[dy : h - dy or None, dx : w - dx or None] < INK_LEVEL
+
+
+def count_text_lines(ink):
+    """Count horizontal ink bands whose height looks like a line of text."""
+    rows = ink.mean(axis=1) >= ROW_MIN_INK
+    if not rows.any():
+        return 0
+
+    # Start/end indices of runs of inked rows
+    edges = np.diff(np.concatenate(([0], rows.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    heights = (ends - starts) / ink.shape[0]
+
+    return int(
+        np.count_nonzero((heights >= LINE_MIN_HEIGHT) & (heights <= LINE_MAX_HEIGHT))
+    )
+
+
+def classify_page(content):
+    """Classify a page image before OCR.
+
+    Returns (label, ink_density, text_lines) where label is "skip", "ocr"
+    or "low_priority".
+    """
+    ink = load_thumbnail(content)
+    if ink.size == 0:
+        return "skip", 0.0, 0
+
+    density = float(ink.mean())
+    if density <= BLANK_MAX_INK:
+        return "skip", density, 0
+
+    text_lines = count_text_lines(ink)
+    if text_lines >= MIN_TEXT_LINES:
+        return "ocr", density, text_lines
+    return "low_priority", density, text_lines
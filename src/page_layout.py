@@ -0,0 +1,183 @@
+import os
+import sys
+import struct
+from array import array
+
+# ==================================================
+# LAYOUT FORMAT
+# ==================================================
+# Line and block geometry from a Vision full_text_annotation, stored as:
+#
+#   b"LAY1" [int32 width, height, n_blocks, n_lines]
+#           [int32 x0, y0, x1, y1]                   * n_blocks
+#           [int32 block, x0, y0, x1, y1, text_len]  * n_lines
+#           [UTF-8 line texts, concatenated]
+#
+# All integers are one little-endian array('i'), so a page of ~60 lines is
+# a couple of kilobytes and decodes with a single frombytes() call.
+MAGIC = b"LAY1"
+COUNTS = struct.Struct("<4i")
+BLOCK_FIELDS = 4
+LINE_FIELDS = 6
+
+# Vision TextAnnotation.DetectedBreak.BreakType values
+SPACE = 1
+SURE_SPACE = 2
+EOL_SURE_SPACE = 3
+HYPHEN = 4
+LINE_BREAK = 5
+
+HEADER_FRACTION = 0.25  # top share of the inked page height treated as header
+
+
+class PageLayout:
+    """Decoded page geometry: block boxes and lines with their boxes."""
+
+    def __init__(self, width, height, blocks, lines):
+        self.width = width
+        self.height = height
+        self.blocks = blocks  # [(x0, y0, x1, y1), ...]
+        self.lines = lines  # [(block, (x0, y0, x1, y1), text), ...]
+
+
+# ==================================================
+# BUILDING FROM A VISION RESPONSE
+# ==================================================
+def _box(bounding_poly):
+    xs = [v.x for v in bounding_poly.vertices]
+    ys = [v.y for v in bounding_poly.vertices]
+    return (min(xs), min(ys), max(xs), max(ys)) if xs else (0, 0, 0, 0)
+
+
+def _union(a, b):
+    if a is None:
+        return b
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def layout_from_response(response):
+    """Rebuild the text lines of an AnnotateImageResponse with their geometry.
+
+    Vision has no explicit line level: lines are cut at the EOL/line-break
+    markers on the last symbol of a word, and a line's box is the union of
+    its word boxes. Returns None when the response has no layout.
+    """
+    annotation = response.full_text_annotation
+    if not annotation.pages:
+        return None
+
+    page = annotation.pages[0]
+    blocks = []
+    lines = []
+    for block_index, block in enumerate(page.blocks):
+        blocks.append(_box(block.bounding_box))
+        for paragraph in block.paragraphs:
+            parts = []
+            box = None
+            for word in paragraph.words:
+                box = _union(box, _box(word.bounding_box))
+                for symbol in word.symbols:
+                    parts.append(symbol.text)
+                    kind = symbol.property.detected_break.type_
+                    if kind in (SPACE, SURE_SPACE):
+                        parts.append(" ")
+                    elif kind in (EOL_SURE_SPACE, HYPHEN, LINE_BREAK):
+                        if kind == HYPHEN:
+                            parts.append("-")
+                        lines.append((block_index, box, "".join(parts)))
+                        parts = []
+                        box = None
+            if parts:
+                lines.append((block_index, box, "".join(parts).rstrip()))
+
+    return PageLayout(page.width, page.height, blocks, lines)
+
+
+# ==================================================
+# ENCODING
+# ==================================================
+def encode_layout(layout):
+    """Serialize a PageLayout into the compact binary format above."""
+    texts = [text.encode("utf-8") for _, _, text in layout.lines]
+    ints = array("i")
+    for box in layout.blocks:
+        ints.extend(box)
+    for (block, box, _), text in zip(layout.lines, texts):
+        ints.append(block)
+        ints.extend(box)
+        ints.append(len(text))
+    if sys.byteorder != "little":
+        ints.byteswap()
+
+    counts = COUNTS.pack(layout.width, layout.height, len(layout.blocks), len(texts))
+    return MAGIC + counts + ints.tobytes() + b"".join(texts)
+
+
+def decode_layout(data):
+    """Parse bytes written by encode_layout() back into a PageLayout."""
+    if data[:4] != MAGIC:
+        raise ValueError("not a page layout record")
+    width, height, n_blocks, n_lines = COUNTS.unpack_from(data, 4)
+
+    start = 4 + COUNTS.size
+    n_ints = n_blocks * BLOCK_FIELDS + n_lines * LINE_FIELDS
+    ints = array("i")
+    ints.frombytes(data[start : start + n_ints * ints.itemsize])
+    if sys.byteorder != "little":
+        ints.byteswap()
+
+    blocks = [
+        tuple(ints[i : i + BLOCK_FIELDS])
+        for i in range(0, n_blocks * BLOCK_FIELDS, BLOCK_FIELDS)
+    ]
+
+    lines = []
+    text_offset = start + n_ints * ints.itemsize
+    for i in range(n_blocks * BLOCK_FIELDS, n_ints, LINE_FIELDS):
+        block, x0, y0, x1, y1, text_len = ints[i : i + LINE_FIELDS]
+        text = data[text_offset : text_offset + text_len].decode("utf-8")
+        lines.append((block, (x0, y0, x1, y1), text))
+        text_offset += text_len
+
+    return PageLayout(width, height, blocks, lines)
+
+
+# ==================================================
+# HEADER LOCATOR
+# ==================================================
+def locate_header(layout, fraction=HEADER_FRACTION):
+    """Split a page's lines into (header_lines, body_lines) by position.
+
+    A line is header when its vertical centre lies in the top `fraction`
+    of the inked area (first to last line), which ignores scanner margins
+    and does not depend on how many lines the OCR happened to produce.
+    Lines keep Vision's reading order.
+    """
+    if not layout.lines:
+        return [], []
+
+    top = min(box[1] for _, box, _ in layout.lines)
+    bottom = max(box[3] for _, box, _ in layout.lines)
+    cutoff = top + (bottom - top) * fraction
+
+    header, body = [], []
+    for _, (_, y0, _, y1), text in layout.lines:
+        (header if (y0 + y1) / 2 <= cutoff else body).append(text)
+    return header, body
+
+
+# ==================================================
+# LAYOUT FILES
+# ==================================================
+def layout_path(text_path):
+    """Return the _layout.bin path stored next to a _text.txt page."""
+    return text_path[: -len("_text.txt")] + "_layout.bin"
+
+
+def load_layout(text_path):
+    """Return the PageLayout stored next to a text page, or None."""
+    path = layout_path(text_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return decode_layout(f.read())
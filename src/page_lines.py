@@ -0,0 +1,66 @@
+from bisect import bisect_left
+
+# ==================================================
+# MULTI-LINE WINDOWS OVER ONE STRING
+# ==================================================
+# The rule-based date extractors look at each non-blank line on its own,
+# merged with the next line, and merged with the next two, because OCR
+# often breaks "Patented" and its date over lines. Instead of building
+# those merged strings (about three copies of the page), PageLines joins
+# the stripped lines once with single spaces. Each window is then a
+# (start, end) slice of that text, and patterns run on it in place with
+# pattern.search(text, start, end).
+#
+# A pattern's matches on the whole text are found once with MatchIndex.
+# A window's first match is then a binary search, not a regex run, and
+# windows holding no date can be skipped before trying any pattern that
+# needs one. This gives the same result as searching the window alone
+# for patterns that start with letters and whose matches contain letters
+# only at the start, such as the "Month day, year" date patterns.
+WINDOW_LINES = 3
+
+
+class PageLines:
+    """A page's stripped lines joined by spaces, with each line's offsets."""
+
+    def __init__(self, lines):
+        stripped = [line.strip() for line in lines]
+        self.text = " ".join(stripped)
+        self.starts, self.ends = [], []
+        offset = 0
+        for line in stripped:
+            self.starts.append(offset)
+            self.ends.append(offset + len(line))
+            offset += len(line) + 1
+        self.blank = [not line for line in stripped]
+
+    def windows(self, size=WINDOW_LINES):
+        """Yield (first line, last line, start, end) of each merged window.
+
+        In the old merge order: for every non-blank line, the line alone,
+        then merged with the next line, then with the next two.
+        """
+        count = len(self.starts)
+        for first in range(count):
+            if self.blank[first]:
+                continue
+            for last in range(first, min(first + size, count)):
+                yield first, last, self.starts[first], self.ends[last]
+
+    def window_text(self, start, end):
+        return self.text[start:end]
+
+
+class MatchIndex:
+    """Every match of a pattern in a text, ordered by start."""
+
+    def __init__(self, pattern, text):
+        self.matches = list(pattern.finditer(text))
+        self._starts = [m.start() for m in self.matches]
+
+    def first_within(self, start, end):
+        """Return the first match lying inside text[start:end], or None."""
+        i = bisect_left(self._starts, start)
+        if i < len(self.matches) and self.matches[i].end() <= end:
+            return self.matches[i]
+        return None
@@ -0,0 +1,52 @@
+import time
+
+from src.image_optimizer import optimize_image
+from src.ocr_archive import content_key
+from src.page_classifier import classify_page
+
+# ==================================================
+# CPU-BOUND PAGE PREPARATION
+# ==================================================
+# This module runs inside spawn-based worker processes. It must never import
+# google.cloud.vision or grpc itself: gRPC channels live only in the parent
+# process, which receives the prepared buffers and does the uploads.
+
+
+def prepare_page(image_path, classify, optimize, optimize_mode, max_dpi):
+    """Read, hash, classify and recompress one page image.
+
+    Returns a dict with the archive key, the original byte count and the
+    payload to upload, plus page_class/density/text_lines when classify is
+    set and bytes_saved when the page was recompressed. Pages classified as
+    blank are not recompressed since they will not be uploaded. read_ms is
+    the time spent reading the file.
+    """
+    start = time.perf_counter()
+    with open(image_path, "rb") as image_file:
+        content = image_file.read()
+    read_ms = (time.perf_counter() - start) * 1000
+
+    prep = {
+        "key": content_key(content),
+        "bytes": len(content),
+        "payload": content,
+        "read_ms": read_ms,
+    }
+
+    if classify:
+        try:
+            label, density, text_lines = classify_page(content)
+        except Exception:
+            pass  # undecodable pages are sent to OCR unchanged
+        else:
+            prep.update(page_class=label, density=density, text_lines=text_lines)
+
+    if optimize and prep.get("page_class") != "skip":
+        try:
+            payload = optimize_image(content, optimize_mode, max_dpi)
+        except Exception:
+            payload = content
+        prep["payload"] = payload
+        prep["bytes_saved"] = len(content) - len(payload)
+
+    return prep
@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# ==================================================
+# SCHEMA
+# ==================================================
+# folders: one row per source folder and how it was planned
+#   status = planned | no_xml | no_ranges
+# pages:   one row per planned page and its OCR outcome
+#   status = pending | done | failed | missing | blank | deferred | dead
+#   (dead = retries exhausted; left alone until re-driven with requeue())
+# totals:  running counters kept up to date as pages finish
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder      TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    page_count  INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pages (
+    folder      TEXT NOT NULL,
+    page        INTEGER NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    latency_ms  REAL,
+    bytes       INTEGER,
+    error       TEXT,
+    updated_at  TEXT,
+    PRIMARY KEY (folder, page)
+);
+CREATE INDEX IF NOT EXISTS pages_by_status ON pages (status, folder, page);
+CREATE TABLE IF NOT EXISTS totals (
+    name        TEXT PRIMARY KEY,
+    value       REAL NOT NULL
+);
+"""
+
+PENDING_STATUSES = ("pending", "failed", "missing")
+
+
+class RunLedger:
+    """Transactional record of every planned page across OCR runs."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ----------------------------------------------
+    # Planning
+    # ----------------------------------------------
+    def folder_statuses(self):
+        """Return {folder: status} for every folder already planned."""
+        with self._lock:
+            rows = self._conn.execute("SELECT folder, status FROM folders")
+            return dict(rows.fetchall())
+
+    def register_folder(self, folder, status, pages=(), done_pages=()):
+        """Record a newly planned folder and its pages in one transaction.
+
+        done_pages are pages whose output already existed before the ledger
+        knew about them; they are stored as done without being billed.
+        """
+        now = _now()
+        done_pages = set(done_pages)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folders (folder, status, page_count) "
+                "VALUES (?, ?, ?)",
+                (folder, status, len(pages)),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pages (folder, page, status, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (folder, page, "done" if page in done_pages else "pending", now)
+                    for page in pages
+                ],
+            )
+
+    def pending_pages(self, include=()):
+        """Return {folder: [page, ...]} for every page still to OCR.
+
+        include adds statuses to retry on top of PENDING_STATUSES, e.g.
+        "deferred" once low-priority pages should be OCR'd.
+        """
+        statuses = PENDING_STATUSES + tuple(include)
+        placeholders = ", ".join("?" * len(statuses))
+        pending = {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT folder, page FROM pages WHERE status IN ({placeholders}) "
+                "ORDER BY folder, page",
+                statuses,
+            )
+            for folder, page in rows:
+                pending.setdefault(folder, []).append(page)
+        return pending
+
+    def first_done_pages(self):
+        """Return {folder: lowest page} over the pages marked done."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT folder, MIN(page) FROM pages WHERE status = 'done' "
+                "GROUP BY folder"
+            )
+            return dict(rows.fetchall())
+
+    def done_counts(self):
+        """Return {folder: number of pages marked done}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT folder, COUNT(*) FROM pages WHERE status = 'done' "
+                "GROUP BY folder"
+            )
+            return dict(rows.fetchall())
+
+    def count_status(self, status):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE status = ?", (status,)
+            ).fetchone()
+        return row[0]
+
+    # ----------------------------------------------
+    # Page outcomes
+    # ----------------------------------------------
+    def mark_done(self, folder, page, latency_ms=None, nbytes=None, billed=True):
+        """Mark a page done and bump the running totals in the same transaction."""
+        with self._lock, self._conn:
+            self._update_page(folder, page, "done", latency_ms, nbytes, None)
+            self._add_total("pages_done", 1)
+            if billed:
+                self._add_total("pages_billed", 1)
+
+    def mark_failed(self, folder, page, error, latency_ms=None, nbytes=None):
+        with self._lock, self._conn:
+            self._update_page(folder, page, "failed", latency_ms, nbytes, error)
+
+    def mark_missing(self, folder, page):
+        with self._lock, self._conn:
+            self._update_page(folder, page, "missing", None, None, None)
+
+    def mark_dead(self, folder, page, error, latency_ms=None, nbytes=None):
+        """Park a page whose retries ran out so later runs do not pick it up."""
+        with self._lock, self._conn:
+            self._update_page(folder, page, "dead", latency_ms, nbytes, error)
+
+    def requeue(self, status):
+        """Set every page with the given status back to pending; returns the count."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE pages SET status = 'pending', updated_at = ? WHERE status = ?",
+                (_now(), status),
+            )
+        return cursor.rowcount
+
+    def mark_screened(self, folder, page, status, nbytes=None):
+        """Record a page the classifier kept from OCR (blank or deferred)."""
+        with self._lock, self._conn:
+            self._update_page(folder, page, status, None, nbytes, None)
+
+    def _update_page(self, folder, page, status, latency_ms, nbytes, error):
+        self._conn.execute(
+            "UPDATE pages SET status = ?, attempts = attempts + 1, latency_ms = ?, "
+            "bytes = ?, error = ?, updated_at = ? WHERE folder = ? AND page = ?",
+            (status, latency_ms, nbytes, error, _now(), folder, page),
+        )
+
+    # ----------------------------------------------
+    # Running totals
+    # ----------------------------------------------
+    def total(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM totals WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def has_total(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM totals WHERE name = ?", (name,)
+            ).fetchone()
+        return row is not None
+
+    def seed_total(self, name, value):
+        """Set a total once, e.g. from the CSV history, if it is not tracked yet."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO totals (name, value) VALUES (?, ?)",
+                (name, value),
+            )
+
+    def _add_total(self, name, amount):
+        self._conn.execute(
+            "INSERT INTO totals (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
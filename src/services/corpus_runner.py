@@ -0,0 +1,364 @@
+import os
+import csv
+import json
+import base64
+import argparse
+from datetime import datetime
+from functools import cached_property
+
+from src.ocr_shards import ShardStore
+from src.page_layout import decode_layout, load_layout, locate_header
+from src.services import extract_date, metadata_extractor, ocr_extraction
+from src.sharding import add_shard_argument, in_shard, shard_output_path
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+OCR_ROOT = r"C:\Users\shiri\Dropbox\ocr_patents\ocr_patents\random_sample"
+OUTPUT_FILE = rf"C:\Users\shiri\Dropbox\ocr_patents\info\corpus_metadata_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+HEADER_MAX_LINES = 20  # header size when a page has no stored layout
+
+# --incremental keeps one stable output plus a state file of per-folder
+# fingerprints, and re-extracts only new or changed folders
+INCREMENTAL_OUTPUT = r"C:\Users\shiri\Dropbox\ocr_patents\info\corpus_metadata.csv"
+
+# -----------------------------
+# PAGES
+# -----------------------------
+# The runner reads each folder's first page once and splits it once; every
+# selected extractor then works on the same Page. Pages come from the text
+# files under OCR_ROOT or, with --shards, straight from a ShardStore. Each
+# is found as a PageRef first, whose fingerprint changes whenever the page
+# is rewritten and costs no read: the file's name, size and mtime, or the
+# location of the page's latest record in the shard.
+TEXT_SUFFIX = "_text.txt"
+
+
+class PageRef:
+    """A folder's first page, located and fingerprinted but not yet read."""
+
+    def __init__(self, folder, name, fingerprint, load):
+        self.folder = folder
+        self.name = name
+        self.fingerprint = fingerprint
+        self._load = load
+
+    def load(self):
+        """Read the page; returns a Page."""
+        return self._load()
+
+
+class Page:
+    """One folder's first page with the header/body split shared by extractors."""
+
+    def __init__(self, folder, name, text, layout=None):
+        self.folder = folder
+        self.name = name
+        self.text = text
+        self.layout = layout
+
+        header_lines, body_lines = [], []
+        if layout is not None:
+            header_lines, body_lines = locate_header(layout)
+        if not header_lines:
+            lines = text.split("\n")
+            header_lines = lines[:HEADER_MAX_LINES]
+            body_lines = lines[HEADER_MAX_LINES:]
+        self.header_lines = header_lines
+        self.body_lines = body_lines
+        self.header = "\n".join(self.header_lines)
+        self.body = "\n".join(self.body_lines)
+
+    @cached_property
+    def header_doc(self):
+        """spaCy Doc of the header, parsed on first use and shared."""
+        return ocr_extraction.get_nlp()(self.header)
+
+
+def first_text_entry(folder_path):
+    """Return the DirEntry of the lowest-numbered page's *_text.txt, or None.
+
+    One pass over the directory listing, keeping the minimum, instead of
+    sorting every listing with a regex per file.
+    """
+    best_page, best_entry = None, None
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if not entry.name.endswith(TEXT_SUFFIX):
+                continue
+            stem = entry.name[: -len(TEXT_SUFFIX)]
+            if not stem.isdigit():
+                continue
+            page = int(stem)
+            if best_page is None or page < best_page:
+                best_page, best_entry = page, entry
+    return best_entry
+
+
+def read_text_page(folder, text_path):
+    with open(text_path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    return Page(folder, os.path.basename(text_path), text, load_layout(text_path))
+
+
+def iter_text_pages(ocr_root, shard=None):
+    """Yield a PageRef for the first page of every folder under ocr_root."""
+    with os.scandir(ocr_root) as entries:
+        folders = sorted(entry.name for entry in entries if entry.is_dir())
+
+    for folder in folders:
+        if not in_shard(folder, shard):
+            continue
+        entry = first_text_entry(os.path.join(ocr_root, folder))
+        if entry is None:
+            print(f"[NO OCR FILE] {folder}")
+            continue
+
+        stat = entry.stat()
+        yield PageRef(
+            folder,
+            entry.name,
+            [entry.name, stat.st_size, stat.st_mtime_ns],
+            lambda folder=folder, path=entry.path: read_text_page(folder, path),
+        )
+
+
+def read_shard_page(store, folder, page):
+    record = store.get_record(folder, page)
+    layout = base64.b64decode(record["layout"]) if "layout" in record else None
+    return Page(
+        folder,
+        f"{page:08d}{TEXT_SUFFIX}",
+        record["text"],
+        decode_layout(layout) if layout is not None else None,
+    )
+
+
+def iter_shard_pages(shard_dir, shard=None):
+    """Yield a PageRef for the first page of every folder in a shard store."""
+    # Opened read-only (owns no shards), so a running OCR node is never cut off
+    store = ShardStore(shard_dir, owned=())
+    for folder in store.folders():
+        if not in_shard(folder, shard):
+            continue
+        page = store.pages(folder)[0]
+        name = f"{page:08d}{TEXT_SUFFIX}"
+        yield PageRef(
+            folder,
+            name,
+            [name, *store.location(folder, page)],
+            lambda folder=folder, page=page: read_shard_page(store, folder, page),
+        )
+
+
+# -----------------------------
+# EXTRACTOR REGISTRY
+# -----------------------------
+# name -> (output fields, function(page) -> {field: value}, version)
+EXTRACTORS = {}
+
+
+def extractor(name, fields, version=1):
+    """Register a field extractor under name.
+
+    Bump version whenever the extractor's rules change, so --incremental
+    runs re-extract its fields for every folder.
+    """
+
+    def register(fn):
+        EXTRACTORS[name] = (fields, fn, version)
+        return fn
+
+    return register
+
+
+@extractor("title", ["title"])
+def extract_title(page):
+    return {"title": ocr_extraction.extract_title(page.header_lines)}
+
+
+@extractor("numbers", ["patent_number", "serial_number"])
+def extract_numbers(page):
+    return {
+        "patent_number": ocr_extraction.extract_patent_number(page.header),
+        "serial_number": ocr_extraction.extract_serial_number(page.header),
+    }
+
+
+@extractor("dates", ["application_date", "patent_date", "first_date"])
+def extract_dates(page):
+    application_date, patent_date = ocr_extraction.dates_from_doc(page.header_doc)
+    # A header that is a prefix of the page holds its first date if it has
+    # one; a layout header is picked by position, so then scan the page
+    first_date = ""
+    if page.text.startswith(page.header):
+        first_date = metadata_extractor.extract_date(page.header)
+    if not first_date:
+        first_date = metadata_extractor.extract_date(page.text)
+    return {
+        "application_date": application_date,
+        "patent_date": patent_date,
+        "first_date": first_date,
+    }
+
+
+@extractor("rule_dates", ["rule_patent_date", "rule_filed_date"])
+def extract_rule_dates(page):
+    patent_date, filed_date = extract_date.extract_patent_dates(page.text, page.folder)
+    return {"rule_patent_date": patent_date, "rule_filed_date": filed_date}
+
+
+@extractor(
+    "names_locations",
+    ["name_header", "name_body", "location_header", "location_body"],
+)
+def extract_names_locations(page):
+    name_header, name_body, location_header, location_body = (
+        metadata_extractor.extract_names_and_locations(page.header_lines, page.body)
+    )
+    return {
+        "name_header": name_header,
+        "name_body": name_body,
+        "location_header": location_header,
+        "location_body": location_body,
+    }
+
+
+@extractor("entities", ["names", "locations"])
+def extract_entities(page):
+    names, locations = ocr_extraction.names_and_locations_from_doc(page.header_doc)
+    return {"names": names, "locations": locations}
+
+
+# -----------------------------
+# MAIN PIPELINE
+# -----------------------------
+def state_path(output_file):
+    return os.path.splitext(output_file)[0] + "_state.json"
+
+
+def load_previous(output_file):
+    """Return {folder: (row, state)} from an earlier incremental run."""
+    path = state_path(output_file)
+    if not os.path.exists(output_file) or not os.path.exists(path):
+        return {}
+
+    with open(path, encoding="utf-8") as f:
+        states = json.load(f)["folders"]
+    with open(output_file, newline="", encoding="utf-8") as f:
+        return {
+            row["folder"]: (row, states[row["folder"]])
+            for row in csv.DictReader(f)
+            if row["folder"] in states
+        }
+
+
+def run_corpus(refs, names, output_file, incremental=False):
+    """Run the named extractors on every page and write one combined CSV.
+
+    With incremental, a folder whose first page has the same fingerprint
+    as last time keeps its previous fields, and only extractors whose
+    version changed since then are run on it. Only the selected
+    extractors' versions are kept, since the output holds only their
+    fields; a later run selecting more extractors runs the others again.
+    Folders no longer found are dropped from the output.
+    """
+    fieldnames = ["folder", "first_page"]
+    for name in names:
+        fieldnames.extend(EXTRACTORS[name][0])
+    previous = load_previous(output_file) if incremental else {}
+
+    counts = {"extracted": 0, "reused": 0}
+    states = {}
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for ref in refs:
+            row, state = previous.get(ref.folder, (None, None))
+            if state is not None and state["fingerprint"] == ref.fingerprint:
+                versions = {
+                    name: version
+                    for name, version in state["versions"].items()
+                    if name in names
+                }
+                todo = [
+                    name for name in names if versions.get(name) != EXTRACTORS[name][2]
+                ]
+            else:
+                row, versions, todo = {}, {}, names
+
+            row.update({"folder": ref.folder, "first_page": ref.name})
+            if todo:
+                page = ref.load()
+                for name in todo:
+                    row.update(EXTRACTORS[name][1](page))
+                    versions[name] = EXTRACTORS[name][2]
+                counts["extracted"] += 1
+                print(f"[OK] {ref.folder} → {ref.name}")
+            else:
+                counts["reused"] += 1
+
+            writer.writerow(row)
+            states[ref.folder] = {"fingerprint": ref.fingerprint, "versions": versions}
+
+    # Replaced only once complete, so an interrupted run keeps the old output
+    os.replace(tmp_file, output_file)
+    if incremental:
+        with open(state_path(output_file), "w", encoding="utf-8") as f:
+            json.dump({"folders": states}, f)
+
+    removed = len(set(previous) - set(states))
+    print(
+        f"\nSaved {len(states)} rows to:\n{output_file}\n"
+        f"({counts['extracted']} extracted, {counts['reused']} unchanged, "
+        f"{removed} removed)\n"
+    )
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run field extractors over the corpus")
+    parser.add_argument(
+        "--extractors",
+        default=",".join(EXTRACTORS),
+        help=f"comma-separated subset of: {', '.join(EXTRACTORS)}",
+    )
+    parser.add_argument(
+        "--shards", metavar="SHARD_DIR", help="read pages from an ocr_shards directory"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-extract new or changed folders, merging into --output",
+    )
+    parser.add_argument("--output")
+    add_shard_argument(parser)
+    args = parser.parse_args(argv)
+
+    args.extractors = [name.strip() for name in args.extractors.split(",") if name]
+    unknown = [name for name in args.extractors if name not in EXTRACTORS]
+    if unknown:
+        parser.error(f"unknown extractors: {', '.join(unknown)}")
+    if args.output is None:
+        args.output = INCREMENTAL_OUTPUT if args.incremental else OUTPUT_FILE
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.shards:
+        refs = iter_shard_pages(args.shards, args.shard)
+    else:
+        refs = iter_text_pages(OCR_ROOT, args.shard)
+    run_corpus(
+        refs,
+        args.extractors,
+        shard_output_path(args.output, args.shard),
+        incremental=args.incremental,
+    )
+
+
+if __name__ == "__main__":
+    main()
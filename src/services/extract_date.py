@@ -3,8 +3,10 @@ import csv
 import re
 import unicodedata
 from datetime import datetime
-from difflib import SequenceMatcher
-from dateparser import parse
+
+from src.anchor_index import AnchorIndex
+from src.model_registry import parse_date as parse
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 # =================================================
 # CONFIG
@@ -43,14 +45,6 @@ def normalize_text(text):
     )
 
 
-def fuzzy_contains(line, target, threshold=0.72):
-    words = re.findall(r"[A-Za-z]{3,}", line.lower())
-    for word in words:
-        if SequenceMatcher(None, word, target).ratio() >= threshold:
-            return True
-    return False
-
-
 def extract_date_from_line(line):
     pattern = r"([A-Za-z]{3,9}\.?\s+\d{1,2}[,\.]?\s+\d{4})"
     m = re.search(pattern, line, re.I)
@@ -69,6 +63,7 @@ def extract_date_from_line(line):
 def extract_patent_dates(text, patnum):
     text = normalize_text(text)
     lines = text.splitlines()
+    anchors = AnchorIndex(lines)
 
     patent_date = ""
     filed_date = ""
@@ -84,26 +79,26 @@ def extract_patent_dates(text, patnum):
 
     # -------- 3543618–3544118 --------
     if 3543618 <= patnum_int <= 3544118:
-        for line in lines:
-            if "(22" in line or "[22" in line:
+        for i, line in enumerate(lines):
+            if anchors.has_marker("22", i, closed=False):
                 filed_date = extract_date_from_line(line)
-            if "(45" in line or "[45" in line:
+            if anchors.has_marker("45", i, closed=False):
                 patent_date = extract_date_from_line(line)
 
     # -------- 3558791–3634888 --------
     elif 3558791 <= patnum_int <= 3634888:
-        for line in lines:
-            if "22 Filed" in line or "(22)" in line:
+        for i, line in enumerate(lines):
+            if "22 Filed" in line or anchors.has_marker("22", i, brackets="("):
                 filed_date = extract_date_from_line(line)
-            if "45 Patented" in line or "(45)" in line:
+            if "45 Patented" in line or anchors.has_marker("45", i, brackets="("):
                 patent_date = extract_date_from_line(line)
 
     # -------- 3634889–3695820 --------
     elif 3634889 <= patnum_int <= 3695820:
-        for line in lines:
-            if "[22]" in line:
+        for i, line in enumerate(lines):
+            if anchors.has_marker("22", i, brackets="["):
                 filed_date = extract_date_from_line(line)
-            if "[45]" in line:
+            if anchors.has_marker("45", i, brackets="["):
                 patent_date = extract_date_from_line(line)
 
     # =================================================
@@ -111,20 +106,18 @@ def extract_patent_dates(text, patnum):
     # =================================================
 
     if not patent_date or not filed_date:
-        for line in lines:
+        for i, line in enumerate(lines):
             if not filed_date:
                 if (
-                    fuzzy_contains(line, "filed")
-                    or fuzzy_contains(line, "application")
-                    or "[22]" in line
+                    anchors.has_any_keyword(("filed", "application"), i)
+                    or anchors.has_marker("22", i, brackets="[")
                 ):
                     filed_date = extract_date_from_line(line)
 
             if not patent_date:
                 if (
-                    fuzzy_contains(line, "patented")
-                    or fuzzy_contains(line, "issued")
-                    or "[45]" in line
+                    anchors.has_any_keyword(("patented", "issued"), i)
+                    or anchors.has_marker("45", i, brackets="[")
                 ):
                     patent_date = extract_date_from_line(line)
 
@@ -139,6 +132,21 @@ def extract_patent_dates(text, patnum):
     return patent_date, filed_date
 
 
+def date_row(folder, patent_date, filed_date):
+    """Return the output row for a folder's extracted patent and filed dates."""
+    pyear, pmonth, pday = split_date(patent_date)
+    fyear, fmonth, fday = split_date(filed_date)
+    return {
+        "patnum": folder,
+        "iyear": pyear,
+        "imonth": pmonth,
+        "iday": pday,
+        "fyear": fyear,
+        "fmonth": fmonth,
+        "fday": fday,
+    }
+
+
 # =================================================
 # REFERENCE LOADER
 # =================================================
@@ -231,10 +239,12 @@ def compare_dates_with_flags(extracted_row, reference_row):
 # =================================================
 
 
-def run():
+def run(shard=None):
     extracted_rows = []
 
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
 
         if not os.path.isdir(folder_path):
@@ -253,21 +263,7 @@ def run():
             text = f.read()
 
         patent_date, filed_date = extract_patent_dates(text, folder)
-
-        pyear, pmonth, pday = split_date(patent_date)
-        fyear, fmonth, fday = split_date(filed_date)
-
-        extracted_rows.append(
-            {
-                "patnum": folder,
-                "iyear": pyear,
-                "imonth": pmonth,
-                "iday": pday,
-                "fyear": fyear,
-                "fmonth": fmonth,
-                "fday": fday,
-            }
-        )
+        extracted_rows.append(date_row(folder, patent_date, filed_date))
 
         print(
             f"[OK] {folder} | "
@@ -291,12 +287,13 @@ def run():
             }
         )
 
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_CSV, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=final_rows[0].keys())
         writer.writeheader()
         writer.writerows(final_rows)
 
-    print(f"\n✅ Done! Comparison CSV saved to:\n{OUTPUT_CSV}")
+    print(f"\n✅ Done! Comparison CSV saved to:\n{output_file}")
 
 
 # =================================================
@@ -304,4 +301,4 @@ def run():
 # =================================================
 
 if __name__ == "__main__":
-    run()
+    run(parse_shard_arg())
@@ -3,52 +3,18 @@ import re
 import csv
 import time
 from datetime import datetime
-from difflib import get_close_matches
-from geopy.geocoders import Nominatim
+
+from src import model_registry
+from src.month_typos import fix_month_typo
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 OCR_ROOT = r"C:\Users\shiri\Dropbox\ocr_patents\ocr_patents\random_sample"
 OUTPUT_FILE = rf"C:\Users\shiri\Dropbox\ocr_patents\info\metadata_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
-# Initialize Nominatim geolocator
-geolocator = Nominatim(user_agent="patent_location_checker")
+# The Nominatim geolocator is created on first lookup (src.model_registry)
 location_cache = {}
 
 
-def fix_month_typo(raw_date):
-    """Automatically correct OCR month typos."""
-    months = [
-        "January",
-        "February",
-        "March",
-        "April",
-        "May",
-        "June",
-        "July",
-        "August",
-        "September",
-        "October",
-        "November",
-        "December",
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-    for word in raw_date.split():
-        matches = get_close_matches(word, months, n=1, cutoff=0.7)
-        if matches:
-            raw_date = raw_date.replace(word, matches[0])
-    return raw_date
-
-
 def normalize_date(raw_date):
     """Convert various date formats to MM/DD/YYYY format."""
     if not raw_date:
@@ -139,6 +105,7 @@ def is_location_real(location):
         return False
     if location in location_cache:
         return location_cache[location]
+    geolocator = model_registry.get("nominatim")
     try:
         loc = geolocator.geocode(location)
         time.sleep(1)  # respect rate limit
@@ -150,10 +117,12 @@ def is_location_real(location):
         return False
 
 
-def run_metadata_extraction():
+def run_metadata_extraction(shard=None):
     rows = []
 
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
         if not os.path.isdir(folder_path):
             continue
@@ -204,7 +173,8 @@ def run_metadata_extraction():
         print(f"[OK] {folder} → {first_page}")
 
     # Write CSV
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_FILE, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
             f,
             fieldnames=[
@@ -224,8 +194,8 @@ def run_metadata_extraction():
         writer.writeheader()
         writer.writerows(rows)
 
-    print(f"\nSaved metadata to:\n{OUTPUT_FILE}\n")
+    print(f"\nSaved metadata to:\n{output_file}\n")
 
 
 if __name__ == "__main__":
-    run_metadata_extraction()
+    run_metadata_extraction(parse_shard_arg())
@@ -2,47 +2,15 @@ import os
 import re
 import csv
 from datetime import datetime
-from difflib import get_close_matches
+
+from src.month_typos import fix_month_typo
+from src.page_layout import load_layout, locate_header
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 OCR_ROOT = r"C:\Users\shiri\Dropbox\ocr_patents\ocr_patents\random_sample"
 OUTPUT_FILE = rf"C:\Users\shiri\Dropbox\ocr_patents\info\metadata_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
 
-def fix_month_typo(raw_date):
-    """Automatically correct OCR month typos."""
-    months = [
-        "January",
-        "February",
-        "March",
-        "April",
-        "May",
-        "June",
-        "July",
-        "August",
-        "September",
-        "October",
-        "November",
-        "December",
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-    for word in raw_date.split():
-        matches = get_close_matches(word, months, n=1, cutoff=0.7)
-        if matches:
-            raw_date = raw_date.replace(word, matches[0])
-    return raw_date
-
-
 def normalize_date(raw_date):
     """Convert various date formats to MM/DD/YYYY format."""
     if not raw_date:
@@ -87,7 +55,13 @@ def extract_date(text):
     return ""
 
 
-def split_header_body(text, max_header_lines=12):
+def split_header_body(text, max_header_lines=12, layout=None):
+    if layout is not None:
+        # Header located by position on the page instead of a line count
+        header_lines, body_lines = locate_header(layout)
+        if header_lines:
+            return "\n".join(header_lines), "\n".join(body_lines), header_lines
+
     lines = text.split("\n")
     header = "\n".join(lines[:max_header_lines])
     body = "\n".join(lines[max_header_lines:])
@@ -134,10 +108,12 @@ def get_first_text_file(folder_path):
     return txt_files_sorted[0]
 
 
-def run_metadata_extraction():
+def run_metadata_extraction(shard=None):
     rows = []
 
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
         if not os.path.isdir(folder_path):
             continue
@@ -147,19 +123,27 @@ def run_metadata_extraction():
             print(f"[NO OCR FILE] {folder}")
             continue
 
+        text_path = os.path.join(folder_path, first_page)
         with open(
-            os.path.join(folder_path, first_page),
+            text_path,
             "r",
             encoding="utf-8",
             errors="ignore",
         ) as f:
             text = f.read()
 
-        header, body, header_lines = split_header_body(text)
+        header, body, header_lines = split_header_body(
+            text, layout=load_layout(text_path)
+        )
         name_header, name_body, location_header, location_body = (
             extract_names_and_locations(header_lines, body)
         )
-        date = extract_date(text)
+        # When the header is a prefix of the page (always without a layout),
+        # its first date is the page's first date, usually found without
+        # scanning the whole text. A layout header is picked by position and
+        # need not be a prefix, so then the whole text is scanned as before.
+        date = extract_date(header) if text.startswith(header) else ""
+        date = date or extract_date(text)
 
         names_missing = "YES" if not name_header and not name_body else "NO"
         locations_missing = "YES" if not location_header and not location_body else "NO"
@@ -182,7 +166,8 @@ def run_metadata_extraction():
         print(f"[OK] {folder} → {first_page}")
 
     # Write CSV
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_FILE, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
             f,
             fieldnames=[
@@ -201,8 +186,8 @@ def run_metadata_extraction():
         writer.writeheader()
         writer.writerows(rows)
 
-    print(f"\nSaved metadata to:\n{OUTPUT_FILE}\n")
+    print(f"\nSaved metadata to:\n{output_file}\n")
 
 
 if __name__ == "__main__":
-    run_metadata_extraction()
+    run_metadata_extraction(parse_shard_arg())
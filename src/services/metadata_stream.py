@@ -0,0 +1,98 @@
+import csv
+import queue
+import threading
+
+from src.page_layout import decode_layout
+from src.services.extract_date import extract_patent_dates
+from src.services.ocr_extraction import FIELDNAMES, extract_metadata
+
+# ==================================================
+# STREAMING METADATA EXTRACTION
+# ==================================================
+# google_cloud_vision (STREAM_EXTRACTION = True) submits the text of each
+# folder's first page as soon as it is written. One consumer thread runs the
+# ocr_extraction rules (patent/serial number, spaCy dates, names, title) and
+# the extract_date range rules on it, and appends the row to a CSV that is
+# flushed per row, so metadata appears while OCR is still running. The
+# queue is bounded: if extraction falls behind, submit() blocks the OCR
+# result handler instead of buffering pages without limit. While it waits
+# it checks every PUT_POLL_SEC that the consumer is still alive, and raises
+# if it died rather than waiting for room that will never come.
+STREAM_FIELDNAMES = FIELDNAMES + ["rule_patent_date", "rule_filed_date"]
+PUT_POLL_SEC = 1.0
+
+
+def extract_stream_row(folder, first_page, text, layout=None):
+    """Return the combined metadata row for one folder's first page."""
+    row = extract_metadata(folder, first_page, text, layout)
+    row["rule_patent_date"], row["rule_filed_date"] = extract_patent_dates(
+        text, folder
+    )
+    return row
+
+
+class MetadataStream:
+    """Bounded queue of first pages feeding a metadata-extraction thread."""
+
+    def __init__(self, output_file, maxsize):
+        self.output_file = output_file
+        self.rows = 0
+        self.errors = []  # (folder, message) of pages whose extraction raised
+        self.failure = None  # exception that stopped the consumer thread
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+
+    def submit(self, folder, first_page, text, layout=None):
+        """Queue one first page (layout as encoded bytes), waiting if full.
+
+        Raises RuntimeError if the consumer thread has stopped.
+        """
+        self._put((folder, first_page, text, layout))
+
+    def _put(self, item):
+        while True:
+            if not self._thread.is_alive():
+                raise RuntimeError(
+                    f"metadata extraction thread stopped: {self.failure!r}"
+                ) from self.failure
+            try:
+                self._queue.put(item, timeout=PUT_POLL_SEC)
+                return
+            except queue.Full:
+                continue
+
+    def _consume(self):
+        try:
+            self._write_rows()
+        except Exception as e:
+            self.failure = e
+            raise
+
+    def _write_rows(self):
+        with open(self.output_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=STREAM_FIELDNAMES)
+            writer.writeheader()
+            f.flush()
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+
+                folder, first_page, text, layout = item
+                try:
+                    layout = decode_layout(layout) if layout is not None else None
+                    row = extract_stream_row(folder, first_page, text, layout)
+                    writer.writerow(row)
+                except Exception as e:
+                    self.errors.append((folder, str(e)))
+                    continue
+                f.flush()
+                self.rows += 1
+
+    def close(self):
+        """Finish the queued pages; returns the number of rows written."""
+        if self._thread.is_alive():
+            self._put(None)
+        self._thread.join()
+        return self.rows
@@ -2,8 +2,11 @@ import os
 import re
 import csv
 from datetime import datetime
-from difflib import get_close_matches
-import spacy
+
+from src import model_registry
+from src.month_typos import fix_month_typo
+from src.page_layout import load_layout, locate_header
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 # -----------------------------
 # CONFIG
@@ -12,47 +15,34 @@ OCR_ROOT = r"C:\Users\shiri\Dropbox\ocr_patents\ocr_patents\random_sample"
 OUTPUT_FILE = rf"C:\Users\shiri\Dropbox\ocr_patents\info\metadata_final_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
 HEADER_MAX_LINES = 25
-nlp = spacy.load("en_core_web_sm")  # spaCy NER
-
-# -----------------------------
-# DATE HELPERS
-# -----------------------------
-MONTHS = [
-    "January",
-    "February",
-    "March",
-    "April",
-    "May",
-    "June",
-    "July",
-    "August",
-    "September",
-    "October",
-    "November",
-    "December",
-    "Jan",
-    "Feb",
-    "Mar",
-    "Apr",
-    "May",
-    "Jun",
-    "Jul",
-    "Aug",
-    "Sep",
-    "Oct",
-    "Nov",
-    "Dec",
+FIELDNAMES = [
+    "folder",
+    "first_page",
+    "title",
+    "names",
+    "locations",
+    "patent_number",
+    "serial_number",
+    "application_date",
+    "patent_date",
 ]
+# spaCy pipeline (entity recognition only), loaded on first use and shared
+# through src.model_registry
+SPACY_MODEL = "en_core_web_sm"
 
+# Headers are parsed in batches with nlp.pipe; NLP_PROCESSES > 1 parses in
+# that many worker processes
+NLP_BATCH_SIZE = 64
+NLP_PROCESSES = 1
 
-def fix_month_typo(raw_date: str) -> str:
-    for word in raw_date.split():
-        matches = get_close_matches(word, MONTHS, n=1, cutoff=0.7)
-        if matches:
-            raw_date = raw_date.replace(word, matches[0])
-    return raw_date
 
+def get_nlp():
+    return model_registry.get(SPACY_MODEL)
 
+
+# -----------------------------
+# DATE HELPERS
+# -----------------------------
 def normalize_date(raw_date: str) -> str:
     if not raw_date:
         return ""
@@ -84,7 +74,13 @@ def get_first_text_file(folder_path: str):
     return sorted(txt_files, key=lambda x: int(re.findall(r"(\d+)_text\.txt", x)[0]))[0]
 
 
-def split_header(text: str):
+def split_header(text: str, layout=None):
+    # With stored geometry the header is the top of the page, however many
+    # lines the OCR produced; otherwise fall back to a fixed line count
+    if layout is not None:
+        header_lines, _ = locate_header(layout)
+        if header_lines:
+            return header_lines
     lines = text.split("\n")[:HEADER_MAX_LINES]
     return lines
 
@@ -117,7 +113,11 @@ def extract_serial_number(text: str) -> str:
 
 
 def extract_dates(text: str):
-    doc = nlp(text)
+    return dates_from_doc(get_nlp()(text))
+
+
+def dates_from_doc(doc):
+    text = doc.text
     app_date = ""
     pat_date = ""
     for ent in doc.ents:
@@ -136,8 +136,10 @@ def extract_dates(text: str):
 
 
 def extract_names_and_locations(header_lines):
-    header_text = "\n".join(header_lines)
-    doc = nlp(header_text)
+    return names_and_locations_from_doc(get_nlp()("\n".join(header_lines)))
+
+
+def names_and_locations_from_doc(doc):
     persons, locations = [], []
     for ent in doc.ents:
         if ent.label_ == "PERSON":
@@ -171,12 +173,39 @@ def extract_title(header_lines):
     return ""
 
 
+def extract_metadata(folder, first_page, text, layout=None):
+    """Return the metadata row for one folder from its first page's text."""
+    header_lines = split_header(text, layout)
+    doc = get_nlp()("\n".join(header_lines))
+    return metadata_row(folder, first_page, header_lines, doc)
+
+
+def metadata_row(folder, first_page, header_lines, doc):
+    """Build the metadata row from the header lines and their parsed Doc."""
+    header_text = doc.text
+    application_date, patent_date = dates_from_doc(doc)
+    names, locations = names_and_locations_from_doc(doc)
+    return {
+        "folder": folder,
+        "first_page": first_page,
+        "title": extract_title(header_lines),
+        "names": names,
+        "locations": locations,
+        "patent_number": extract_patent_number(header_text),
+        "serial_number": extract_serial_number(header_text),
+        "application_date": application_date,
+        "patent_date": patent_date,
+    }
+
+
 # -----------------------------
 # MAIN PIPELINE
 # -----------------------------
-def run_extraction():
-    rows = []
+def read_headers(shard=None):
+    """Yield (folder, first_page, header_lines) for every folder's first page."""
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
         if not os.path.isdir(folder_path):
             continue
@@ -184,57 +213,41 @@ def run_extraction():
         if not first_page:
             print(f"[NO OCR FILE] {folder}")
             continue
+        text_path = os.path.join(folder_path, first_page)
         with open(
-            os.path.join(folder_path, first_page),
+            text_path,
             "r",
             encoding="utf-8",
             errors="ignore",
         ) as f:
             text = f.read()
-        header_lines = split_header(text)
-        header_text = "\n".join(header_lines)
-
-        title = extract_title(header_lines)
-        patent_number = extract_patent_number(header_text)
-        serial_number = extract_serial_number(header_text)
-        application_date, patent_date = extract_dates(header_text)
-        names, locations = extract_names_and_locations(header_lines)
-
-        rows.append(
-            {
-                "folder": folder,
-                "first_page": first_page,
-                "title": title,
-                "names": names,
-                "locations": locations,
-                "patent_number": patent_number,
-                "serial_number": serial_number,
-                "application_date": application_date,
-                "patent_date": patent_date,
-            }
-        )
+        yield folder, first_page, split_header(text, load_layout(text_path))
+
+
+def run_extraction(shard=None):
+    # Each header is parsed once, in batches, and the Doc is shared by the
+    # date and name/location extractors
+    headers = (
+        ("\n".join(header_lines), (folder, first_page, header_lines))
+        for folder, first_page, header_lines in read_headers(shard)
+    )
+    docs = get_nlp().pipe(
+        headers, as_tuples=True, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES
+    )
+
+    rows = []
+    for doc, (folder, first_page, header_lines) in docs:
+        rows.append(metadata_row(folder, first_page, header_lines, doc))
         print(f"[OK] {folder} → {first_page}")
 
     # Save CSV
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
-                "folder",
-                "first_page",
-                "title",
-                "names",
-                "locations",
-                "patent_number",
-                "serial_number",
-                "application_date",
-                "patent_date",
-            ],
-        )
+    output_file = shard_output_path(OUTPUT_FILE, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
         writer.writerows(rows)
-    print(f"\nSaved to:\n{OUTPUT_FILE}\n")
+    print(f"\nSaved to:\n{output_file}\n")
 
 
 if __name__ == "__main__":
-    run_extraction()
+    run_extraction(parse_shard_arg())
@@ -2,9 +2,11 @@ import os
 import re
 import csv
 from datetime import datetime
-from difflib import get_close_matches
 
-import spacy
+from src import model_registry
+from src.month_typos import fix_month_typo
+from src.page_layout import load_layout, locate_header
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 # -----------------------------
 # CONFIG
@@ -16,47 +18,23 @@ HEADER_MAX_LINES = 20
 BODY_SNIPPET_CHARS = 3000
 MAX_SCAN_LINES = 40  # for patent title
 
-# Load spaCy once
-nlp = spacy.load("en_core_web_sm")
+# spaCy pipeline (entity recognition only), loaded on first use and shared
+# through src.model_registry
+SPACY_MODEL = "en_core_web_sm"
+
+# Documents are parsed in batches with nlp.pipe; NLP_PROCESSES > 1 parses
+# in that many worker processes
+NLP_BATCH_SIZE = 64
+NLP_PROCESSES = 1
+
+
+def get_nlp():
+    return model_registry.get(SPACY_MODEL)
 
 
 # -----------------------------
 # DATE HELPERS
 # -----------------------------
-def fix_month_typo(raw_date: str) -> str:
-    months = [
-        "January",
-        "February",
-        "March",
-        "April",
-        "May",
-        "June",
-        "July",
-        "August",
-        "September",
-        "October",
-        "November",
-        "December",
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-    for word in raw_date.split():
-        matches = get_close_matches(word, months, n=1, cutoff=0.7)
-        if matches:
-            raw_date = raw_date.replace(word, matches[0])
-    return raw_date
-
-
 def normalize_date(raw_date: str) -> str:
     if not raw_date:
         return ""
@@ -82,7 +60,15 @@ def normalize_date(raw_date: str) -> str:
 # -----------------------------
 # FILE / TEXT HELPERS
 # -----------------------------
-def split_header_body(text: str, max_header_lines: int = HEADER_MAX_LINES):
+def split_header_body(
+    text: str, max_header_lines: int = HEADER_MAX_LINES, layout=None
+):
+    if layout is not None:
+        # Header located by position on the page instead of a line count
+        header_lines, body_lines = locate_header(layout)
+        if header_lines:
+            return "\n".join(header_lines), "\n".join(body_lines), header_lines
+
     lines = text.split("\n")
     header = "\n".join(lines[:max_header_lines])
     body = "\n".join(lines[max_header_lines:])
@@ -162,7 +148,11 @@ def extract_patent_title(body_lines):
 # DATE EXTRACTION (spaCy)
 # -----------------------------
 def extract_application_and_patent_dates(text: str) -> tuple[str, str]:
-    doc = nlp(text)
+    return dates_from_doc(get_nlp()(text))
+
+
+def dates_from_doc(doc) -> tuple[str, str]:
+    text = doc.text
     app_date = ""
     pat_date = ""
 
@@ -189,7 +179,10 @@ def extract_application_and_patent_dates(text: str) -> tuple[str, str]:
 # OPTIONAL spaCy PERSON / GPE
 # -----------------------------
 def extract_people_gpe_from_header(header: str) -> tuple[str, str]:
-    doc = nlp(header)
+    return people_gpe_from_doc(get_nlp()(header))
+
+
+def people_gpe_from_doc(doc) -> tuple[str, str]:
     person = ""
     gpe = ""
 
@@ -207,10 +200,11 @@ def extract_people_gpe_from_header(header: str) -> tuple[str, str]:
 # -----------------------------
 # MAIN PIPELINE
 # -----------------------------
-def run_extraction():
-    rows = []
-
+def read_pages(shard=None):
+    """Yield (folder, first_page, header, body) for every folder's first page."""
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
         if not os.path.isdir(folder_path):
             continue
@@ -220,28 +214,42 @@ def run_extraction():
             print(f"[NO OCR FILE] {folder}")
             continue
 
+        text_path = os.path.join(folder_path, first_page)
         with open(
-            os.path.join(folder_path, first_page),
+            text_path,
             "r",
             encoding="utf-8",
             errors="ignore",
         ) as f:
             text = f.read()
 
-        header, body, header_lines = split_header_body(text)
-        body_lines = body.split("\n")
+        header, body, _ = split_header_body(text, layout=load_layout(text_path))
+        yield folder, first_page, header, body
 
-        header_for_spacy = header
-        body_snippet = body[:BODY_SNIPPET_CHARS]
 
-        patent_title = extract_patent_title(body_lines)
-        patent_number = extract_patent_number(header_for_spacy + "\n" + body_snippet)
-        serial_number = extract_serial_number(header_for_spacy + "\n" + body_snippet)
-        application_filed_date, patented_date = extract_application_and_patent_dates(
-            header_for_spacy + "\n" + body_snippet
+def run_extraction(shard=None):
+    # Two Docs per page, parsed in the same batches: header plus body
+    # snippet for the numbers and dates, and the header alone for PERSON/GPE
+    def texts():
+        for page in read_pages(shard):
+            header, body = page[2], page[3]
+            yield header + "\n" + body[:BODY_SNIPPET_CHARS], page
+            yield header, page
+
+    docs = iter(
+        get_nlp().pipe(
+            texts(), as_tuples=True, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES
         )
+    )
 
-        name_spacy, location_spacy = extract_people_gpe_from_header(header_for_spacy)
+    rows = []
+    # pipe keeps input order, so the Docs come in (page, header) pairs
+    for (doc, (folder, first_page, header, body)), (header_doc, _) in zip(docs, docs):
+        patent_title = extract_patent_title(body.split("\n"))
+        patent_number = extract_patent_number(doc.text)
+        serial_number = extract_serial_number(doc.text)
+        application_filed_date, patented_date = dates_from_doc(doc)
+        name_spacy, location_spacy = people_gpe_from_doc(header_doc)
 
         rows.append(
             {
@@ -265,7 +273,8 @@ def run_extraction():
 
         print(f"[OK] {folder} → {first_page}")
 
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_FILE, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
             f,
             fieldnames=[
@@ -287,8 +296,8 @@ def run_extraction():
         writer.writeheader()
         writer.writerows(rows)
 
-    print(f"\nSaved to:\n{OUTPUT_FILE}\n")
+    print(f"\nSaved to:\n{output_file}\n")
 
 
 if __name__ == "__main__":
-    run_extraction()
+    run_extraction(parse_shard_arg())
@@ -0,0 +1,22 @@
+# -----------------------------
+# ENTITY-ONLY spaCy PIPELINE
+# -----------------------------
+# The extractors only read doc.ents, so every other component (tagger,
+# parser, lemmatizer, ...) is disabled after loading. A component that an
+# entity component listens to (a shared tok2vec) is kept enabled.
+ENTITY_COMPONENTS = ("ner", "entity_ruler")
+
+
+def load_entity_pipeline(name):
+    """Load a spaCy pipeline with only the entity components enabled."""
+    import spacy  # imported here: importing spaCy alone takes over a second
+
+    nlp = spacy.load(name)
+    keep = {n for n in nlp.pipe_names if n in ENTITY_COMPONENTS}
+    for component_name, component in nlp.pipeline:
+        if keep & set(getattr(component, "listening_components", ())):
+            keep.add(component_name)
+    for component_name in nlp.pipe_names:
+        if component_name not in keep:
+            nlp.disable_pipe(component_name)
+    return nlp
@@ -3,9 +3,11 @@ import csv
 import re
 import unicodedata
 from datetime import datetime
-from difflib import SequenceMatcher
 
-from dateparser import parse
+from src.anchor_index import AnchorIndex
+from src.model_registry import parse_date as parse
+from src.page_lines import MatchIndex, PageLines
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 # =================================================
 # CONFIG
@@ -44,86 +46,88 @@ def normalize_text(text):
     )
 
 
-def fuzzy_contains(line, target, threshold=0.72):
-    words = re.findall(r"[A-Za-z]{3,}", line.lower())
-    for word in words:
-        if SequenceMatcher(None, word, target).ratio() >= threshold:
-            return True
-    return False
+# -------------------------------------------
+# STRONG DATE PATTERNS
+# -------------------------------------------
+FLEXIBLE_DATE = r"([A-Za-z]{3,9}\.?\s+\d{1,2}[,\.]?\s+\d{4})"
+DATE_PATTERN = re.compile(FLEXIBLE_DATE, re.I)
+
+PATENT_PATTERNS = [
+    re.compile(pat, re.I)
+    for pat in [
+        rf"patent\w*\s+{FLEXIBLE_DATE}",
+        rf"patent\w*.*?{FLEXIBLE_DATE}",
+        rf"letters patent.*?dated\s+{FLEXIBLE_DATE}",
+        rf"dated\s+{FLEXIBLE_DATE}",
+        rf"\(45\).*?{FLEXIBLE_DATE}",
+        rf"\[45\].*?{FLEXIBLE_DATE}",
+    ]
+]
+
+FILED_PATTERNS = [
+    re.compile(pat, re.I)
+    for pat in [
+        rf"application.*?file\w*\s+{FLEXIBLE_DATE}",
+        rf"file\w*\s+{FLEXIBLE_DATE}",
+        rf"\(22\).*?{FLEXIBLE_DATE}",
+        rf"\[22\].*?{FLEXIBLE_DATE}",
+        rf"application\s+{FLEXIBLE_DATE}",
+    ]
+]
+
+
+def format_date(raw, parsed):
+    """parse() raw as MM/DD/YYYY, or "" if it is no date; memoized in parsed."""
+    if raw not in parsed:
+        dt = parse(raw)
+        parsed[raw] = dt.strftime("%m/%d/%Y") if dt else ""
+    return parsed[raw]
+
+
+def first_pattern_date(patterns, text, start, end, parsed):
+    """Date of the first pattern matching text[start:end] with a valid date."""
+    for pat in patterns:
+        m = pat.search(text, start, end)
+        if m:
+            formatted = format_date(m.group(1), parsed)
+            if formatted:
+                return formatted
+    return ""
 
 
 def extract_patent_dates(text):
     text = normalize_text(text)
     lines = text.splitlines()
+    anchors = AnchorIndex(lines)
 
     # -------------------------------------------
     # SMART MULTILINE MERGE (3-line window)
     # -------------------------------------------
-    combined_lines = []
-
-    for i in range(len(lines)):
-        line = lines[i].strip()
-        if not line:
-            continue
-
-        combined_lines.append(line)
-
-        # Merge with next line
-        if i + 1 < len(lines):
-            combined_lines.append(line + " " + lines[i + 1].strip())
-
-        # Merge with next 2 lines
-        if i + 2 < len(lines):
-            combined_lines.append(
-                line + " " + lines[i + 1].strip() + " " + lines[i + 2].strip()
-            )
+    # Windows are slices of the joined page; every pattern ends in a date,
+    # so windows without one are skipped before any pattern runs
+    page = PageLines(lines)
+    dates = MatchIndex(DATE_PATTERN, page.text)
+    parsed = {}
 
     patent_date = ""
     filed_date = ""
 
-    # -------------------------------------------
-    # STRONG DATE PATTERNS
-    # -------------------------------------------
-    flexible_date = r"([A-Za-z]{3,9}\.?\s+\d{1,2}[,\.]?\s+\d{4})"
-
-    patent_patterns = [
-        rf"patent\w*\s+{flexible_date}",
-        rf"patent\w*.*?{flexible_date}",
-        rf"letters patent.*?dated\s+{flexible_date}",
-        rf"dated\s+{flexible_date}",
-        rf"\(45\).*?{flexible_date}",
-        rf"\[45\].*?{flexible_date}",
-    ]
-
-    filed_patterns = [
-        rf"application.*?file\w*\s+{flexible_date}",
-        rf"file\w*\s+{flexible_date}",
-        rf"\(22\).*?{flexible_date}",
-        rf"\[22\].*?{flexible_date}",
-        rf"application\s+{flexible_date}",
-    ]
-
     # -------------------------------------------
     # PRIMARY EXTRACTION
     # -------------------------------------------
-    for line in combined_lines:
+    for _, _, start, end in page.windows():
+        if dates.first_within(start, end) is None:
+            continue
+
         if not patent_date:
-            for pat in patent_patterns:
-                m = re.search(pat, line, re.I)
-                if m:
-                    dt = parse(m.group(1))
-                    if dt:
-                        patent_date = dt.strftime("%m/%d/%Y")
-                        break
+            patent_date = first_pattern_date(
+                PATENT_PATTERNS, page.text, start, end, parsed
+            )
 
         if not filed_date:
-            for pat in filed_patterns:
-                m = re.search(pat, line, re.I)
-                if m:
-                    dt = parse(m.group(1))
-                    if dt:
-                        filed_date = dt.strftime("%m/%d/%Y")
-                        break
+            filed_date = first_pattern_date(
+                FILED_PATTERNS, page.text, start, end, parsed
+            )
 
         if patent_date and filed_date:
             break
@@ -132,36 +136,29 @@ def extract_patent_dates(text):
     # FUZZY RESCUE (Only if still missing)
     # -------------------------------------------
     if not patent_date or not filed_date:
-        for line in combined_lines:
-            m = re.search(flexible_date, line, re.I)
+        for first, last, start, end in page.windows():
+            m = dates.first_within(start, end)
             if not m:
                 continue
 
-            dt = parse(m.group(1))
-            if not dt:
+            formatted = format_date(m.group(1), parsed)
+            if not formatted:
                 continue
 
-            formatted = dt.strftime("%m/%d/%Y")
-            lower_line = line.lower()
-
-            # Filed detection
+            # Filed detection ([22] / (22) markers)
             if not filed_date:
                 if (
-                    fuzzy_contains(lower_line, "filed")
-                    or fuzzy_contains(lower_line, "application")
-                    or "[22]" in line
-                    or "(22)" in line
+                    anchors.has_any_keyword(("filed", "application"), first, last)
+                    or anchors.has_marker("22", first, last)
                 ):
                     filed_date = formatted
                     continue
 
-            # Patent detection
+            # Patent detection ([45] / (45) markers)
             if not patent_date:
                 if (
-                    fuzzy_contains(lower_line, "patented")
-                    or fuzzy_contains(lower_line, "issued")
-                    or "[45]" in line
-                    or "(45)" in line
+                    anchors.has_any_keyword(("patented", "issued"), first, last)
+                    or anchors.has_marker("45", first, last)
                 ):
                     patent_date = formatted
                     continue
@@ -259,10 +256,12 @@ def compare_dates_with_flags(extracted_row, reference_row):
 # =================================================
 
 
-def run():
+def run(shard=None):
     extracted_rows = []
 
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
 
         if not os.path.isdir(folder_path):
@@ -317,12 +316,13 @@ def run():
             }
         )
 
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_CSV, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=final_rows[0].keys())
         writer.writeheader()
         writer.writerows(final_rows)
 
-    print(f"\n✅ Done! Comparison CSV saved to:\n{OUTPUT_CSV}")
+    print(f"\n✅ Done! Comparison CSV saved to:\n{output_file}")
 
 
 # =================================================
@@ -330,4 +330,4 @@ def run():
 # =================================================
 
 if __name__ == "__main__":
-    run()
+    run(parse_shard_arg())
@@ -3,9 +3,11 @@ import csv
 import re
 import unicodedata
 from datetime import datetime
-from difflib import SequenceMatcher
 
-from dateparser import parse
+from src.anchor_index import AnchorIndex
+from src.model_registry import parse_date as parse
+from src.page_lines import MatchIndex, PageLines
+from src.sharding import in_shard, parse_shard_arg, shard_output_path
 
 # =================================================
 # CONFIG
@@ -47,17 +49,12 @@ def split_date(date_str):
         return "", "", ""
 
 
-def fuzzy_contains(line, target, threshold=0.72):
-    words = re.findall(r"[A-Za-z]{3,}", line.lower())
-    for word in words:
-        if SequenceMatcher(None, word, target).ratio() >= threshold:
-            return True
-    return False
-
-
 # =================================================
 # DATE EXTRACTION
 # =================================================
+DATE_PATTERN = re.compile(r"([A-Za-z]{3,9})\s*(\d{1,2})\s*[,\.]?\s*(\d{4})")
+
+
 def extract_date_from_line(line):
     """
     Flexible regex to capture dates like:
@@ -65,8 +62,7 @@ def extract_date_from_line(line):
     Nov 6. 1894
     October 26, 1893
     """
-    pattern = r"([A-Za-z]{3,9})\s*(\d{1,2})\s*[,\.]?\s*(\d{4})"
-    m = re.search(pattern, line)
+    m = DATE_PATTERN.search(line)
     if m:
         month, day, year = m.groups()
         dt = parse(f"{month} {day} {year}")
@@ -75,22 +71,30 @@ def extract_date_from_line(line):
     return ""
 
 
+def window_date(dates, start, end, parsed):
+    """extract_date_from_line for a window, from the page's date matches.
+
+    Each distinct date string is parsed once per page (memoized in parsed).
+    """
+    m = dates.first_within(start, end)
+    if not m:
+        return ""
+    raw = " ".join(m.groups())
+    if raw not in parsed:
+        dt = parse(raw)
+        parsed[raw] = dt.strftime("%m/%d/%Y") if dt else ""
+    return parsed[raw]
+
+
 def extract_patent_dates(text, patnum=None):
     text = normalize_text(text)
     lines = text.splitlines()
+    anchors = AnchorIndex(lines)
 
-    combined_lines = []
-    for i in range(len(lines)):
-        line = lines[i].strip()
-        if not line:
-            continue
-        combined_lines.append(line)
-        if i + 1 < len(lines):
-            combined_lines.append(line + " " + lines[i + 1].strip())
-        if i + 2 < len(lines):
-            combined_lines.append(
-                line + " " + lines[i + 1].strip() + " " + lines[i + 2].strip()
-            )
+    # 1-3 line windows are slices of the joined page; dates are found once
+    page = PageLines(lines)
+    dates = MatchIndex(DATE_PATTERN, page.text)
+    parsed = {}
 
     patent_date = ""
     filed_date = ""
@@ -104,29 +108,25 @@ def extract_patent_dates(text, patnum=None):
         filed_date = "NA"
 
     # -------- Extract strong pattern dates --------
-    for line in combined_lines:
-        # Patent date detection
+    for first, last, start, end in page.windows():
+        # Patent date detection ([45] / (45) markers)
         if not patent_date and (
-            fuzzy_contains(line, "patent")
-            or fuzzy_contains(line, "issued")
-            or "[45]" in line
-            or "(45)" in line
+            anchors.has_any_keyword(("patent", "issued"), first, last)
+            or anchors.has_marker("45", first, last)
         ):
-            dt = extract_date_from_line(line)
+            dt = window_date(dates, start, end, parsed)
             if dt:
                 patent_date = dt
-        # Filing date detection
+        # Filing date detection ([22] / (22) markers)
         if (
             patnum_int >= EARLY_PATENT_NUM
             and not filed_date
             and (
-                fuzzy_contains(line, "filed")
-                or fuzzy_contains(line, "application")
-                or "[22]" in line
-                or "(22)" in line
+                anchors.has_any_keyword(("filed", "application"), first, last)
+                or anchors.has_marker("22", first, last)
             )
         ):
-            dt = extract_date_from_line(line)
+            dt = window_date(dates, start, end, parsed)
             if dt:
                 filed_date = dt
         if patent_date and (filed_date or patnum_int < EARLY_PATENT_NUM):
@@ -134,22 +134,22 @@ def extract_patent_dates(text, patnum=None):
 
     # -------- Fuzzy rescue for missing dates --------
     if not patent_date or (patnum_int >= EARLY_PATENT_NUM and not filed_date):
-        for line in combined_lines:
-            m = re.search(r"([A-Za-z]{3,9})\s*(\d{1,2})\s*[,\.]?\s*(\d{4})", line)
-            if not m:
-                continue
-            dt = parse(" ".join(m.groups()))
-            if not dt:
+        for first, last, start, end in page.windows():
+            formatted = window_date(dates, start, end, parsed)
+            if not formatted:
                 continue
-            formatted = dt.strftime("%m/%d/%Y")
             if not patent_date and (
-                fuzzy_contains(line.lower(), "patent") or "[45]" in line
+                anchors.has_keyword("patent", first, last)
+                or anchors.has_marker("45", first, last, brackets="[")
             ):
                 patent_date = formatted
             if (
                 patnum_int >= EARLY_PATENT_NUM
                 and not filed_date
-                and (fuzzy_contains(line.lower(), "filed") or "[22]" in line)
+                and (
+                    anchors.has_keyword("filed", first, last)
+                    or anchors.has_marker("22", first, last, brackets="[")
+                )
             ):
                 filed_date = formatted
             if patent_date and (filed_date or patnum_int < EARLY_PATENT_NUM):
@@ -246,10 +246,12 @@ def compare_dates_with_flags(extracted_row, reference_row):
 # =================================================
 # MAIN
 # =================================================
-def run():
+def run(shard=None):
     extracted_rows = []
 
     for folder in sorted(os.listdir(OCR_ROOT)):
+        if not in_shard(folder, shard):
+            continue
         folder_path = os.path.join(OCR_ROOT, folder)
         if not os.path.isdir(folder_path):
             continue
@@ -293,16 +295,17 @@ def run():
         pw, fw, flag = compare_dates_with_flags(row, ref_row)
         final_rows.append({**row, "patent_wrong": pw, "filed_wrong": fw, "flag": flag})
 
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+    output_file = shard_output_path(OUTPUT_CSV, shard)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=final_rows[0].keys())
         writer.writeheader()
         writer.writerows(final_rows)
 
-    print(f"\n✅ Done! Comparison CSV saved to:\n{OUTPUT_CSV}")
+    print(f"\n✅ Done! Comparison CSV saved to:\n{output_file}")
 
 
 # =================================================
 # ENTRY POINT
 # =================================================
 if __name__ == "__main__":
-    run()
+    run(parse_shard_arg())
@@ -0,0 +1,290 @@
+import os
+import csv
+import json
+import time
+import socket
+import argparse
+import threading
+from contextlib import contextmanager
+
+from src.ocr_shards import SHARD_COUNT, shard_for
+
+# ==================================================
+# SHARD ASSIGNMENT
+# ==================================================
+# `--shard i/N` (0 <= i < N <= SHARD_COUNT) gives node i the folders whose
+# output shard (ocr_shards.shard_for) is congruent to i modulo N. The hash
+# is stable across machines and runs, and every packed output shard file
+# has exactly one writing node.
+
+
+def parse_shard(spec):
+    """Parse "i/N" into (i, N); None or "" means no sharding."""
+    if not spec:
+        return None
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}") from None
+    if not 0 < count <= SHARD_COUNT or not 0 <= index < count:
+        raise ValueError(
+            f"shard {spec!r} needs 0 <= i < N <= {SHARD_COUNT} (i is 0-based)"
+        )
+    return index, count
+
+
+def shard_of(folder, count):
+    """Return the node shard (0..count-1) a folder belongs to."""
+    return shard_for(folder) % count
+
+
+def in_shard(folder, shard):
+    """True if folder belongs to shard (i, N), or if shard is None."""
+    return shard is None or shard_of(folder, shard[1]) == shard[0]
+
+
+def shard_tag(shard):
+    index, count = shard
+    return f"shard{index}of{count}"
+
+
+def shard_output_path(path, shard):
+    """Insert the shard tag before a file's extension (unchanged when unsharded)."""
+    if shard is None:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{shard_tag(shard)}{ext}"
+
+
+def output_shards(index, count):
+    """Return the packed output shards (ocr_shards) written by node index."""
+    return {s for s in range(SHARD_COUNT) if s % count == index}
+
+
+def _shard_type(spec):
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def add_shard_argument(parser):
+    parser.add_argument(
+        "--shard",
+        type=_shard_type,
+        default=None,
+        metavar="i/N",
+        help="process only shard i of N (0-based) of the folders",
+    )
+
+
+def parse_shard_arg(argv=None):
+    """Parse a command line that only takes --shard; returns (i, N) or None."""
+    parser = argparse.ArgumentParser()
+    add_shard_argument(parser)
+    return parser.parse_args(argv).shard
+
+
+# ==================================================
+# LEASES
+# ==================================================
+# One small JSON file per shard on the shared filesystem:
+#
+#   {"owner": "host:pid", "state": "running" | "done", "expires": epoch}
+#
+# The owner rewrites it every ttl/3 seconds. A "running" lease whose expiry
+# has passed belongs to a node that crashed, and any node may take it over.
+# Claims are confirmed by reading the file back after CLAIM_SETTLE seconds,
+# so of two nodes claiming at once on a shared filesystem only the last
+# writer proceeds.
+#
+# Leases are best-effort, not a lock. On a Dropbox-synced folder the atomic
+# create/rename is only local to each machine: Dropbox uploads the files
+# later and settles concurrent writes by keeping one version (or a
+# "conflicted copy"), so two nodes whose claims sync after CLAIM_SETTLE can
+# both run a shard. That costs duplicate OCR calls, and with packed output
+# shards (OUTPUT_MODE = "shards") the two writers can leave conflicted
+# copies of a shard file. Where that matters, give every shard its own
+# machine and run with LEASE_TAKEOVER off, or keep LEASE_DIR on a share with
+# real locking semantics (e.g. SMB/NFS rather than a synced folder).
+CLAIM_SETTLE = 5.0
+
+
+class ShardLease:
+    """Best-effort lease on one node shard, renewed by a heartbeat thread."""
+
+    def __init__(self, lease_dir, index, count, ttl):
+        os.makedirs(lease_dir, exist_ok=True)
+        self.index = index
+        self.count = count
+        self.ttl = ttl
+        self.path = os.path.join(lease_dir, f"shard_{index}_of_{count}.lease")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def read(self):
+        """Return the lease record, or None if there is none (or it is torn)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def orphaned(self, record=None):
+        """True if the lease was left running by a node that stopped renewing it."""
+        record = record if record is not None else self.read()
+        return (
+            record is not None
+            and record["state"] == "running"
+            and record["expires"] < time.time()
+        )
+
+    def acquire(self, takeover=False):
+        """Claim the lease; returns False if another live node holds it.
+
+        With takeover only an orphaned lease is claimed, never a shard whose
+        node finished or has not started yet.
+        """
+        record = self.read()
+        if takeover and not self.orphaned(record):
+            return False
+        if (
+            record is not None
+            and record["owner"] != self.owner
+            and record["state"] == "running"
+            and record["expires"] >= time.time()
+        ):
+            return False
+
+        self._write("running")
+        time.sleep(CLAIM_SETTLE)
+        record = self.read()
+        return record is not None and record["owner"] == self.owner
+
+    def holder(self):
+        record = self.read()
+        return record["owner"] if record else None
+
+    def _write(self, state):
+        record = {
+            "owner": self.owner,
+            "state": state,
+            "expires": time.time() + self.ttl,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self.path)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            self._write("running")
+
+    @contextmanager
+    def held(self):
+        """Renew the lease while the block runs; mark it done if it succeeds.
+
+        If the block raises, the lease is left running so that it expires
+        and another node takes the shard over.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            self._thread.join()
+        self._write("done")
+
+
+def orphaned_shards(lease_dir, count, ttl, exclude=()):
+    """Return the shard indexes whose leases were abandoned by crashed nodes."""
+    return [
+        index
+        for index in range(count)
+        if index not in exclude and ShardLease(lease_dir, index, count, ttl).orphaned()
+    ]
+
+
+# ==================================================
+# MERGING PER-SHARD OUTPUT
+# ==================================================
+# Columns summed across shards when the inputs are run histories
+HISTORY_TOTALS = [
+    "folders_processed",
+    "pages_extracted",
+    "pages_failed",
+    "pages_skipped",
+    "pages_from_archive",
+    "bytes_sent",
+    "bytes_received",
+]
+
+
+def merge_csv(inputs, output):
+    """Combine per-shard CSVs into one, adding a "shard_file" column.
+
+    Columns are the union of every input's header, in first-seen order.
+    Rows are sorted by "folder" when the inputs have one and otherwise keep
+    input order. Returns the merged rows.
+    """
+    fieldnames = []
+    rows = []
+    for path in inputs:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for name in reader.fieldnames or []:
+                if name not in fieldnames:
+                    fieldnames.append(name)
+            for row in reader:
+                row["shard_file"] = os.path.basename(path)
+                rows.append(row)
+
+    if "folder" in fieldnames:
+        rows.sort(key=lambda row: row["folder"])
+
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames + ["shard_file"], restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def history_report(rows):
+    """Return summary lines totalling merged run-history rows across shards."""
+    lines = ["\nMERGED SHARD REPORT", "=" * 50]
+    lines.append(f"{'Shard Files:':25} {len({r['shard_file'] for r in rows}):>10}")
+    lines.append(f"{'Runs:':25} {len(rows):>10}")
+    totals = {
+        name: sum(int(row.get(name) or 0) for row in rows) for name in HISTORY_TOTALS
+    }
+    for name, total in totals.items():
+        label = name.replace("_", " ").title() + ":"
+        lines.append(f"{label:25} {total:>10}")
+    # total_cost_usd is cumulative per node, so bill only the merged runs' pages
+    billed = totals["pages_extracted"] - totals["pages_from_archive"]
+    lines.append(f"{'Pages Billed:':25} {billed:>10}")
+    if rows:
+        # Nodes run side by side, so the wall time is the slowest shard's
+        slowest = max(float(row.get("total_time_sec") or 0) for row in rows)
+        lines.append(f"{'Slowest Run (sec):':25} {slowest:>10.2f}")
+    lines.append("=" * 50)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge per-shard CSV output")
+    parser.add_argument("output", help="merged CSV to write")
+    parser.add_argument("inputs", nargs="+", help="per-shard CSV files")
+    args = parser.parse_args(argv)
+
+    rows = merge_csv(args.inputs, args.output)
+    print(f"Merged {len(rows)} rows from {len(args.inputs)} files into {args.output}")
+    if rows and "pages_extracted" in rows[0]:
+        print("\n".join(history_report(rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import time
+import random
+import asyncio
+import threading
+
+from google.api_core import exceptions as api_exceptions
+
+# ==================================================
+# ERROR CLASSIFICATION
+# ==================================================
+# Call-level errors raised by the client library, and per-image error codes
+# (google.rpc.Code) found in AnnotateImageResponse.error, that are worth
+# another attempt. Everything else (bad image, bad request, auth) is
+# permanent and fails the page straight away.
+RETRYABLE_EXCEPTIONS = (
+    api_exceptions.TooManyRequests,  # includes ResourceExhausted
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
+THROTTLE_EXCEPTIONS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ServiceUnavailable,
+)
+
+DEADLINE_EXCEEDED = 4
+ABORTED = 10
+RESOURCE_EXHAUSTED = 8
+INTERNAL = 13
+UNAVAILABLE = 14
+RETRYABLE_CODES = {
+    DEADLINE_EXCEEDED,
+    ABORTED,
+    RESOURCE_EXHAUSTED,
+    INTERNAL,
+    UNAVAILABLE,
+}
+THROTTLE_CODES = {RESOURCE_EXHAUSTED, UNAVAILABLE}
+
+
+class VisionPageError(Exception):
+    """Error reported for one image inside an otherwise successful response."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class RetriesExhausted(Exception):
+    """Raised when a retryable error persists through every allowed attempt."""
+
+    def __init__(self, error, attempts):
+        super().__init__(f"{error} (gave up after {attempts} attempts)")
+        self.error = error
+        self.attempts = attempts
+
+
+def is_retryable(error):
+    if isinstance(error, VisionPageError):
+        return error.code in RETRYABLE_CODES
+    return isinstance(error, RETRYABLE_EXCEPTIONS)
+
+
+def is_throttle(error):
+    """True for errors that mean the API wants fewer requests in flight."""
+    if isinstance(error, VisionPageError):
+        return error.code in THROTTLE_CODES
+    return isinstance(error, THROTTLE_EXCEPTIONS)
+
+
+# ==================================================
+# AIMD CONCURRENCY LIMIT
+# ==================================================
+class AdaptiveLimit:
+    """Additive-increase / multiplicative-decrease limit on requests in flight.
+
+    Each successful request raises the limit by 1/limit (about +1 per round
+    trip at full concurrency); a throttled request multiplies it by
+    DECREASE_FACTOR. Cuts are at most one per COOLDOWN seconds, so a burst
+    of throttled requests that were all sent at the old limit counts once.
+    """
+
+    DECREASE_FACTOR = 0.5
+    COOLDOWN = 1.0
+
+    def __init__(self, ceiling, floor=1):
+        self.ceiling = max(1, ceiling)
+        self.floor = max(1, min(floor, self.ceiling))
+        self.value = float(self.ceiling)
+        self._last_cut = 0.0
+
+    def allowed(self):
+        return int(self.value)
+
+    def on_success(self):
+        self.value = min(self.ceiling, self.value + 1 / self.value)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self._last_cut >= self.COOLDOWN:
+            self.value = max(self.floor, self.value * self.DECREASE_FACTOR)
+            self._last_cut = now
+
+
+# ==================================================
+# RETRY CONTROLLERS
+# ==================================================
+class RetryController:
+    """Runs API calls under an adaptive in-flight limit, retrying with backoff.
+
+    Backoff is "full jitter": attempt n sleeps a random time between 0 and
+    min(max_delay, base_delay * 2**(n-1)), which spreads retries from many
+    workers instead of having them hit the quota again in lockstep.
+    """
+
+    def __init__(
+        self, ceiling, max_attempts=6, base_delay=1.0, max_delay=60.0, floor=1
+    ):
+        self.limit = AdaptiveLimit(ceiling, floor)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+
+    def backoff(self, attempt):
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def call(self, fn):
+        """Return fn(), retrying retryable errors; raises RetriesExhausted."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self._acquire()
+            outcome, retry = "error", False
+            try:
+                result = fn()
+                outcome = "ok"
+                return result
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                outcome = "throttled" if is_throttle(e) else "retryable"
+                if attempt >= self.max_attempts:
+                    raise RetriesExhausted(e, attempt) from e
+                retry = True
+            finally:
+                self._release(outcome, retry)
+            time.sleep(self.backoff(attempt))
+
+    def _acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit.allowed():
+                self._cond.wait()
+            self.in_flight += 1
+
+    def _release(self, outcome, retry):
+        with self._cond:
+            self._settle(outcome, retry)
+            self._cond.notify_all()
+
+    def _settle(self, outcome, retry):
+        """Update the limit and counters for one finished attempt (lock held)."""
+        self.in_flight -= 1
+        if outcome == "ok":
+            self.limit.on_success()
+        elif outcome == "throttled":
+            self.limit.on_throttle()
+            self.throttled += 1
+        if retry:
+            self.retries += 1
+
+
+class AsyncRetryController(RetryController):
+    """RetryController for coroutines running on a single event loop."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cond = asyncio.Condition()
+
+    async def call(self, fn):
+        """Return await fn(), retrying retryable errors; raises RetriesExhausted."""
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire()
+            outcome, retry = "error", False
+            try:
+                result = await fn()
+                outcome = "ok"
+                return result
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                outcome = "throttled" if is_throttle(e) else "retryable"
+                if attempt >= self.max_attempts:
+                    raise RetriesExhausted(e, attempt) from e
+                retry = True
+            finally:
+                await self._release(outcome, retry)
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def _acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit.allowed())
+            self.in_flight += 1
+
+    async def _release(self, outcome, retry):
+        async with self._cond:
+            self._settle(outcome, retry)
+            self._cond.notify_all()
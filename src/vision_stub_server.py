@@ -0,0 +1,294 @@
+import os
+import time
+import random
+import argparse
+import threading
+from concurrent import futures
+
+import grpc
+from google.cloud import vision
+
+from src.ocr_archive import ResponseArchive, content_key
+
+# ==================================================
+# LOCAL VISION API STAND-IN
+# ==================================================
+# Serves google.cloud.vision.v1.ImageAnnotator/BatchAnnotateImages over
+# plain gRPC so the OCR engine can be load-tested without the real API:
+#
+#   python -m src.vision_stub_server --port 50051 --latency-ms 400
+#   (then set VISION_ENDPOINT = "localhost:50051" in google_cloud_vision.py)
+#
+# Each image is answered from the response archive when its bytes were
+# OCR'd before (a recorded response), otherwise with a synthetic response
+# built from one of the sample pages in --text-dir, chosen by image hash
+# so the same image always gets the same text.
+SERVICE = "google.cloud.vision.v1.ImageAnnotator"
+DEFAULT_TEXT_DIR = os.path.join("data", "interim")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+INTERNAL = 13  # google.rpc.Code for per-image errors
+
+LINE_HEIGHT = 40  # synthetic layout geometry, in pixels
+CHAR_WIDTH = 18
+PAGE_MARGIN = 100
+
+
+# ==================================================
+# SYNTHETIC RESPONSES
+# ==================================================
+def load_sample_texts(text_dir):
+    """Return the contents of every *_text.txt file in text_dir."""
+    texts = []
+    if os.path.isdir(text_dir):
+        for name in sorted(os.listdir(text_dir)):
+            if name.endswith("_text.txt"):
+                with open(os.path.join(text_dir, name), encoding="utf-8") as f:
+                    texts.append(f.read())
+    return texts or ["SAMPLE PATENT\nSpecification forming part of Letters Patent."]
+
+
+def _poly(x0, y0, x1, y1):
+    return {
+        "vertices": [
+            {"x": x0, "y": y0},
+            {"x": x1, "y": y0},
+            {"x": x1, "y": y1},
+            {"x": x0, "y": y1},
+        ]
+    }
+
+
+def synthetic_response(text):
+    """Build an AnnotateImageResponse for text laid out one line per block."""
+    blocks = []
+    lines = text.split("\n")
+    for row, line in enumerate(lines):
+        words = line.split()
+        if not words:
+            continue
+        y0 = PAGE_MARGIN + row * LINE_HEIGHT
+        y1 = y0 + LINE_HEIGHT - 10
+        x = PAGE_MARGIN
+        word_records = []
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            symbols = [{"text": ch} for ch in word]
+            # EOL_SURE_SPACE (3) after the last word, SPACE (1) otherwise
+            symbols[-1]["property"] = {"detected_break": {"type_": 3 if last else 1}}
+            width = len(word) * CHAR_WIDTH
+            word_records.append(
+                {"bounding_box": _poly(x, y0, x + width, y1), "symbols": symbols}
+            )
+            x += width + CHAR_WIDTH
+        blocks.append(
+            {
+                "bounding_box": _poly(PAGE_MARGIN, y0, x, y1),
+                "paragraphs": [{"words": word_records}],
+            }
+        )
+
+    width = PAGE_MARGIN * 2 + CHAR_WIDTH * max((len(line) for line in lines), default=0)
+    height = PAGE_MARGIN * 2 + LINE_HEIGHT * len(lines)
+    return vision.AnnotateImageResponse(
+        text_annotations=[{"description": text}],
+        full_text_annotation={
+            "text": text,
+            "pages": [{"width": width, "height": height, "blocks": blocks}],
+        },
+    )
+
+
+# ==================================================
+# SERVICE IMPLEMENTATION
+# ==================================================
+class TokenBucket:
+    """Images-per-second quota; take() is False once the bucket runs dry.
+
+    A request for more images than the bucket holds needs a full bucket
+    and empties it, instead of being refused forever.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, n):
+        n = min(n, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+
+class StubImageAnnotator:
+    """BatchAnnotateImages with configurable latency, errors and quota."""
+
+    def __init__(self, args):
+        self.args = args
+        self.archive = ResponseArchive(args.archive) if args.archive else None
+        self.texts = load_sample_texts(args.text_dir)
+        self.quota = (
+            TokenBucket(args.quota_per_sec, args.quota_burst or args.quota_per_sec)
+            if args.quota_per_sec
+            else None
+        )
+        self.stats = {"requests": 0, "images": 0, "throttled": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def latency(self, n_images):
+        """Sample one request's latency in seconds (log-normal around the median)."""
+        median = self.args.latency_ms / 1000
+        extra = self.args.per_image_ms / 1000 * (n_images - 1)
+        return median * random.lognormvariate(0, self.args.latency_sigma) + extra
+
+    def respond(self, image_content):
+        """Return the recorded or synthetic response for one image."""
+        if random.random() < self.args.image_error_rate:
+            return vision.AnnotateImageResponse(
+                error={"code": INTERNAL, "message": "stub: injected image error"}
+            )
+
+        key = content_key(image_content)
+        if self.archive is not None:
+            payload = self.archive.get(key)
+            if payload is not None:
+                return vision.AnnotateImageResponse.deserialize(payload)
+
+        text = self.texts[int.from_bytes(key[:4], "big") % len(self.texts)]
+        return synthetic_response(text)
+
+    def batch_annotate_images(self, request, context):
+        n_images = len(request.requests)
+        self._count("requests")
+        self._count("images", n_images)
+
+        if self.quota is not None and not self.quota.take(n_images):
+            self._count("throttled")
+            context.abort(
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                "stub: quota exceeded for images per second",
+            )
+
+        time.sleep(self.latency(n_images))
+
+        if random.random() < self.args.error_rate:
+            self._count("errors")
+            context.abort(grpc.StatusCode.UNAVAILABLE, "stub: injected unavailability")
+
+        return vision.BatchAnnotateImagesResponse(
+            responses=[self.respond(r.image.content) for r in request.requests]
+        )
+
+
+def make_server(service, port, max_workers):
+    """Create (not start) a gRPC server hosting the stub service on port."""
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        options=[
+            ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+            ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+        ],
+    )
+    handler = grpc.method_handlers_generic_handler(
+        SERVICE,
+        {
+            "BatchAnnotateImages": grpc.unary_unary_rpc_method_handler(
+                service.batch_annotate_images,
+                request_deserializer=vision.BatchAnnotateImagesRequest.deserialize,
+                response_serializer=vision.BatchAnnotateImagesResponse.serialize,
+            )
+        },
+    )
+    server.add_generic_rpc_handlers((handler,))
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+# ==================================================
+# COMMAND LINE
+# ==================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local Vision API stand-in")
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--max-workers", type=int, default=64)
+    parser.add_argument(
+        "--archive", help="ResponseArchive directory to replay recorded responses"
+    )
+    parser.add_argument(
+        "--text-dir",
+        default=DEFAULT_TEXT_DIR,
+        help="sample *_text.txt pages for synthetic responses",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=300, help="median request latency"
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.5,
+        help="log-normal spread of the latency (0 = constant)",
+    )
+    parser.add_argument(
+        "--per-image-ms",
+        type=float,
+        default=50,
+        help="extra latency per additional image in a batch",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests failed with UNAVAILABLE",
+    )
+    parser.add_argument(
+        "--image-error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of images answered with a per-image INTERNAL error",
+    )
+    parser.add_argument(
+        "--quota-per-sec",
+        type=float,
+        default=0.0,
+        help="images per second before RESOURCE_EXHAUSTED (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--quota-burst", type=float, default=0.0, help="quota bucket size in images"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = StubImageAnnotator(args)
+    server = make_server(service, args.port, args.max_workers)
+    server.start()
+    print(f"Vision stand-in listening on port {args.port} (Ctrl+C to stop)")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop(grace=1).wait()
+        print(
+            "Served {requests} requests / {images} images, "
+            "{throttled} throttled, {errors} failed".format(**service.stats)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import csv
+
+from src.page_layout import PageLayout
+from src.services import corpus_runner
+from src.services.corpus_runner import (
+    EXTRACTORS,
+    Page,
+    PageRef,
+    extract_dates,
+    run_corpus,
+)
+
+
+def _refs(folders):
+    return [
+        PageRef(
+            folder,
+            "00000001_text.txt",
+            ["00000001_text.txt", 10, 1],
+            lambda folder=folder: Page(
+                folder, "00000001_text.txt", f"{folder} title\nbody", None
+            ),
+        )
+        for folder in folders
+    ]
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_incremental_narrow_then_widen_extractors(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_runner, "EXTRACTORS", dict(EXTRACTORS))
+    corpus_runner.extractor("first", ["first"])(
+        lambda page: {"first": page.text.split("\n")[0]}
+    )
+    corpus_runner.extractor("size", ["size"])(lambda page: {"size": len(page.text)})
+    output = str(tmp_path / "corpus.csv")
+
+    counts = run_corpus(_refs(["A", "B"]), ["first", "size"], output, True)
+    assert counts == {"extracted": 2, "reused": 0}
+    counts = run_corpus(_refs(["A", "B"]), ["first"], output, True)
+    assert counts == {"extracted": 0, "reused": 2}
+    assert [row["first"] for row in _rows(output)] == ["A title", "B title"]
+
+    # The narrowed output lost the size column, so widening must refill it
+    counts = run_corpus(_refs(["A", "B"]), ["first", "size"], output, True)
+    assert counts == {"extracted": 2, "reused": 0}
+    rows = _rows(output)
+    assert [row["first"] for row in rows] == ["A title", "B title"]
+    assert [row["size"] for row in rows] == ["12", "12"]
+
+
+def test_first_date_scans_page_when_layout_header_is_not_a_prefix(monkeypatch):
+    monkeypatch.setattr(
+        corpus_runner.ocr_extraction, "dates_from_doc", lambda doc: ("", "")
+    )
+    monkeypatch.setattr(Page, "header_doc", None)
+    # The header sits at the top of the image but is read after the margin note
+    layout = PageLayout(
+        2550,
+        3300,
+        [(100, 100, 2400, 3000)],
+        [
+            (0, (100, 2900, 2400, 3000), "Filed May 1, 1900"),
+            (0, (100, 100, 2400, 150), "Patented July 4, 1910"),
+        ],
+    )
+    text = "Filed May 1, 1900\nPatented July 4, 1910"
+    page = Page("A", "00000001_text.txt", text, layout)
+    assert page.header == "Patented July 4, 1910"
+    assert extract_dates(page)["first_date"] == "05/01/1900"
+
+    page = Page("A", "00000001_text.txt", text, None)
+    assert extract_dates(page)["first_date"] == "05/01/1900"
@@ -0,0 +1,64 @@
+import re
+from itertools import product
+from types import SimpleNamespace
+
+from src.modeling.extract_patent_entities import extract_entities, iter_chunks
+
+# Distinct names, so a name lost or cut at a chunk boundary shows up
+NAMES = [f"{a}{b}{c}son".capitalize() for a, b, c in product("abcdef", repeat=3)]
+NAME_PATTERN = re.compile(r"[A-Z][a-z]*son")
+
+
+def fake_nlp(text):
+    """Tag every whole token like "Abcson" as an INVENTOR.
+
+    "McPherson" is not tagged, but a chunk starting inside it would see
+    the fragment "Pherson" and tag that.
+    """
+    ents = [
+        SimpleNamespace(
+            start_char=m.start(), end_char=m.end(), label_="INVENTOR", text=m.group()
+        )
+        for m in re.finditer(r"\S+", text)
+        if NAME_PATTERN.fullmatch(m.group())
+    ]
+    return SimpleNamespace(ents=ents)
+
+
+def _pages(count=6):
+    per_page = len(NAMES) // count
+    return [
+        " ".join(name + " McPherson of Springfield" for name in NAMES[i : i + per_page])
+        for i in range(0, per_page * count, per_page)
+    ]
+
+
+def test_chunks_start_and_end_on_whole_tokens():
+    joined = "\n".join(_pages()) + "\n"
+    chunks = list(iter_chunks(_pages(), size=200, overlap=37))
+    assert len(chunks) > 10
+    for start, _, text in chunks:
+        assert joined[start : start + len(text)] == text
+        assert start == 0 or joined[start - 1].isspace()
+    for start, _, text in chunks[:-1]:
+        assert joined[start + len(text)].isspace()
+
+
+def test_owned_ranges_partition_text_inside_overlap():
+    chunks = list(iter_chunks(_pages(), size=200, overlap=37))
+    for (start, owned_end, text), (next_start, _, _) in zip(chunks, chunks[1:]):
+        # Ownership passes to the next chunk inside the overlap
+        assert next_start < owned_end < start + len(text)
+    assert chunks[-1][1] is None
+
+
+def test_no_fragment_entities_across_chunk_boundaries():
+    for overlap in range(20, 60, 3):
+        data = extract_entities(
+            fake_nlp, _pages(), early_exit=False, size=200, overlap=overlap
+        )
+        assert data["inventors"].split(", ") == NAMES
+
+
+def test_empty_pages_return_none():
+    assert extract_entities(fake_nlp, ["", "  "]) is None
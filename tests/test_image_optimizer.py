@@ -0,0 +1,32 @@
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from src.image_optimizer import optimize_image
+
+
+def _grey_page():
+    """A 300 dpi page of black bars on grey (scanned-paper) background."""
+    page = Image.new("L", (600, 400), 190)
+    draw = ImageDraw.Draw(page)
+    for y in range(50, 350, 40):
+        draw.rectangle((50, y, 550, y + 12), fill=10)
+    buffer = BytesIO()
+    page.save(buffer, format="TIFF", dpi=(300, 300))
+    return buffer.getvalue()
+
+
+def test_bilevel_grey_background_comes_out_clean():
+    out = optimize_image(_grey_page(), mode="bilevel")
+    with Image.open(BytesIO(out)) as img:
+        page = img.convert("L")
+    # Background is pure white, bars pure black: no dither speckle
+    background = page.crop((0, 0, 600, 40))
+    assert background.getextrema() == (255, 255)
+    bar = page.crop((60, 52, 540, 60))
+    assert bar.getextrema() == (0, 0)
+
+
+def test_bilevel_is_smaller_than_source():
+    content = _grey_page()
+    assert len(optimize_image(content, mode="bilevel")) < len(content)
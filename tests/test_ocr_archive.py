@@ -0,0 +1,59 @@
+import os
+
+from src.ocr_archive import RECORD_HEADER, ResponseArchive, content_key
+
+
+def test_put_get_and_reopen(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    key = content_key(b"image bytes")
+    assert archive.get(key) is None
+
+    archive.put(key, b"response")
+    assert key in archive
+    assert archive.get(key) == b"response"
+
+    reopened = ResponseArchive(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.get(key) == b"response"
+
+
+def test_put_keeps_first_payload(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    key = content_key(b"image bytes")
+    archive.put(key, b"first")
+    archive.put(key, b"second")
+    assert archive.get(key) == b"first"
+    assert len(ResponseArchive(str(tmp_path))) == 1
+
+
+def test_torn_record_is_truncated_on_load(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    key = content_key(b"page 1")
+    archive.put(key, b"response 1")
+    path = archive._index[key][0]
+    good_size = os.path.getsize(path)
+
+    # A crash mid-append: header written, payload cut short
+    with open(path, "ab") as f:
+        f.write(RECORD_HEADER.pack(bytes(32), 100) + b"partial")
+
+    reopened = ResponseArchive(str(tmp_path))
+    assert reopened.get(key) == b"response 1"
+    assert len(reopened) == 1
+    assert os.path.getsize(path) == good_size
+
+
+def test_read_roots_are_searched_but_never_written(tmp_path):
+    other = ResponseArchive(str(tmp_path / "other"))
+    shared_key = content_key(b"shared page")
+    other.put(shared_key, b"from other node")
+    other_files = sorted(os.listdir(tmp_path / "other"))
+
+    archive = ResponseArchive(str(tmp_path / "mine"), [str(tmp_path / "other")])
+    assert archive.get(shared_key) == b"from other node"
+
+    new_key = content_key(b"new page")
+    archive.put(new_key, b"mine")
+    archive.put(shared_key, b"ignored")  # already archived by the other node
+    assert sorted(os.listdir(tmp_path / "other")) == other_files
+    assert ResponseArchive(str(tmp_path / "other")).get(new_key) is None
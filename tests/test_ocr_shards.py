@@ -0,0 +1,82 @@
+import gzip
+import os
+
+from src.ocr_shards import ShardStore, export_text_files, shard_for
+
+
+def test_put_get_and_reopen(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.put("F1", 2, "page two")
+    store.put("F1", 1, "page one", layout=b"\x00\x01layout")
+    store.put("F2", 1, "other folder")
+
+    reopened = ShardStore(str(tmp_path))
+    assert len(reopened) == 3
+    assert ("F1", 1) in reopened and ("F1", 3) not in reopened
+    assert reopened.folders() == ["F1", "F2"]
+    assert reopened.pages("F1") == [1, 2]
+    assert reopened.get("F1", 1) == "page one"
+    assert reopened.get_layout("F1", 1) == b"\x00\x01layout"
+    assert reopened.get_layout("F1", 2) is None
+    assert reopened.get("F3", 1) is None
+
+
+def test_folder_pages_share_one_shard(tmp_path):
+    store = ShardStore(str(tmp_path))
+    for page in range(1, 6):
+        store.put("F1", page, f"page {page}")
+    assert {store.location("F1", page)[0] for page in range(1, 6)} == {
+        shard_for("F1")
+    }
+
+
+def test_rewritten_page_resolves_to_latest(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.put("F1", 1, "first OCR")
+    store.put("F1", 1, "second OCR")
+    assert store.get("F1", 1) == "second OCR"
+    assert ShardStore(str(tmp_path)).get("F1", 1) == "second OCR"
+
+
+def test_shard_reads_as_plain_gzip(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.put("F1", 1, "one")
+    store.put("F1", 2, "two")
+    with gzip.open(store.shard_path(shard_for("F1")), "rt") as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_torn_tail_is_truncated_only_in_owned_shards(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.put("F1", 1, "page one")
+    shard = shard_for("F1")
+    data_path = store.shard_path(shard)
+    index_path = store._index_path(shard)
+    data_size = os.path.getsize(data_path)
+    index_size = os.path.getsize(index_path)
+
+    # A crash after writing data but before (all of) its index line
+    with open(data_path, "ab") as f:
+        f.write(b"unindexed record")
+    with open(index_path, "ab") as f:
+        f.write(b"F1\t2\t")
+
+    ShardStore(str(tmp_path), owned=set())  # another node's view: untouched
+    assert os.path.getsize(data_path) > data_size
+
+    reopened = ShardStore(str(tmp_path))
+    assert reopened.pages("F1") == [1]
+    assert os.path.getsize(data_path) == data_size
+    assert os.path.getsize(index_path) == index_size
+
+
+def test_export_text_files(tmp_path):
+    store = ShardStore(str(tmp_path / "shards"))
+    store.put("F1", 1, "page one", layout=b"layout")
+    store.put("F1", 2, "page two")
+
+    out = tmp_path / "out"
+    assert export_text_files(str(tmp_path / "shards"), str(out)) == 2
+    assert (out / "F1" / "00000001_text.txt").read_text() == "page one"
+    assert (out / "F1" / "00000001_layout.bin").read_bytes() == b"layout"
+    assert not (out / "F1" / "00000002_layout.bin").exists()
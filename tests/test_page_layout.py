@@ -0,0 +1,101 @@
+from types import SimpleNamespace as NS
+
+import pytest
+
+from src.page_layout import (
+    EOL_SURE_SPACE,
+    HYPHEN,
+    LINE_BREAK,
+    SPACE,
+    PageLayout,
+    decode_layout,
+    encode_layout,
+    layout_from_response,
+    layout_path,
+    load_layout,
+    locate_header,
+)
+
+
+def _layout():
+    return PageLayout(
+        2550,
+        3300,
+        [(100, 100, 2400, 400), (100, 500, 2400, 3000)],
+        [
+            (0, (100, 100, 1200, 150), "UNITED STATES PATENT OFFICE"),
+            (0, (100, 200, 1800, 250), "JOHN SMITH, OF NEW YORK, N. Y."),
+            (1, (100, 1000, 2400, 1050), "Be it known that I, John Smith, café"),
+            (1, (100, 2950, 2400, 3000), ""),
+        ],
+    )
+
+
+def test_encode_decode_round_trip():
+    layout = _layout()
+    decoded = decode_layout(encode_layout(layout))
+    assert (decoded.width, decoded.height) == (2550, 3300)
+    assert decoded.blocks == layout.blocks
+    assert decoded.lines == layout.lines
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_layout(b"not a layout")
+
+
+def test_locate_header_by_position():
+    header, body = locate_header(_layout(), fraction=0.25)
+    assert header == [
+        "UNITED STATES PATENT OFFICE",
+        "JOHN SMITH, OF NEW YORK, N. Y.",
+    ]
+    assert body == ["Be it known that I, John Smith, café", ""]
+    assert locate_header(PageLayout(0, 0, [], [])) == ([], [])
+
+
+def _word(text, box, last_break=0):
+    x0, y0, x1, y1 = box
+    vertices = [NS(x=x0, y=y0), NS(x=x1, y=y0), NS(x=x1, y=y1), NS(x=x0, y=y1)]
+    symbols = [
+        NS(text=ch, property=NS(detected_break=NS(type_=0))) for ch in text[:-1]
+    ]
+    symbols.append(
+        NS(text=text[-1], property=NS(detected_break=NS(type_=last_break)))
+    )
+    return NS(bounding_box=NS(vertices=vertices), symbols=symbols)
+
+
+def test_layout_from_response_cuts_lines_at_breaks():
+    words = [
+        _word("Letters", (10, 10, 80, 30), SPACE),
+        _word("Patent", (90, 10, 150, 30), EOL_SURE_SPACE),
+        _word("improve", (10, 40, 90, 60), HYPHEN),
+        _word("ment", (10, 70, 60, 90), LINE_BREAK),
+        _word("in", (70, 70, 90, 90)),
+    ]
+    block = NS(bounding_box=_word("x", (0, 0, 200, 100)).bounding_box)
+    block.paragraphs = [NS(words=words)]
+    response = NS(
+        full_text_annotation=NS(pages=[NS(width=200, height=100, blocks=[block])])
+    )
+
+    layout = layout_from_response(response)
+    assert layout.blocks == [(0, 0, 200, 100)]
+    assert layout.lines == [
+        (0, (10, 10, 150, 30), "Letters Patent"),
+        (0, (10, 40, 90, 60), "improve-"),
+        (0, (10, 70, 60, 90), "ment"),
+        (0, (70, 70, 90, 90), "in"),
+    ]
+    assert layout_from_response(NS(full_text_annotation=NS(pages=[]))) is None
+
+
+def test_load_layout_next_to_text_page(tmp_path):
+    text_path = str(tmp_path / "00000001_text.txt")
+    assert layout_path(text_path) == str(tmp_path / "00000001_layout.bin")
+    assert load_layout(text_path) is None
+
+    with open(layout_path(text_path), "wb") as f:
+        f.write(encode_layout(_layout()))
+    assert load_layout(text_path).lines == _layout().lines
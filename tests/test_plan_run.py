@@ -0,0 +1,61 @@
+import importlib
+import io
+import os
+
+import pytest
+
+XML = (
+    "<d><abstract-pages><begin>1</begin><end>1</end></abstract-pages>"
+    "<description-pages><begin>2</begin><end>3</end></description-pages></d>"
+)
+
+
+@pytest.fixture
+def gcv(tmp_path, monkeypatch):
+    # Importing the module creates LOG_DIR, so keep that inside tmp_path
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("src.google_cloud_vision")
+    monkeypatch.setattr(module, "SOURCE_ROOT", str(tmp_path / "src"))
+    monkeypatch.setattr(module, "OUTPUT_ROOT", str(tmp_path / "out"))
+    monkeypatch.setattr(module, "LEDGER_ENABLED", True)
+    monkeypatch.setattr(module, "LEDGER_PATH", str(tmp_path / "ledger.db"))
+    monkeypatch.setattr(module, "_ledger", None)
+    yield module
+    if module._ledger is not None:
+        module._ledger.close()
+
+
+def _plan(gcv, folders):
+    counts = {"skipped": 0, "already_done": 0}
+    plan = dict(gcv.plan_run(folders, io.StringIO(), counts))
+    return plan, counts
+
+
+def test_ledger_replans_folder_once_its_xml_appears(gcv, tmp_path):
+    folder = tmp_path / "src" / "F"
+    folder.mkdir(parents=True)
+
+    plan, counts = _plan(gcv, ["F"])
+    assert plan == {"F": None}
+    assert counts["skipped"] == 1
+
+    (folder / "x.xml").write_text(XML)
+    plan, counts = _plan(gcv, ["F"])
+    assert [job["page"] for job in plan["F"]] == [1, 2, 3]
+    assert counts["skipped"] == 0
+    assert os.path.isdir(tmp_path / "out" / "F")
+
+
+def test_takeover_counts_done_pages_once(gcv, tmp_path):
+    for folder in ("A", "B"):
+        (tmp_path / "src" / folder).mkdir(parents=True)
+        (tmp_path / "src" / folder / "x.xml").write_text(XML)
+        (tmp_path / "out" / folder).mkdir(parents=True)
+        (tmp_path / "out" / folder / "00000001_text.txt").write_text("done")
+
+    counts = {"skipped": 0, "already_done": 0}
+    dict(gcv.plan_run(["A"], io.StringIO(), counts))
+    assert counts["already_done"] == 1
+    # A shard taken over later in the same run is planned on its own
+    dict(gcv.plan_run(["B"], io.StringIO(), counts))
+    assert counts["already_done"] == 2
@@ -0,0 +1,75 @@
+import pytest
+
+from src.run_ledger import RunLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = RunLedger(str(tmp_path / "state" / "ledger.db"))
+    yield ledger
+    ledger.close()
+
+
+def test_register_and_pending_pages(ledger):
+    ledger.register_folder("B", "planned", [3, 1, 2], done_pages=[1])
+    ledger.register_folder("A", "planned", [1])
+    ledger.register_folder("C", "no_xml")
+
+    assert ledger.folder_statuses() == {"A": "planned", "B": "planned", "C": "no_xml"}
+    assert ledger.pending_pages() == {"A": [1], "B": [2, 3]}
+    assert ledger.count_status("done") == 1
+    assert ledger.done_counts() == {"B": 1}
+    assert ledger.first_done_pages() == {"B": 1}
+    # Adopted pages were OCR'd before the ledger existed: not billed again
+    assert ledger.total("pages_billed") == 0
+
+
+def test_outcomes_and_totals(ledger):
+    ledger.register_folder("F", "planned", [1, 2, 3, 4, 5, 6])
+    ledger.mark_done("F", 1, latency_ms=10.0, nbytes=100)
+    ledger.mark_done("F", 2, billed=False)  # served from the archive
+    ledger.mark_failed("F", 3, "bad image")
+    ledger.mark_missing("F", 4)
+    ledger.mark_screened("F", 5, "blank")
+    ledger.mark_dead("F", 6, "quota")
+
+    # failed and missing pages are retried; blank and dead ones are not
+    assert ledger.pending_pages() == {"F": [3, 4]}
+    assert ledger.total("pages_done") == 2
+    assert ledger.total("pages_billed") == 1
+    assert ledger.first_done_pages() == {"F": 1}
+
+
+def test_deferred_and_dead_pages_can_be_requeued(ledger):
+    ledger.register_folder("F", "planned", [1, 2])
+    ledger.mark_screened("F", 1, "deferred")
+    ledger.mark_dead("F", 2, "quota")
+
+    assert ledger.pending_pages() == {}
+    assert ledger.pending_pages(include=("deferred",)) == {"F": [1]}
+    assert ledger.requeue("dead") == 1
+    assert ledger.pending_pages() == {"F": [2]}
+
+
+def test_register_keeps_known_page_outcomes(ledger):
+    ledger.register_folder("F", "planned", [1, 2])
+    ledger.mark_done("F", 1)
+    # Re-planning a changed folder adds new pages, keeps recorded ones
+    ledger.register_folder("F", "planned", [1, 2, 3])
+    assert ledger.pending_pages() == {"F": [2, 3]}
+
+
+def test_seeded_totals_survive_reopening(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    ledger = RunLedger(path)
+    assert not ledger.has_total("pages_billed")
+    ledger.seed_total("pages_billed", 40)
+    ledger.seed_total("pages_billed", 99)  # only the first seed counts
+    ledger.register_folder("F", "planned", [1])
+    ledger.mark_done("F", 1)
+    ledger.close()
+
+    reopened = RunLedger(path)
+    assert reopened.total("pages_billed") == 41
+    assert reopened.pending_pages() == {}
+    reopened.close()
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from src.vision_retry import (
+    RESOURCE_EXHAUSTED,
+    AdaptiveLimit,
+    AsyncRetryController,
+    RetriesExhausted,
+    RetryController,
+    VisionPageError,
+    is_retryable,
+    is_throttle,
+)
+
+
+def failing(errors, result="ok"):
+    """Return a callable raising each of errors in turn, then returning result."""
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+def test_error_classification():
+    assert is_retryable(api_exceptions.ResourceExhausted("quota"))
+    assert is_throttle(api_exceptions.ResourceExhausted("quota"))
+    assert is_retryable(api_exceptions.DeadlineExceeded("slow"))
+    assert not is_throttle(api_exceptions.DeadlineExceeded("slow"))
+    assert not is_retryable(api_exceptions.InvalidArgument("bad image"))
+    assert is_throttle(VisionPageError(RESOURCE_EXHAUSTED, "quota"))
+    assert not is_retryable(VisionPageError(3, "bad image"))  # INVALID_ARGUMENT
+
+
+def test_retries_until_success():
+    controller = RetryController(4, max_attempts=3, base_delay=0)
+    fn = failing([api_exceptions.ServiceUnavailable("down")] * 2)
+    assert controller.call(fn) == "ok"
+    assert len(fn.calls) == 3
+    assert controller.retries == 2
+    assert controller.in_flight == 0
+
+
+def test_gives_up_after_max_attempts():
+    controller = RetryController(4, max_attempts=3, base_delay=0)
+    error = api_exceptions.ServiceUnavailable("down")
+    fn = failing([error] * 5)
+    with pytest.raises(RetriesExhausted) as info:
+        controller.call(fn)
+    assert info.value.error is error
+    assert info.value.attempts == 3
+    assert len(fn.calls) == 3
+    assert controller.in_flight == 0
+
+
+def test_permanent_error_is_not_retried():
+    controller = RetryController(4, max_attempts=3, base_delay=0)
+    fn = failing([api_exceptions.InvalidArgument("bad image")])
+    with pytest.raises(api_exceptions.InvalidArgument):
+        controller.call(fn)
+    assert len(fn.calls) == 1
+    assert controller.retries == 0
+    assert controller.in_flight == 0
+
+
+def test_throttle_halves_limit_once_per_cooldown():
+    controller = RetryController(16, max_attempts=3, base_delay=0)
+    controller.call(failing([api_exceptions.ResourceExhausted("quota")] * 2))
+    assert controller.throttled == 2
+    assert controller.limit.allowed() == 8  # second cut inside the cooldown
+
+
+def test_adaptive_limit_bounds():
+    limit = AdaptiveLimit(ceiling=4, floor=2)
+    limit.COOLDOWN = 0
+    for _ in range(5):
+        limit.on_throttle()
+    assert limit.allowed() == 2
+    for _ in range(100):
+        limit.on_success()
+    assert limit.allowed() == 4
+
+
+def test_backoff_is_capped():
+    controller = RetryController(1, base_delay=1.0, max_delay=5.0)
+    assert all(0 <= controller.backoff(10) <= 5.0 for _ in range(100))
+    assert all(0 <= controller.backoff(1) <= 1.0 for _ in range(100))
+
+
+def test_async_controller_retries_and_gives_up():
+    controller = AsyncRetryController(2, max_attempts=2, base_delay=0)
+    errors = [api_exceptions.ServiceUnavailable("down")]
+
+    async def flaky():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    async def always_down():
+        raise api_exceptions.ServiceUnavailable("down")
+
+    async def run():
+        assert await controller.call(flaky) == "ok"
+        with pytest.raises(RetriesExhausted):
+            await controller.call(always_down)
+
+    asyncio.run(run())
+    assert controller.retries == 2
+    assert controller.in_flight == 0
@@ -0,0 +1,14 @@
+from src.vision_stub_server import TokenBucket
+
+
+def test_bucket_refuses_once_dry():
+    bucket = TokenBucket(rate=1e-9, burst=4)
+    assert bucket.take(3)
+    assert not bucket.take(3)
+    assert bucket.take(1)
+
+
+def test_batch_larger_than_burst_is_admitted_on_a_full_bucket():
+    bucket = TokenBucket(rate=1e-9, burst=4)
+    assert bucket.take(16)
+    assert not bucket.take(1)  # and it emptied the bucket